@@ -1,8 +1,49 @@
+from django import forms
 from django.contrib import admin
-from .models import Message
+from app.settings import ADMIN_FULL_TEXT_SEARCH
+from .models import ArchivedMessage, Message, Recipient, RecipientList, Schedule
+from .pagination import CappedCountPaginator
+from .search import PHONE_PREFIX, body_ids_matching, fts_available, phone_prefix
+
+
+class MessageAdminForm(forms.ModelForm):
+    # The text lives in a shared MessageBody; edit it as if it were a column.
+    message = forms.CharField(widget=forms.Textarea, max_length=1600)
+
+    class Meta:
+        model = Message
+        exclude = ('body',)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.body_id:
+            self.fields['message'].initial = self.instance.message
+
+    def save(self, commit=True):
+        self.instance.message = self.cleaned_data['message']
+        return super().save(commit)
+
+
+class DeliveryFilter(admin.SimpleListFilter):
+    """Sent/unsent split on ``sent_at IS NULL``."""
+    title = 'delivery'
+    parameter_name = 'delivery'
+
+    def lookups(self, request, model_admin):
+        return (('pending', 'Pending'), ('sent', 'Sent'))
+
+    def queryset(self, request, queryset):
+        if self.value() == 'pending':
+            return queryset.filter(sent_at__isnull=True)
+        if self.value() == 'sent':
+            return queryset.filter(sent_at__isnull=False)
+        return queryset
+
 
 @admin.register(Message)
 class MessageAdmin(admin.ModelAdmin):
+    form = MessageAdminForm
+
     # Columns to display in the list view
     list_display = (
         'receiver_name', 
@@ -10,14 +51,24 @@ class MessageAdmin(admin.ModelAdmin):
         'sender_name', 
         'scheduled_time', 
         'is_sent',  # Custom method defined below
+        'status',
+        'delivery_status',
+        'priority',
+        'attempt_count',
+        'segments',
         'created_at'
     )
     
     # Filters on the right sidebar
-    list_filter = ('scheduled_time', 'created_at', 'sent_at')
-    
-    # Search box functionality
-    search_fields = ('sender_name', 'receiver_name', 'receiver_phone', 'message')
+    list_filter = (DeliveryFilter, 'status', 'delivery_status', 'priority', 'encoding', 'scheduled_time')
+
+    # Search box: a phone prefix uses the receiver_phone index; anything else
+    # matches name prefixes, plus body words when full-text search is on.
+    search_fields = ('^receiver_name', '^sender_name')
+
+    # Large tables: no exact COUNT(*), and no second unfiltered count.
+    paginator = CappedCountPaginator
+    show_full_result_count = False
     
     # Organize the detail view into sections
     fieldsets = (
@@ -25,17 +76,78 @@ class MessageAdmin(admin.ModelAdmin):
             'fields': ('sender_name', 'receiver_name', 'receiver_phone')
         }),
         ('Content', {
-            'fields': ('message',)
+            'fields': ('message', 'encoding', 'segments')
         }),
         ('Scheduling', {
-            'fields': ('scheduled_time', 'sent_at')
+            'fields': ('scheduled_time', 'priority', 'sent_at')
+        }),
+        ('Delivery', {
+            'fields': ('status', 'attempt_count', 'transient_failures', 'next_attempt_at', 'last_error',
+                       'provider_ref', 'delivery_status', 'delivered_at')
         }),
     )
     
     # Make sent_at and created_at read-only to prevent accidental edits
-    readonly_fields = ('created_at', 'sent_at')
+    readonly_fields = ('created_at', 'sent_at', 'attempt_count', 'transient_failures', 'last_error',
+                       'encoding', 'segments', 'provider_ref', 'delivery_status', 'delivered_at')
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if PHONE_PREFIX.match(term):
+            return queryset.filter(**phone_prefix(term)), False
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if term and ADMIN_FULL_TEXT_SEARCH and fts_available():
+            results |= queryset.filter(body_id__in=body_ids_matching(term))
+        return results, may_have_duplicates
 
     # Add a visual indicator for "Sent" status
     @admin.display(boolean=True, description='Status: Sent')
     def is_sent(self, obj):
-        return obj.sent_at is not None
\ No newline at end of file
+        return obj.sent_at is not None
+
+
+@admin.register(ArchivedMessage)
+class ArchivedMessageAdmin(admin.ModelAdmin):
+    # Written only by archive_messages; browsable, never edited here.
+    list_display = ('id', 'receiver_name', 'receiver_phone', 'sender_name', 'sent_at', 'month')
+    list_filter = ('month',)
+    search_fields = ('receiver_phone',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(RecipientList)
+class RecipientListAdmin(admin.ModelAdmin):
+    list_display = ('name', 'created_at')
+    search_fields = ('name',)
+
+
+@admin.register(Recipient)
+class RecipientAdmin(admin.ModelAdmin):
+    # Lists can be long, so recipients get their own changelist, not an inline.
+    list_display = ('name', 'phone', 'recipient_list')
+    list_filter = ('recipient_list',)
+    search_fields = ('^phone', '^name')
+    autocomplete_fields = ('recipient_list',)
+
+
+@admin.register(Schedule)
+class ScheduleAdmin(admin.ModelAdmin):
+    list_display = ('name', 'sender_name', 'recipient_list', 'rule', 'time_zone', 'active', 'next_run_at')
+    list_filter = ('active', 'priority')
+    search_fields = ('name', 'sender_name')
+    readonly_fields = ('next_run_at', 'created_at')
+    autocomplete_fields = ('recipient_list',)
+
+    # Changing when a schedule fires restarts it from now.
+    TIMING_FIELDS = {'rule', 'time_zone', 'starts_at', 'ends_at', 'active'}
+
+    def save_model(self, request, obj, form, change):
+        if change and self.TIMING_FIELDS & set(form.changed_data):
+            obj.reschedule()
+        super().save_model(request, obj, form, change)
+
@@ -2,4 +2,10 @@ from django.apps import AppConfig
 
 
 class ApiConfig(AppConfig):
+    # What 0001 and 0008 created the message tables with.
+    default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        # connects the cache invalidation receivers
+        from . import cache  # noqa: F401
@@ -0,0 +1,96 @@
+"""Move old finished messages out of the hot table, a chunk at a time.
+
+Sent, dead-lettered and suppressed rows are all finished: none is ever
+claimed again, and left in place they would pile up in ``Message`` for
+good. A row's age is its ``sent_at``, or its ``scheduled_time`` if it was
+never sent.
+
+Each chunk copies rows into ``ArchivedMessage`` and deletes them from
+``Message`` in one transaction, so an interrupted run loses nothing and the
+next run simply carries on from the oldest row still left.
+
+A row is only deleted once its copy is in: one whose id the archive
+already holds for another message (an id reused after a restore, or by a
+backend that recycles ids) is left in ``Message`` and reported as
+``blocked`` rather than being lost.
+"""
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from datetime import timedelta
+import logging, time
+
+from .models import ArchivedMessage, Message
+
+logger = logging.getLogger()
+
+ARCHIVE_CHUNK = 1000
+
+ARCHIVED_FIELDS = ('id', 'sender_name', 'receiver_name', 'receiver_phone', 'body_id',
+                   'scheduled_time', 'sent_at', 'created_at', 'status', 'attempt_count',
+                   'last_error', 'encoding', 'segments', 'priority', 'delivery_status',
+                   'delivered_at')
+
+
+FINISHED = (Message.Status.SENT, Message.Status.DEAD, Message.Status.SUPPRESSED)
+
+
+def eligible(cutoff):
+    return Message.objects.alias(
+        finished_at=Coalesce('sent_at', 'scheduled_time')
+    ).filter(status__in=FINISHED, finished_at__lt=cutoff)
+
+
+def id_taken():
+    return Exists(ArchivedMessage.objects.filter(id=OuterRef('id')))
+
+
+def archivable(cutoff):
+    return eligible(cutoff).filter(~id_taken())
+
+
+def archive_chunk(cutoff, chunk_size=ARCHIVE_CHUNK):
+    """Archive up to ``chunk_size`` of the oldest eligible rows; returns how many."""
+    with transaction.atomic():
+        rows = list(archivable(cutoff).order_by('finished_at', 'id').values(*ARCHIVED_FIELDS)[:chunk_size])
+        if not rows:
+            return 0
+        # No ignore_conflicts: an id archived meanwhile raises and rolls the
+        # chunk back instead of deleting a row whose copy was dropped.
+        ArchivedMessage.objects.bulk_create(
+            [ArchivedMessage(month=(row['sent_at'] or row['scheduled_time']).date().replace(day=1), **row)
+             for row in rows]
+        )
+        # QuerySet.delete sends post_delete, which drops the cached payloads.
+        Message.objects.filter(id__in=[row['id'] for row in rows]).delete()
+    return len(rows)
+
+
+def archive_messages(days, chunk_size=ARCHIVE_CHUNK, limit=None, progress=None):
+    """Archive finished messages older than ``days``; returns a summary dict.
+
+    Stops after ``limit`` rows when given, so a large backlog can be worked
+    off in bounded runs. ``progress`` is called after every chunk.
+    """
+    started = time.monotonic()
+    cutoff = timezone.now() - timedelta(days=days)
+    archived = 0
+    while limit is None or archived < limit:
+        size = chunk_size if limit is None else min(chunk_size, limit - archived)
+        moved = archive_chunk(cutoff, size)
+        archived += moved
+        if progress and moved:
+            progress({'archived': archived, 'elapsed': round(time.monotonic() - started, 2)})
+        if moved < size:
+            break
+    blocked = eligible(cutoff).filter(id_taken()).count()
+    if blocked:
+        logger.warning(f"{blocked} messages not archived: their ids are already in the archive")
+    return {
+        'archived': archived,
+        'remaining': archivable(cutoff).count(),
+        'blocked': blocked,
+        'cutoff': cutoff.isoformat(),
+        'elapsed': round(time.monotonic() - started, 2)
+    }
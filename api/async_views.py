@@ -0,0 +1,94 @@
+"""Async versions of the message endpoints, for ASGI deployments.
+
+Same payloads, status codes and query parameters as the DRF views in
+``views.py``, but plain Django async views over the async ORM and cache
+API, so a request waiting on the database does not hold a worker thread.
+DRF's ``APIView`` is sync-only, which is why these do not subclass it.
+"""
+from django.db import IntegrityError
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework import status
+import json
+
+from .cache import aget_message_payload, aget_message_payloads
+from .models import Message
+from .pagination import akeyset_page
+from .renderers import FastJSONRenderer
+from .serializers import MessageCreateSerializer, MessageResponseSerializer
+from .views import filter_messages, idempotency_key, page_params
+
+_renderer = FastJSONRenderer()
+
+
+def json_response(data, status=status.HTTP_200_OK):
+    return HttpResponse(_renderer.render(data), content_type='application/json', status=status)
+
+
+async def aexisting_message(key):
+    """Payload of the message already created with idempotency ``key``, if any."""
+    if not key:
+        return None
+    pk = await Message.objects.filter(idempotency_key=key).values_list('id', flat=True).afirst()
+    return await aget_message_payload(pk) if pk is not None else None
+
+
+@csrf_exempt
+@require_POST
+async def create_message(request):
+    try:
+        data = json.loads(request.body)
+    except ValueError as exc:
+        return json_response({"detail": f"JSON parse error - {exc}"}, status.HTTP_400_BAD_REQUEST)
+    try:
+        key = idempotency_key(request, data)
+    except ValueError as exc:
+        return json_response({"detail": str(exc)}, status.HTTP_400_BAD_REQUEST)
+    existing = await aexisting_message(key)
+    if existing:
+        return json_response(existing)
+
+    serializer = MessageCreateSerializer(data=data)
+    if not serializer.is_valid():
+        return json_response(serializer.errors, status.HTTP_400_BAD_REQUEST)
+    try:
+        message = await Message.objects.acreate(
+            **{**serializer.validated_data, 'idempotency_key': key or None}
+        )
+    except IntegrityError:
+        existing = await aexisting_message(key)
+        if existing is None:
+            raise
+        return json_response(existing)
+    return json_response(MessageResponseSerializer(message).data, status.HTTP_201_CREATED)
+
+
+@require_GET
+async def list_messages(request):
+    try:
+        skip, limit = page_params(request.GET)
+        queryset = filter_messages(Message.objects.all(), request.GET)
+        if 'cursor' in request.GET:
+            rows, next_cursor = await akeyset_page(
+                queryset.only('id', 'created_at'), request.GET['cursor'], limit
+            )
+            return json_response({
+                "results": await aget_message_payloads([row.id for row in rows]),
+                "next_cursor": next_cursor
+            })
+    except ValueError as exc:
+        return json_response({"detail": str(exc)}, status.HTTP_400_BAD_REQUEST)
+
+    ids = [pk async for pk in queryset.values_list('id', flat=True)[skip: skip + limit]]
+    return json_response(await aget_message_payloads(ids))
+
+
+@require_GET
+async def get_message(request, message_id: int):
+    payload = await aget_message_payload(message_id)
+    if payload is None:
+        return json_response(
+            {"detail": f"Message with ID {message_id} not found"}, status.HTTP_404_NOT_FOUND
+        )
+    return json_response(payload)
@@ -0,0 +1,155 @@
+"""Read-through cache of serialized message payloads, keyed by id.
+
+Single-id lookups fall back to the archive table, so ids moved there by
+``archive_messages`` keep resolving.
+
+Entries are dropped whenever a row changes: ``post_save``/``post_delete``
+cover the ORM paths, and code that writes with ``QuerySet.update`` (the
+sender marking rows sent) calls ``invalidate_messages`` itself. List pages
+are assembled from the same per-id entries, so there is nothing else to
+invalidate.
+
+Invalidation only reaches the cache the writer can see, so payloads are
+cached only in a shared backend (Redis, Memcached). With a per-process
+backend (the default locmem) every read goes to the database, unless
+MESSAGE_CACHE_LOCAL says one process does all the reads and writes.
+"""
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.conf import settings
+from collections import Counter
+import threading
+
+from .models import ArchivedMessage, Message
+from .serializers import aserialize_messages, serialize_messages
+
+KEY_PREFIX = 'message:'
+
+# Backends whose entries a write in another process cannot invalidate.
+PROCESS_LOCAL_BACKENDS = frozenset({
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+})
+_no_cache = DummyCache('message-cache-off', {})
+
+_counters = Counter()
+_counters_lock = threading.Lock()
+
+
+def cache_enabled():
+    backend = settings.CACHES[settings.MESSAGE_CACHE_ALIAS]['BACKEND']
+    return backend not in PROCESS_LOCAL_BACKENDS or settings.MESSAGE_CACHE_LOCAL
+
+
+def get_cache():
+    """The payload cache, or a no-op one when it could serve stale rows."""
+    return caches[settings.MESSAGE_CACHE_ALIAS] if cache_enabled() else _no_cache
+
+
+def _key(message_id):
+    return f"{KEY_PREFIX}{message_id}"
+
+
+def _count(hits, misses):
+    with _counters_lock:
+        _counters['hits'] += hits
+        _counters['misses'] += misses
+
+
+def cache_stats():
+    with _counters_lock:
+        hits, misses = _counters['hits'], _counters['misses']
+    total = hits + misses
+    return {
+        "enabled": cache_enabled(),
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / total, 3) if total else None
+    }
+
+
+def reset_cache_stats():
+    with _counters_lock:
+        _counters.clear()
+
+
+def get_message_payload(message_id):
+    """Serialized message by id, or None if it does not exist."""
+    cache = get_cache()
+    payload = cache.get(_key(message_id))
+    if payload is not None:
+        _count(1, 0)
+        return payload
+    _count(0, 1)
+    rows = (serialize_messages(Message.objects.filter(pk=message_id))
+            or serialize_messages(ArchivedMessage.objects.filter(pk=message_id)))
+    if not rows:
+        return None
+    payload = rows[0]
+    cache.set(_key(message_id), payload)
+    return payload
+
+
+def get_message_payloads(message_ids):
+    """Serialized messages for ``message_ids``, in the same order.
+
+    Cached rows come from one ``get_many``; the rest from one query.
+    """
+    cache = get_cache()
+    cached = cache.get_many([_key(pk) for pk in message_ids])
+    missing = [pk for pk in message_ids if _key(pk) not in cached]
+    _count(len(message_ids) - len(missing), len(missing))
+    if missing:
+        fresh = {
+            _key(payload['id']): payload
+            for payload in serialize_messages(Message.objects.filter(pk__in=missing))
+        }
+        cache.set_many(fresh)
+        cached.update(fresh)
+    return [cached[_key(pk)] for pk in message_ids if _key(pk) in cached]
+
+
+async def aget_message_payload(message_id):
+    """``get_message_payload`` for async views."""
+    cache = get_cache()
+    payload = await cache.aget(_key(message_id))
+    if payload is not None:
+        _count(1, 0)
+        return payload
+    _count(0, 1)
+    rows = (await aserialize_messages(Message.objects.filter(pk=message_id))
+            or await aserialize_messages(ArchivedMessage.objects.filter(pk=message_id)))
+    if not rows:
+        return None
+    payload = rows[0]
+    await cache.aset(_key(message_id), payload)
+    return payload
+
+
+async def aget_message_payloads(message_ids):
+    """``get_message_payloads`` for async views."""
+    cache = get_cache()
+    cached = await cache.aget_many([_key(pk) for pk in message_ids])
+    missing = [pk for pk in message_ids if _key(pk) not in cached]
+    _count(len(message_ids) - len(missing), len(missing))
+    if missing:
+        fresh = {
+            _key(payload['id']): payload
+            for payload in await aserialize_messages(Message.objects.filter(pk__in=missing))
+        }
+        await cache.aset_many(fresh)
+        cached.update(fresh)
+    return [cached[_key(pk)] for pk in message_ids if _key(pk) in cached]
+
+
+def invalidate_messages(message_ids):
+    if message_ids:
+        get_cache().delete_many([_key(pk) for pk in message_ids])
+
+
+@receiver(post_save, sender=Message, dispatch_uid='api_cache_invalidate_save')
+@receiver(post_delete, sender=Message, dispatch_uid='api_cache_invalidate_delete')
+def _invalidate_instance(sender, instance, **kwargs):
+    invalidate_messages([instance.pk])
@@ -0,0 +1,126 @@
+"""Streaming import of scheduled messages from CSV or NDJSON.
+
+The file is read through a chain of generators: lines -> records ->
+validated rows -> chunks, so only one chunk of Message objects is ever held
+in memory. Each chunk is written in its own transaction; a failure part way
+leaves the committed chunks in place and reports where it stopped.
+"""
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from .models import Message
+from .serializers import MessageCreateSerializer, bulk_message, drop_duplicate_keys, validate_message
+from .signals import messages_bulk_created
+import csv, io, json, sys, time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+FORMATS = ('csv', 'ndjson')
+IMPORT_CHUNK = 1000
+# Only the first few bad rows are kept; the rest are just counted.
+MAX_REPORTED_ERRORS = 100
+# Optional CSV columns; an empty cell means "not given", as a missing key does.
+OPTIONAL_COLUMNS = ('idempotency_key', 'priority')
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, if the OS reports it."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def guess_format(name):
+    return 'ndjson' if name.lower().endswith(('.ndjson', '.jsonl')) else 'csv'
+
+
+def iter_records(stream, fmt):
+    """Yield ``(line_number, item)`` from a text stream.
+
+    Malformed NDJSON lines are yielded as ``(line_number, None)`` so they are
+    reported like any other invalid row.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for item in reader:
+            for column in OPTIONAL_COLUMNS:
+                if item.get(column) == '':
+                    del item[column]
+            yield reader.line_num, item
+        return
+    for number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError:
+            yield number, None
+
+
+def iter_valid(records, stats):
+    now = timezone.now()
+    serializer = MessageCreateSerializer()
+    for line, item in records:
+        stats['read'] += 1
+        try:
+            if item is None:
+                raise serializers.ValidationError({'non_field_errors': ["Malformed line."]})
+            yield validate_message(item, now, serializer)
+        except serializers.ValidationError as exc:
+            stats['invalid'] += 1
+            if len(stats['errors']) < MAX_REPORTED_ERRORS:
+                stats['errors'].append({'line': line, 'errors': exc.detail})
+
+
+def iter_chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(bulk_message(row))
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def import_messages(stream, fmt='csv', chunk_size=IMPORT_CHUNK, progress=None):
+    """Import messages from a text ``stream``; returns a summary dict.
+
+    ``progress`` is called with the running summary after every chunk.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown import format {fmt!r}; expected one of {FORMATS}")
+    started = time.monotonic()
+    stats = {'read': 0, 'created': 0, 'invalid': 0, 'duplicates': 0, 'errors': []}
+    earliest = None
+
+    for chunk in iter_chunks(iter_valid(iter_records(stream, fmt), stats), chunk_size):
+        chunk, duplicates = drop_duplicate_keys(chunk)
+        stats['duplicates'] += len(duplicates)
+        if not chunk:
+            continue
+        with transaction.atomic():
+            Message.objects.bulk_create(chunk)
+        stats['created'] += len(chunk)
+        chunk_earliest = min(msg.scheduled_time for msg in chunk)
+        earliest = chunk_earliest if earliest is None else min(earliest, chunk_earliest)
+        if progress:
+            progress({**stats, 'elapsed': round(time.monotonic() - started, 2)})
+
+    if earliest is not None:
+        messages_bulk_created.send(sender=Message, earliest=earliest)
+    stats['elapsed'] = round(time.monotonic() - started, 2)
+    stats['peak_rss_mb'] = peak_rss_mb()
+    return stats
+
+
+def text_stream(binary):
+    """Wrap an uploaded/opened binary file for the CSV and NDJSON readers."""
+    return io.TextIOWrapper(binary, encoding='utf-8-sig', newline='')
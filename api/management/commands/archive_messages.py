@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from api.archive import ARCHIVE_CHUNK, archive_messages
+from app.settings import ARCHIVE_AFTER_DAYS
+
+
+class Command(BaseCommand):
+    help = (
+        "Move sent, dead-lettered and suppressed messages older than the "
+        "retention window into the archive table. Safe to interrupt and re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=ARCHIVE_AFTER_DAYS,
+                            help="Retention window in days (default ARCHIVE_AFTER_DAYS)")
+        parser.add_argument('--chunk-size', type=int, default=ARCHIVE_CHUNK)
+        parser.add_argument('--limit', type=int, help="Stop after archiving this many rows")
+
+    def handle(self, *args, **options):
+        def progress(stats):
+            self.stdout.write(f"archived {stats['archived']}  ({stats['elapsed']}s)")
+
+        stats = archive_messages(
+            options['days'], options['chunk_size'], options['limit'], progress
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {stats['archived']} messages finished before {stats['cutoff']} "
+            f"in {stats['elapsed']}s; {stats['remaining']} left"
+        ))
+        if stats['blocked']:
+            self.stdout.write(self.style.WARNING(
+                f"{stats['blocked']} messages left in place: their ids are already archived"
+            ))
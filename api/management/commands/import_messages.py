@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.importer import FORMATS, IMPORT_CHUNK, guess_format, import_messages, text_stream
+
+
+class Command(BaseCommand):
+    help = "Stream scheduled messages from a CSV or NDJSON file into the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV (with a header row) or NDJSON file")
+        parser.add_argument('--format', choices=FORMATS, help="Defaults to the file extension")
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or guess_format(path)
+
+        def progress(stats):
+            self.stdout.write(
+                f"read {stats['read']}  created {stats['created']}  "
+                f"invalid {stats['invalid']}  ({stats['elapsed']}s)"
+            )
+
+        try:
+            with open(path, 'rb') as binary:
+                stats = import_messages(
+                    text_stream(binary), fmt, options['chunk_size'], progress
+                )
+        except OSError as exc:
+            raise CommandError(f"Cannot read {path}: {exc}")
+
+        for error in stats['errors']:
+            self.stderr.write(f"line {error['line']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {stats['created']} of {stats['read']} rows "
+            f"({stats['invalid']} invalid) in {stats['elapsed']}s, "
+            f"peak RSS {stats['peak_rss_mb']} MB"
+        ))
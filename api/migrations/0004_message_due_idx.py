@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-16 23:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_alter_message_scheduled_time'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(condition=models.Q(('sent_at__isnull', True)), fields=['scheduled_time'], name='message_due_idx'),
+        ),
+    ]
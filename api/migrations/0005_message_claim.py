@@ -0,0 +1,27 @@
+# Generated by Django 6.0 on 2026-10-16 23:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_message_due_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='claimed_by',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='claimed_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(condition=models.Q(('sent_at__isnull', True)), fields=['claimed_by'], name='message_claim_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 6.0 on 2026-10-16 23:18
+
+from django.db import migrations, models
+
+
+def mark_existing_sent(apps, schema_editor):
+    Message = apps.get_model('api', 'Message')
+    Message.objects.filter(sent_at__isnull=False).update(status='sent')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_message_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='attempt_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='last_error',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('dead', 'Dead letter')], default='pending', max_length=10),
+        ),
+        migrations.RunPython(mark_existing_sent, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 6.0 on 2026-10-16 23:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from api.sms import body_digest, render_sms, segment_info
+
+
+def move_bodies(apps, schema_editor):
+    """Point every message at a shared body row and count its segments."""
+    Message = apps.get_model('api', 'Message')
+    MessageBody = apps.get_model('api', 'MessageBody')
+    bodies = {}
+    batch = []
+    rows = Message.objects.only('id', 'receiver_name', 'sender_name', 'message')
+    for msg in rows.order_by('id').iterator(chunk_size=2000):
+        digest = body_digest(msg.message)
+        if digest not in bodies:
+            bodies[digest] = MessageBody.objects.create(digest=digest, text=msg.message).id
+        msg.body_id = bodies[digest]
+        msg.encoding, msg.segments = segment_info(
+            render_sms(msg.receiver_name, msg.message, msg.sender_name)
+        )
+        batch.append(msg)
+        if len(batch) == 2000:
+            Message.objects.bulk_update(batch, ['body', 'encoding', 'segments'])
+            batch = []
+    if batch:
+        Message.objects.bulk_update(batch, ['body', 'encoding', 'segments'])
+
+
+def restore_bodies(apps, schema_editor):
+    Message = apps.get_model('api', 'Message')
+    for body in apps.get_model('api', 'MessageBody').objects.iterator():
+        Message.objects.filter(body_id=body.id).update(message=body.text)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_message_retry_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MessageBody',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(max_length=64, unique=True)),
+                ('text', models.TextField(max_length=1600)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='body',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='messages', to='api.messagebody'),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='encoding',
+            field=models.CharField(choices=[('gsm7', 'GSM-7'), ('ucs2', 'UCS-2')], default='gsm7', max_length=4),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='segments',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+        migrations.AlterField(
+            model_name='message',
+            name='message',
+            field=models.TextField(blank=True, max_length=1600),
+        ),
+        migrations.RunPython(move_bodies, restore_bodies),
+        migrations.AlterField(
+            model_name='message',
+            name='body',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='messages', to='api.messagebody'),
+        ),
+        migrations.RemoveField(
+            model_name='message',
+            name='message',
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['encoding', 'segments'], name='message_segments_idx'),
+        ),
+    ]
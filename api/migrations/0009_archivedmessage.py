@@ -0,0 +1,38 @@
+# Generated by Django 6.0 on 2026-10-16 23:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_message_body'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedMessage',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('sender_name', models.CharField(max_length=100)),
+                ('receiver_name', models.CharField(max_length=100)),
+                ('receiver_phone', models.CharField(max_length=20)),
+                ('scheduled_time', models.DateTimeField()),
+                ('sent_at', models.DateTimeField(null=True)),
+                ('created_at', models.DateTimeField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('dead', 'Dead letter')], max_length=10)),
+                ('attempt_count', models.PositiveIntegerField(default=0)),
+                ('last_error', models.CharField(blank=True, max_length=255)),
+                ('encoding', models.CharField(choices=[('gsm7', 'GSM-7'), ('ucs2', 'UCS-2')], max_length=4)),
+                ('segments', models.PositiveSmallIntegerField()),
+                ('month', models.DateField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('body', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived', to='api.messagebody')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['month'], name='archive_month_idx')],
+            },
+        ),
+    ]
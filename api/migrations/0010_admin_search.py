@@ -0,0 +1,69 @@
+# Generated by Django 6.0 on 2026-10-16 23:39
+
+from django.db import DatabaseError, migrations, models
+
+SQLITE_FTS = [
+    "CREATE VIRTUAL TABLE api_messagebody_fts USING fts5(text, content='api_messagebody', content_rowid='id')",
+    "CREATE TRIGGER api_messagebody_fts_ai AFTER INSERT ON api_messagebody BEGIN "
+    "INSERT INTO api_messagebody_fts(rowid, text) VALUES (new.id, new.text); END",
+    "CREATE TRIGGER api_messagebody_fts_ad AFTER DELETE ON api_messagebody BEGIN "
+    "INSERT INTO api_messagebody_fts(api_messagebody_fts, rowid, text) VALUES ('delete', old.id, old.text); END",
+    "CREATE TRIGGER api_messagebody_fts_au AFTER UPDATE ON api_messagebody BEGIN "
+    "INSERT INTO api_messagebody_fts(api_messagebody_fts, rowid, text) VALUES ('delete', old.id, old.text); "
+    "INSERT INTO api_messagebody_fts(rowid, text) VALUES (new.id, new.text); END",
+    "INSERT INTO api_messagebody_fts(api_messagebody_fts) VALUES ('rebuild')",
+]
+SQLITE_FTS_DROP = [
+    "DROP TRIGGER IF EXISTS api_messagebody_fts_ai",
+    "DROP TRIGGER IF EXISTS api_messagebody_fts_ad",
+    "DROP TRIGGER IF EXISTS api_messagebody_fts_au",
+    "DROP TABLE IF EXISTS api_messagebody_fts",
+]
+POSTGRES_FTS = [
+    "CREATE INDEX messagebody_text_fts ON api_messagebody USING gin (to_tsvector('simple', text))",
+]
+POSTGRES_FTS_DROP = ["DROP INDEX IF EXISTS messagebody_text_fts"]
+
+
+def create_fts(apps, schema_editor):
+    """Full-text index on message bodies, where the backend has one.
+
+    SQLite builds without FTS5 are skipped; admin search then ignores bodies.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        try:
+            with schema_editor.connection.cursor() as cursor:
+                cursor.execute("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)")
+                cursor.execute("DROP TABLE temp.fts5_probe")
+        except DatabaseError:
+            return
+        statements = SQLITE_FTS
+    elif vendor == 'postgresql':
+        statements = POSTGRES_FTS
+    else:
+        return
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def drop_fts(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {'sqlite': SQLITE_FTS_DROP, 'postgresql': POSTGRES_FTS_DROP}.get(vendor, [])
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_archivedmessage'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['receiver_phone'], name='message_phone_idx'),
+        ),
+        migrations.RunPython(create_fts, drop_fts),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 6.0 on 2026-10-16 23:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_admin_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='idempotency_key',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AlterField(
+            model_name='archivedmessage',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('dead', 'Dead letter'), ('suppressed', 'Duplicate suppressed')], max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='message',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('dead', 'Dead letter'), ('suppressed', 'Duplicate suppressed')], default='pending', max_length=10),
+        ),
+        migrations.AddConstraint(
+            model_name='message',
+            constraint=models.UniqueConstraint(condition=models.Q(('idempotency_key__isnull', False)), fields=('idempotency_key',), name='message_idempotency_key_uniq'),
+        ),
+    ]
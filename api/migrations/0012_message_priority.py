@@ -0,0 +1,27 @@
+# Generated by Django 6.0 on 2026-10-16 23:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_message_idempotency'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedmessage',
+            name='priority',
+            field=models.CharField(choices=[('transactional', 'Transactional'), ('bulk', 'Bulk')], default='transactional', max_length=13),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='priority',
+            field=models.CharField(choices=[('transactional', 'Transactional'), ('bulk', 'Bulk')], default='transactional', max_length=13),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(condition=models.Q(('sent_at__isnull', True)), fields=['priority', 'sender_name', 'scheduled_time'], name='message_lane_idx'),
+        ),
+    ]
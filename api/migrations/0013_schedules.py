@@ -0,0 +1,64 @@
+# Generated by Django 6.0 on 2026-10-16 23:52
+
+import api.recurrence
+import django.core.validators
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_message_priority'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipientList',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='message',
+            name='scheduled_time',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.CreateModel(
+            name='Recipient',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('phone', models.CharField(max_length=20, validators=[django.core.validators.RegexValidator(message='Phone must be in E.164 format (+1234567890)', regex='^\\+[1-9]\\d{1,14}$')])),
+                ('recipient_list', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recipients', to='api.recipientlist')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('recipient_list', 'phone'), name='recipient_list_phone_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Schedule',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('sender_name', models.CharField(max_length=100)),
+                ('template', models.TextField(max_length=1600)),
+                ('rule', models.CharField(max_length=255, validators=[api.recurrence.validate_rule])),
+                ('time_zone', models.CharField(default='Africa/Lagos', max_length=64, validators=[api.recurrence.validate_timezone])),
+                ('starts_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('ends_at', models.DateTimeField(blank=True, null=True)),
+                ('priority', models.CharField(choices=[('transactional', 'Transactional'), ('bulk', 'Bulk')], default='bulk', max_length=13)),
+                ('active', models.BooleanField(default=True)),
+                ('next_run_at', models.DateTimeField(blank=True, editable=False, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('recipient_list', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='schedules', to='api.recipientlist')),
+            ],
+            options={
+                'ordering': ['name'],
+                'indexes': [models.Index(condition=models.Q(('active', True)), fields=['next_run_at'], name='schedule_due_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 6.0 on 2026-10-16 23:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_schedules'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedmessage',
+            name='delivered_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='archivedmessage',
+            name='delivery_status',
+            field=models.CharField(blank=True, choices=[('', 'No report'), ('accepted', 'With the carrier'), ('delivered', 'Delivered'), ('failed', 'Undeliverable'), ('rejected', 'Rejected'), ('expired', 'Expired')], default='', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='delivered_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='delivery_status',
+            field=models.CharField(blank=True, choices=[('', 'No report'), ('accepted', 'With the carrier'), ('delivered', 'Delivered'), ('failed', 'Undeliverable'), ('rejected', 'Rejected'), ('expired', 'Expired')], default='', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='provider_ref',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(condition=models.Q(('provider_ref__isnull', False)), fields=['provider_ref'], name='message_provider_ref_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 6.0 on 2026-10-17 00:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_bigauto_schedule_ids'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='message',
+            name='message_due_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='message',
+            name='message_claim_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='message',
+            name='message_lane_idx',
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['scheduled_time'], name='message_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['priority', 'sender_name', 'scheduled_time'], name='message_lane_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['claimed_by'], name='message_claim_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 6.0 on 2026-10-17 00:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_pending_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='message',
+            name='message_due_idx',
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(condition=models.Q(('next_attempt_at__isnull', True), ('status', 'pending')), fields=['scheduled_time'], name='message_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(condition=models.Q(('next_attempt_at__isnull', False), ('status', 'pending')), fields=['next_attempt_at'], name='message_retry_idx'),
+        ),
+    ]
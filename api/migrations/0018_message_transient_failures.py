@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-17 00:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_retry_due_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='transient_failures',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
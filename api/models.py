@@ -1,6 +1,8 @@
 from django.db import models
 from django.core.validators import RegexValidator
 from django.utils import timezone
+from .recurrence import occurrences, validate_rule, validate_timezone
+from .sms import body_digest, render_sms, segment_info
 import pytz
 
 # WAT is UTC+1
@@ -10,19 +12,315 @@ phone_validator = RegexValidator(
     message="Phone must be in E.164 format (+1234567890)"
 )
 
+class MessageBody(models.Model):
+    """Message text stored once, however many recipients share it.
+
+    Rows are looked up by the SHA-256 of the text, so a campaign that sends
+    the same body to many numbers references a single row.
+    """
+    digest     = models.CharField(max_length=64, unique=True)
+    text       = models.TextField(max_length=1600)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    @classmethod
+    def for_texts(cls, texts):
+        """``{text: MessageBody}`` for ``texts``, creating any that are new."""
+        by_digest = {body_digest(text): text for text in set(texts)}
+        bodies = {body.digest: body for body in cls.objects.filter(digest__in=list(by_digest))}
+        missing = [cls(digest=digest, text=text) for digest, text in by_digest.items()
+                   if digest not in bodies]
+        if missing:
+            # Another writer may insert the same body first; re-read the winners.
+            cls.objects.bulk_create(missing, ignore_conflicts=True)
+            bodies.update(
+                (body.digest, body)
+                for body in cls.objects.filter(digest__in=[m.digest for m in missing])
+            )
+        return {text: bodies[digest] for digest, text in by_digest.items()}
+
+    def __str__(self):
+        return self.text[:50]
+
+
+class MessageQuerySet(models.QuerySet):
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        prepare_messages(objs)
+        return super().bulk_create(objs, *args, **kwargs)
+
+
+# What the rendered text, and so encoding and segments, depends on.
+RENDERED_FIELDS = frozenset({'body', 'receiver_name', 'sender_name', 'encoding', 'segments'})
+
+
+def prepare_messages(messages):
+    """Point each message at its shared body and fill in its segment count.
+
+    ``save`` and ``bulk_create`` both go through here, so the encoding and
+    segments of every stored message describe the exact text that is sent.
+    """
+    pending = [msg for msg in messages if msg._text is not None]
+    if pending:
+        bodies = MessageBody.for_texts(msg._text for msg in pending)
+        for msg in pending:
+            msg.body = bodies[msg._text]
+            msg._text = None
+    for msg in messages:
+        msg.encoding, msg.segments = segment_info(msg.render())
+
+
 class Message(models.Model):
+    class Encoding(models.TextChoices):
+        GSM7 = 'gsm7', 'GSM-7'
+        UCS2 = 'ucs2', 'UCS-2'
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        SENT    = 'sent', 'Sent'
+        # Gave up after MAX_SEND_ATTEMPTS; never picked up again.
+        DEAD    = 'dead', 'Dead letter'
+        # Same text to the same number went out recently; not sent again.
+        SUPPRESSED = 'suppressed', 'Duplicate suppressed'
+
+    class Delivery(models.TextChoices):
+        # What the provider's delivery reports say happened after the send.
+        UNKNOWN   = '', 'No report'
+        ACCEPTED  = 'accepted', 'With the carrier'
+        DELIVERED = 'delivered', 'Delivered'
+        FAILED    = 'failed', 'Undeliverable'
+        REJECTED  = 'rejected', 'Rejected'
+        EXPIRED   = 'expired', 'Expired'
+
+    class Priority(models.TextChoices):
+        # Someone is waiting on it (codes, alerts): served ahead of bulk.
+        TRANSACTIONAL = 'transactional', 'Transactional'
+        # Campaigns: throughput matters more than latency.
+        BULK = 'bulk', 'Bulk'
+
     sender_name   = models.CharField(max_length=100)
     receiver_name = models.CharField(max_length=100)
     receiver_phone = models.CharField(max_length=20, validators=[phone_validator])
-    message       = models.TextField(max_length=1600)
-    scheduled_time = models.DateTimeField(
-        default=timezone.datetime(2025, 12, 24, 16, 0, tzinfo=wat_tz)
-    )
+    body          = models.ForeignKey(MessageBody, on_delete=models.PROTECT, related_name='messages')
+    scheduled_time = models.DateTimeField(default=timezone.now)
     sent_at       = models.DateTimeField(null=True, blank=True)
     created_at    = models.DateTimeField(auto_now_add=True)
+    # Lease taken by a sender worker; expired leases can be claimed again.
+    claimed_by    = models.CharField(max_length=64, null=True, blank=True)
+    claimed_until = models.DateTimeField(null=True, blank=True)
+    # Delivery attempts; a failed send backs off until next_attempt_at.
+    status        = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    attempt_count = models.PositiveIntegerField(default=0)
+    # Throttling or outage failures in a row; they grow the back-off but
+    # are not attempts (see sender.retry).
+    transient_failures = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    last_error    = models.CharField(max_length=255, blank=True)
+    # Of the rendered SMS; segments is what the provider bills.
+    encoding      = models.CharField(max_length=4, choices=Encoding.choices, default=Encoding.GSM7)
+    segments      = models.PositiveSmallIntegerField(default=1)
+    # Client-supplied key; a retried create with the same key returns the
+    # original message instead of scheduling a second one.
+    idempotency_key = models.CharField(max_length=64, null=True, blank=True)
+    # Dispatch lane; see sender.lanes.
+    priority      = models.CharField(max_length=13, choices=Priority.choices, default=Priority.TRANSACTIONAL)
+    # The provider's id for the sent message, and what its delivery reports
+    # (sender.dlr) last said about it.
+    provider_ref  = models.CharField(max_length=64, null=True, blank=True)
+    delivery_status = models.CharField(max_length=10, choices=Delivery.choices, blank=True, default=Delivery.UNKNOWN)
+    delivered_at  = models.DateTimeField(null=True, blank=True)
+
+    objects = MessageQuerySet.as_manager()
+
+    # Text assigned through ``message`` that has not been stored yet.
+    _text = None
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # The scheduler's due-scan only ever looks at pending rows, so keep
+            # sent, dead-lettered and suppressed rows out of the index entirely.
+            # Rows backing off after a failure are due at next_attempt_at
+            # instead, and have their own index.
+            models.Index(
+                fields=['scheduled_time'],
+                condition=models.Q(status='pending', next_attempt_at__isnull=True),
+                name='message_due_idx'
+            ),
+            models.Index(
+                fields=['next_attempt_at'],
+                condition=models.Q(status='pending', next_attempt_at__isnull=False),
+                name='message_retry_idx'
+            ),
+            # Fair claim order: each lane's due rows per sender, oldest first.
+            models.Index(
+                fields=['priority', 'sender_name', 'scheduled_time'],
+                condition=models.Q(status='pending'),
+                name='message_lane_idx'
+            ),
+            models.Index(
+                fields=['claimed_by'],
+                condition=models.Q(status='pending'),
+                name='message_claim_idx'
+            ),
+            # Keyset pagination of the message list, newest first.
+            models.Index(fields=['-created_at', '-id'], name='message_created_idx'),
+            # Admin phone-prefix search (see api.search.phone_prefix).
+            models.Index(fields=['receiver_phone'], name='message_phone_idx'),
+            # Billing and throughput planning: segments by encoding.
+            models.Index(fields=['encoding', 'segments'], name='message_segments_idx'),
+            # Delivery reports look messages up by the provider's id.
+            models.Index(
+                fields=['provider_ref'],
+                condition=models.Q(provider_ref__isnull=False),
+                name='message_provider_ref_idx'
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['idempotency_key'],
+                condition=models.Q(idempotency_key__isnull=False),
+                name='message_idempotency_key_uniq'
+            ),
+        ]
+
+    @property
+    def message(self):
+        """The body text; assigning it re-points the message on save."""
+        if self._text is not None:
+            return self._text
+        return self.body.text if self.body_id else ''
+
+    @message.setter
+    def message(self, value):
+        self._text = value
+
+    def render(self):
+        return render_sms(self.receiver_name, self.message, self.sender_name)
+
+    def save(self, *args, **kwargs):
+        # A partial save of other columns (status, claims) has nothing to
+        # re-render; skipping it also skips loading the body.
+        update_fields = kwargs.get('update_fields')
+        if self._text is not None or update_fields is None or RENDERED_FIELDS.intersection(update_fields):
+            prepare_messages([self])
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"Msg to {self.receiver_name} at {self.scheduled_time}"
+
+class ArchivedMessage(models.Model):
+    """A finished message moved out of the hot table by ``archive_messages``.
+
+    Keeps the original id and every field the read API returns, so archived
+    ids still resolve; ``month`` (the first day of the month it was sent, or
+    scheduled for if it never was) partitions the archive for export or bulk deletion.
+    """
+    id             = models.BigIntegerField(primary_key=True)
+    sender_name    = models.CharField(max_length=100)
+    receiver_name  = models.CharField(max_length=100)
+    receiver_phone = models.CharField(max_length=20)
+    body           = models.ForeignKey(MessageBody, on_delete=models.PROTECT, related_name='archived')
+    scheduled_time = models.DateTimeField()
+    sent_at        = models.DateTimeField(null=True)
+    created_at     = models.DateTimeField()
+    status         = models.CharField(max_length=10, choices=Message.Status.choices)
+    attempt_count  = models.PositiveIntegerField(default=0)
+    last_error     = models.CharField(max_length=255, blank=True)
+    encoding       = models.CharField(max_length=4, choices=Message.Encoding.choices)
+    segments       = models.PositiveSmallIntegerField()
+    priority       = models.CharField(max_length=13, choices=Message.Priority.choices,
+                                      default=Message.Priority.TRANSACTIONAL)
+    delivery_status = models.CharField(max_length=10, choices=Message.Delivery.choices, blank=True,
+                                       default=Message.Delivery.UNKNOWN)
+    delivered_at   = models.DateTimeField(null=True)
+    month          = models.DateField()
+    archived_at    = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['month'], name='archive_month_idx'),
+        ]
+
+    @property
+    def message(self):
+        return self.body.text
+
+    def __str__(self):
+        return f"Archived msg to {self.receiver_name} at {self.scheduled_time}"
+
+
+class RecipientList(models.Model):
+    """A named set of numbers that schedules send to."""
+    name       = models.CharField(max_length=100, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+
+class Recipient(models.Model):
+    recipient_list = models.ForeignKey(RecipientList, on_delete=models.CASCADE, related_name='recipients')
+    name           = models.CharField(max_length=100)
+    phone          = models.CharField(max_length=20, validators=[phone_validator])
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['recipient_list', 'phone'], name='recipient_list_phone_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} <{self.phone}>"
+
+
+class Schedule(models.Model):
+    """A recurring message to every number on a recipient list.
+
+    ``rule`` is a crontab line (``30 9 * * 1-5``) or an RRULE
+    (``FREQ=WEEKLY;BYDAY=MO;BYHOUR=9;BYMINUTE=0``) evaluated in ``time_zone``.
+    Occurrences are not stored up front: ``api.schedules`` turns each one
+    into Message rows shortly before it is due. ``next_run_at`` is the first
+    occurrence not yet materialized, or None once the rule is exhausted.
+    ``template`` may use ``{date}`` and ``{time}`` for the occurrence's
+    local date and time.
+    """
+    name           = models.CharField(max_length=100)
+    sender_name    = models.CharField(max_length=100)
+    template       = models.TextField(max_length=1600)
+    recipient_list = models.ForeignKey(RecipientList, on_delete=models.PROTECT, related_name='schedules')
+    rule           = models.CharField(max_length=255, validators=[validate_rule])
+    time_zone      = models.CharField(max_length=64, default=wat_tz.zone, validators=[validate_timezone])
+    starts_at      = models.DateTimeField(default=timezone.now)
+    ends_at        = models.DateTimeField(null=True, blank=True)
+    priority       = models.CharField(max_length=13, choices=Message.Priority.choices,
+                                      default=Message.Priority.BULK)
+    active         = models.BooleanField(default=True)
+    next_run_at    = models.DateTimeField(null=True, blank=True, editable=False)
+    created_at     = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['name']
+        indexes = [
+            # The materializer's scan: active schedules coming due soonest.
+            models.Index(fields=['next_run_at'], condition=models.Q(active=True), name='schedule_due_idx'),
+        ]
+
+    def occurrences(self, start):
+        """Fire times from ``start`` on, stopping at ``ends_at``."""
+        for when in occurrences(self.rule, self.time_zone, max(start, self.starts_at)):
+            if self.ends_at and when > self.ends_at:
+                return
+            yield when
+
+    def reschedule(self, after=None):
+        """Point ``next_run_at`` at the first occurrence from ``after`` (default now)."""
+        self.next_run_at = next(self.occurrences(after or timezone.now()), None)
+
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.next_run_at is None:
+            self.reschedule()
+        super().save(*args, **kwargs)
 
     def __str__(self):
-        return f"Msg to {self.receiver_name} at {self.scheduled_time}"
\ No newline at end of file
+        return self.name
@@ -0,0 +1,91 @@
+"""Opaque keyset cursors for paging messages newest-first.
+
+A cursor encodes the ``(created_at, id)`` of the last row on a page, so the
+next page is one indexed range scan however deep the client has paged.
+"""
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.dateparse import parse_datetime
+import base64, json
+
+MAX_PAGE_SIZE = 500
+
+# The admin changelist never counts past this many rows.
+ADMIN_COUNT_CAP = 10_000
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(message):
+    raw = json.dumps([message.created_at.isoformat(), message.id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        created_at = parse_datetime(created_at)
+        if created_at is None or not isinstance(pk, int):
+            raise ValueError
+    except (ValueError, TypeError):
+        raise InvalidCursor("Invalid cursor.")
+    return created_at, pk
+
+
+def keyset_page(queryset, cursor, limit):
+    """Return ``(rows, next_cursor)`` for the page after ``cursor``.
+
+    ``next_cursor`` is None on the last page.
+    """
+    return _page(list(_after(queryset, cursor)[:limit + 1]), limit)
+
+
+async def akeyset_page(queryset, cursor, limit):
+    """``keyset_page`` over the async ORM."""
+    return _page([row async for row in _after(queryset, cursor)[:limit + 1]], limit)
+
+
+def _after(queryset, cursor):
+    queryset = queryset.order_by('-created_at', '-id')
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+        )
+    return queryset
+
+
+def _page(rows, limit):
+    if len(rows) > limit:
+        return rows[:limit], encode_cursor(rows[limit - 1])
+    return rows, None
+
+
+class CappedCountPaginator(Paginator):
+    """Admin paginator that never runs an exact ``COUNT(*)`` over a big table.
+
+    Counts stop at ``ADMIN_COUNT_CAP`` (``SELECT COUNT(*) FROM (... LIMIT
+    cap + 1)``), so a filtered changelist costs at most a bounded index
+    scan. The unfiltered table on PostgreSQL uses the planner's row
+    estimate instead.
+    """
+    cap = ADMIN_COUNT_CAP
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE relname = %s",
+                    [queryset.model._meta.db_table]
+                )
+                row = cursor.fetchone()
+            if row and row[0] > self.cap:
+                return int(row[0])
+        return queryset.order_by().values('pk')[:self.cap + 1].count()
@@ -0,0 +1,20 @@
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+import json
+
+
+class NDJSONParser(BaseParser):
+    """One JSON object per line; blank lines are ignored."""
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        items = []
+        for number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError as exc:
+                raise ParseError(f"NDJSON parse error on line {number} - {exc}")
+        return items
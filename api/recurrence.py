@@ -0,0 +1,98 @@
+"""Recurrence rules for schedules: crontab lines and iCalendar RRULEs.
+
+``occurrences(rule, tz, start)`` yields every fire time at or after
+``start`` as an aware datetime. Wall-clock rules are evaluated in ``tz`` so
+"every day at 09:00" stays at 09:00 across DST changes. Cron goes through
+APScheduler's ``CronTrigger`` (already a dependency); RRULEs through
+dateutil.
+"""
+from apscheduler.triggers.cron import CronTrigger
+from dateutil.rrule import rrulestr
+from django.core.exceptions import ValidationError
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+# crontab counts weekdays from Sunday (0 or 7); APScheduler 3 from Monday,
+# so weekday fields are handed over as day names.
+CRON_DAYS = ('sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat')
+
+
+def is_rrule(rule):
+    return rule.lstrip().upper().startswith(('RRULE:', 'FREQ=', 'DTSTART'))
+
+
+def cron_day(token):
+    """crontab weekday number (0-7, 7 is Sunday again) of a number or day name."""
+    if token.isdigit() and int(token) <= 7:
+        return int(token)
+    if token in CRON_DAYS:
+        return CRON_DAYS.index(token)
+    raise ValueError(f"Bad weekday {token!r}")
+
+
+def cron_weekdays(field):
+    """A crontab day-of-week field as a list of day names.
+
+    Lists, ranges and steps follow crontab: ``*`` and ``a/n`` run to 7, and
+    7 is Sunday, so ``0-6``, ``5-7`` and ``*/2`` mean what they do in cron.
+    """
+    if field == '*':
+        return field
+    days = set()
+    for part in field.lower().split(','):
+        spec, _, step = part.partition('/')
+        step = int(step) if step else 1
+        if step < 1:
+            raise ValueError(f"Bad step in {part!r}")
+        if spec == '*':
+            low, high = 0, 7
+        elif '-' in spec:
+            low, high = (cron_day(token) for token in spec.split('-', 1))
+        else:
+            low = cron_day(spec)
+            high = 7 if step > 1 else low
+        if low > high:
+            raise ValueError(f"Backwards range {part!r}")
+        days.update(day % 7 for day in range(low, high + 1, step))
+    return ','.join(CRON_DAYS[day] for day in sorted(days))
+
+
+def cron_trigger(rule, tz):
+    fields = rule.split()
+    if len(fields) != 5:
+        raise ValueError("A cron rule has 5 fields: minute hour day month weekday")
+    fields[4] = cron_weekdays(fields[4])
+    return CronTrigger.from_crontab(' '.join(fields), timezone=tz)
+
+
+def occurrences(rule, tz, start):
+    """Fire times of ``rule`` in zone ``tz`` from ``start`` on, ascending."""
+    tz = ZoneInfo(tz) if isinstance(tz, str) else tz
+    if is_rrule(rule):
+        # An RRULE without DTSTART repeats from ``start``'s wall-clock time.
+        yield from rrulestr(rule, dtstart=start.astimezone(tz)).xafter(start, inc=True)
+        return
+    trigger = cron_trigger(rule, tz)
+    when = trigger.get_next_fire_time(None, start)
+    while when is not None:
+        yield when
+        when = trigger.get_next_fire_time(when, when + timedelta(seconds=1))
+
+
+def validate_rule(rule):
+    """Parse ``rule`` and compute its next occurrence the way schedules will.
+
+    Some mistakes only show when an occurrence is computed, such as an RRULE
+    whose DTSTART has no zone, which cannot be compared with aware times.
+    """
+    try:
+        next(occurrences(rule, 'UTC', datetime.now(timezone.utc)), None)
+    except (ValueError, TypeError) as exc:
+        raise ValidationError(f"Not a usable cron line or RRULE: {exc}")
+
+
+def validate_timezone(name):
+    try:
+        ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValidationError(f"Unknown time zone {name!r}")
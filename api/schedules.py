@@ -0,0 +1,112 @@
+"""Turn recurring schedules into Message rows, a sliding window ahead.
+
+Each pass takes the active schedules whose ``next_run_at`` falls within
+``window`` seconds of now. It writes one message per recipient for every
+occurrence up to that horizon, then moves ``next_run_at`` past it. Only the
+next window of occurrences ever exists as rows, however far into the
+future a schedule runs, so the message table and the sender's due-scan
+stay small.
+
+Concurrent passes (several sender workers) are harmless. Generated rows
+carry a deterministic ``idempotency_key`` (schedule, recipient,
+occurrence), so the unique index turns a second writer's inserts into
+no-ops. ``next_run_at`` only advances from the value the pass read.
+"""
+from django.utils import timezone
+from datetime import timedelta
+from zoneinfo import ZoneInfo
+
+from app.settings import SCHEDULE_MISFIRE_GRACE, SCHEDULE_WINDOW_SECONDS
+from .models import Message, Recipient, Schedule
+from .signals import messages_bulk_created
+
+# Schedules per pass, and occurrences per schedule per pass; the rest are
+# picked up by the next pass.
+SCHEDULE_BATCH = 100
+MAX_OCCURRENCES = 100
+RECIPIENT_CHUNK = 1000
+# Idempotency keys of generated rows start with this.
+OCCURRENCE_KEY_PREFIX = 'schedule:'
+
+
+def render_template(template, when):
+    """The body for one occurrence; ``when`` is in the schedule's zone."""
+    return template.replace('{date}', when.strftime('%Y-%m-%d')).replace('{time}', when.strftime('%H:%M'))
+
+
+def occurrence_key(schedule_id, recipient_id, when):
+    return f"{OCCURRENCE_KEY_PREFIX}{schedule_id}:{recipient_id}:{int(when.timestamp())}"
+
+
+def is_occurrence(idempotency_key):
+    """Whether a message was generated by a schedule rather than sent by a client."""
+    return bool(idempotency_key) and idempotency_key.startswith(OCCURRENCE_KEY_PREFIX)
+
+
+def due_occurrences(schedule, now, horizon, grace):
+    """``(times, following)``: occurrences to write now and the first one left.
+
+    Occurrences more than ``grace`` in the past are skipped rather than
+    sent late. ``following`` is None once the rule is exhausted.
+    """
+    times = []
+    for when in schedule.occurrences(max(schedule.next_run_at, now - grace)):
+        if when > horizon or len(times) == MAX_OCCURRENCES:
+            return times, when
+        times.append(when)
+    return times, None
+
+
+def iter_recipients(recipient_list_id):
+    """Recipients a keyset chunk at a time, however long the list."""
+    last = 0
+    while True:
+        chunk = list(
+            Recipient.objects.filter(recipient_list_id=recipient_list_id, id__gt=last)
+            .order_by('id').values_list('id', 'name', 'phone')[:RECIPIENT_CHUNK]
+        )
+        if not chunk:
+            return
+        yield chunk
+        last = chunk[-1][0]
+
+
+def materialize(schedule, now, horizon, grace):
+    """Write ``schedule``'s occurrences up to ``horizon``; returns rows attempted."""
+    start = schedule.next_run_at
+    times, following = due_occurrences(schedule, now, horizon, grace)
+    written = 0
+    if times:
+        zone = ZoneInfo(schedule.time_zone)
+        texts = {when: render_template(schedule.template, when.astimezone(zone)) for when in times}
+        for chunk in iter_recipients(schedule.recipient_list_id):
+            for when in times:
+                Message.objects.bulk_create(
+                    [
+                        Message(
+                            sender_name=schedule.sender_name,
+                            receiver_name=name,
+                            receiver_phone=phone,
+                            message=texts[when],
+                            scheduled_time=when,
+                            priority=schedule.priority,
+                            idempotency_key=occurrence_key(schedule.pk, recipient_id, when)
+                        )
+                        for recipient_id, name, phone in chunk
+                    ],
+                    ignore_conflicts=True
+                )
+                written += len(chunk)
+        if written:
+            messages_bulk_created.send(sender=Message, earliest=times[0])
+    Schedule.objects.filter(pk=schedule.pk, next_run_at=start).update(next_run_at=following)
+    return written
+
+
+def materialize_schedules(now=None, window=SCHEDULE_WINDOW_SECONDS, grace=SCHEDULE_MISFIRE_GRACE,
+                          limit=SCHEDULE_BATCH):
+    """One pass over schedules coming due within ``window`` seconds; returns rows attempted."""
+    now = now or timezone.now()
+    horizon = now + timedelta(seconds=window)
+    due = Schedule.objects.filter(active=True, next_run_at__lte=horizon).order_by('next_run_at')[:limit]
+    return sum(materialize(schedule, now, horizon, timedelta(seconds=grace)) for schedule in due)
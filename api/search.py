@@ -0,0 +1,50 @@
+"""Index-friendly lookups for the admin over large message tables.
+
+``phone_prefix`` turns a prefix into a range on ``receiver_phone`` that a
+plain B-tree index answers on every backend (``LIKE 'x%'`` only does so
+under particular collations). ``body_ids_matching`` is a full-text search
+subquery over the deduplicated message bodies: FTS5 on SQLite, a
+``tsvector`` GIN index on PostgreSQL. Migration 0010 builds both where the backend has them.
+"""
+from django.db import connection
+from django.db.models.expressions import RawSQL
+import re
+
+FTS_TABLE = 'api_messagebody_fts'
+
+PHONE_PREFIX = re.compile(r'^\+?\d+$')
+
+
+def phone_prefix(prefix):
+    """Lookup kwargs matching phones that start with ``prefix``."""
+    return {
+        'receiver_phone__gte': prefix,
+        'receiver_phone__lt': prefix[:-1] + chr(ord(prefix[-1]) + 1),
+    }
+
+
+def fts_available():
+    if connection.vendor == 'postgresql':
+        return True
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+        return cursor.fetchone() is not None
+
+
+def body_ids_matching(term):
+    """Subquery of the ids of message bodies containing the words in ``term``.
+
+    Used as ``body_id__in=...`` so the match stays in the database rather
+    than coming back as one literal id list per search.
+    """
+    if connection.vendor == 'postgresql':
+        return RawSQL(
+            "SELECT id FROM api_messagebody "
+            "WHERE to_tsvector('simple', text) @@ plainto_tsquery('simple', %s)",
+            [term]
+        )
+    # Quoted as one FTS5 phrase so user input is never query syntax.
+    phrase = '"' + term.replace('"', '""') + '"'
+    return RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [phrase])
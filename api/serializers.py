@@ -1,19 +1,229 @@
 from rest_framework import serializers
-from .models import Message
+from .models import Message, phone_validator
+from .signals import messages_bulk_created
+from django.db import IntegrityError, transaction
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+BULK_CREATE_CHUNK = 1000
+# Inserts retried after losing an idempotency-key race to another request.
+BULK_CREATE_ATTEMPTS = 3
+
+FIELD_LIMITS = {
+    'sender_name': 100,
+    'receiver_name': 100,
+    'receiver_phone': 20,
+    'message': 1600,
+}
+IDEMPOTENCY_KEY_LENGTH = 64
+
+
+def fast_validate_message(item, now):
+    """Plain-Python check of a create payload that is obviously valid.
+
+    Returns the validated data, or None when the item needs the full
+    serializer (either because it is invalid or because DRF would normalise
+    it, e.g. by trimming whitespace).
+    """
+    if not isinstance(item, dict):
+        return None
+    data = {}
+    for field, limit in FIELD_LIMITS.items():
+        value = item.get(field)
+        if not isinstance(value, str) or not value or len(value) > limit or value != value.strip():
+            return None
+        data[field] = value
+    if not phone_validator.regex.fullmatch(data['receiver_phone']):
+        return None
+    raw_time = item.get('scheduled_time')
+    try:
+        scheduled_time = parse_datetime(raw_time) if isinstance(raw_time, str) else None
+    except ValueError:
+        return None
+    if scheduled_time is None:
+        return None
+    if timezone.is_naive(scheduled_time):
+        scheduled_time = timezone.make_aware(scheduled_time)
+    if scheduled_time <= now:
+        return None
+    data['scheduled_time'] = scheduled_time
+    key = item.get('idempotency_key')
+    if key not in (None, ''):
+        if not isinstance(key, str) or not key or len(key) > IDEMPOTENCY_KEY_LENGTH or key != key.strip():
+            return None
+        data['idempotency_key'] = key
+    if 'priority' in item:
+        # '' and null are errors to the serializer's ChoiceField, not "default".
+        if item['priority'] not in Message.Priority.values:
+            return None
+        data['priority'] = item['priority']
+    return data
+
+
+def bulk_message(item):
+    """Unsaved message from validated bulk data; bulk rows default to the bulk lane."""
+    return Message(**{'priority': Message.Priority.BULK, **item})
+
+
+def drop_duplicate_keys(messages):
+    """Split unsaved messages into ``(fresh, duplicate_keys)``.
+
+    A message is a duplicate when its ``idempotency_key`` is already stored
+    or appeared earlier in the same batch; the unique index still has the
+    last word if another request wins the race.
+    """
+    keys = [msg.idempotency_key for msg in messages if msg.idempotency_key]
+    if not keys:
+        return messages, []
+    seen = set(Message.objects.filter(idempotency_key__in=keys).values_list('idempotency_key', flat=True))
+    fresh, duplicates = [], []
+    for msg in messages:
+        key = msg.idempotency_key
+        if key and key in seen:
+            duplicates.append(key)
+            continue
+        if key:
+            seen.add(key)
+        fresh.append(msg)
+    return fresh, duplicates
+
+
+def validate_message(item, now, serializer=None):
+    """Validate one create payload with the same rules as the single endpoint.
+
+    Raises ``ValidationError`` with the serializer's field errors.
+    """
+    data = fast_validate_message(item, now)
+    if data is not None:
+        return data
+    serializer = serializer or MessageCreateSerializer()
+    return serializer.run_validation(item)
+
+
+class MessageBulkListSerializer(serializers.ListSerializer):
+    """``MessageCreateSerializer(many=True)`` that keeps the good rows.
+
+    Invalid items do not fail the batch: their errors are collected in
+    ``item_errors`` as ``{"index": i, "errors": {...}}`` and only valid items
+    reach ``validated_data``. Items go through ``validate_message``, so most
+    skip the DRF field machinery while errors still match the single-create
+    endpoint. Items whose ``idempotency_key`` was already used are skipped at
+    save time and listed in ``duplicate_keys``.
+    """
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            raise serializers.ValidationError({
+                'non_field_errors': ["Expected a list of messages."]
+            })
+        if self.max_length is not None and len(data) > self.max_length:
+            raise serializers.ValidationError({
+                'non_field_errors': [f"Ensure this list has at most {self.max_length} messages."]
+            })
+
+        now = timezone.now()
+        validated, self.item_errors = [], []
+        for index, item in enumerate(data):
+            try:
+                validated.append(validate_message(item, now, self.child))
+            except serializers.ValidationError as exc:
+                self.item_errors.append({'index': index, 'errors': exc.detail})
+        return validated
+
+    def create(self, validated_data):
+        for attempt in range(BULK_CREATE_ATTEMPTS):
+            # Rebuilt each time: a rolled-back insert leaves the messages
+            # pointing at body rows that no longer exist.
+            messages, self.duplicate_keys = drop_duplicate_keys([bulk_message(item) for item in validated_data])
+            try:
+                with transaction.atomic():
+                    messages = Message.objects.bulk_create(messages, batch_size=BULK_CREATE_CHUNK)
+                break
+            except IntegrityError:
+                # A concurrent request stored one of the keys after the
+                # check; check again, and it is skipped as a duplicate.
+                if attempt == BULK_CREATE_ATTEMPTS - 1:
+                    raise
+        if messages:
+            earliest = min(msg.scheduled_time for msg in messages)
+            transaction.on_commit(
+                lambda: messages_bulk_created.send(sender=Message, earliest=earliest)
+            )
+        return messages
+
+
 class MessageCreateSerializer(serializers.ModelSerializer):
+    # Stored in a shared MessageBody row; see Message.message.
+    message = serializers.CharField(max_length=FIELD_LIMITS['message'])
+
     class Meta:
         model = Message
         fields = ['sender_name', 'receiver_name', 'receiver_phone',
-        'message', 'scheduled_time']
+        'message', 'scheduled_time', 'idempotency_key', 'priority']
+        # Duplicates are answered with the original message, not rejected.
+        validators = []
+        extra_kwargs = {'idempotency_key': {'validators': [], 'allow_null': True}}
+        list_serializer_class = MessageBulkListSerializer
     
     def validate_scheduled_time(self, value):
         if value <= timezone.now():
             raise serializers.ValidationError("Must be a future time.")
         return value
+
+    def validate_idempotency_key(self, value):
+        return value or None
     
 class MessageResponseSerializer(serializers.ModelSerializer):
     class Meta:
         model = Message
         fields = ['id', 'sender_name', 'receiver_name', 'receiver_phone',
-        'message', 'scheduled_time', 'sent_at', 'created_at']
\ No newline at end of file
+        'message', 'scheduled_time', 'sent_at', 'created_at',
+        'status', 'attempt_count', 'last_error', 'encoding', 'segments', 'priority',
+        'delivery_status', 'delivered_at']
+
+RESPONSE_FIELDS = tuple(MessageResponseSerializer.Meta.fields)
+# Row values to fetch for the response fields; ``message`` is read from the body.
+RESPONSE_COLUMNS = tuple('body__text' if name == 'message' else name for name in RESPONSE_FIELDS)
+DATETIME_FIELDS = frozenset(
+    name for name in RESPONSE_FIELDS
+    if name in ('scheduled_time', 'sent_at', 'created_at', 'delivered_at')
+)
+
+
+def format_datetime(value, tz):
+    """Same string DRF's DateTimeField produces for ISO 8601 output."""
+    if value is None:
+        return None
+    value = value.astimezone(tz).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def serialize_messages(queryset):
+    """Read-only fast path for ``MessageResponseSerializer(qs, many=True).data``.
+
+    Reads plain ``values_list`` tuples and formats them directly, skipping
+    model instances and DRF field objects; the output is identical.
+    """
+    format_row = row_formatter()
+    return [format_row(row) for row in queryset.values_list(*RESPONSE_COLUMNS)]
+
+
+async def aserialize_messages(queryset):
+    """``serialize_messages`` over the async ORM."""
+    format_row = row_formatter()
+    return [format_row(row) async for row in queryset.values_list(*RESPONSE_COLUMNS)]
+
+
+def row_formatter():
+    """Turn a ``RESPONSE_COLUMNS`` tuple into a response payload dict."""
+    tz = timezone.get_current_timezone()
+    dt_index = [i for i, name in enumerate(RESPONSE_FIELDS) if name in DATETIME_FIELDS]
+
+    def format_row(row):
+        row = list(row)
+        for i in dt_index:
+            row[i] = format_datetime(row[i], tz)
+        return dict(zip(RESPONSE_FIELDS, row))
+    return format_row
@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# Sent after Message rows are inserted without post_save (bulk_create).
+# Receivers get ``earliest``, the soonest scheduled_time in the batch.
+messages_bulk_created = Signal()
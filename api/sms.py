@@ -0,0 +1,55 @@
+"""SMS text rendering, encoding detection and segment accounting.
+
+A message that fits the GSM 03.38 alphabet goes out as GSM-7 (160
+septets, or 153 per part once it has to be split); anything else forces
+UCS-2 for the whole message (70 UTF-16 code units, 67 per part). Each
+part is billed, so the counts are computed once when a message is stored.
+"""
+import hashlib
+
+GSM7 = 'gsm7'
+UCS2 = 'ucs2'
+
+GSM7_BASIC = frozenset(
+    "@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+    "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà"
+)
+# Sent as ESC + char, so each costs two septets.
+GSM7_EXTENDED = frozenset("^{}\\[~]|€\f")
+
+# (single-part limit, per-part limit once concatenated)
+LIMITS = {GSM7: (160, 153), UCS2: (70, 67)}
+
+
+def render_sms(receiver_name, body, sender_name):
+    return f"Hi {receiver_name},\n\n{body}\n\n- {sender_name}"
+
+
+def body_digest(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def char_units(text):
+    """``(encoding, units)``: the cost of each character in its encoding's units."""
+    if all(ch in GSM7_BASIC or ch in GSM7_EXTENDED for ch in text):
+        return GSM7, [2 if ch in GSM7_EXTENDED else 1 for ch in text]
+    return UCS2, [2 if ord(ch) > 0xFFFF else 1 for ch in text]
+
+
+def segment_info(text):
+    """``(encoding, segments)`` for ``text`` as it will be sent.
+
+    Parts are filled greedily without splitting an escape sequence or a
+    surrogate pair across them, as handsets expect.
+    """
+    encoding, units = char_units(text)
+    single, per_part = LIMITS[encoding]
+    if sum(units) <= single:
+        return encoding, 1
+    segments, used = 1, 0
+    for cost in units:
+        if used + cost > per_part:
+            segments += 1
+            used = 0
+        used += cost
+    return encoding, segments
@@ -2,14 +2,36 @@ from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from django.utils import timezone
-from datetime import timedelta
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from datetime import datetime, timedelta, timezone as dt_timezone
+from itertools import islice
+from unittest import mock
+import io, json, os, tempfile
 
-from api.models import Message
+from api.cache import cache_stats, invalidate_messages, reset_cache_stats
+from api.archive import archive_messages
+from api.models import ArchivedMessage, Message, MessageBody, Recipient, RecipientList, Schedule
+from api.recurrence import occurrences, validate_rule
+from api.schedules import materialize_schedules
+from api.pagination import CappedCountPaginator
+from api.renderers import FastJSONRenderer
+from api.serializers import MessageResponseSerializer, drop_duplicate_keys, serialize_messages
+from api.sms import segment_info
+from rest_framework.renderers import JSONRenderer
 
 
 class ScheduledMessagingAPITests(APITestCase):
 
     def setUp(self):
+        cache.clear()
+        reset_cache_stats()
         self.future_time = timezone.now() + timedelta(hours=1)
 
         self.message = Message.objects.create(
@@ -82,6 +104,179 @@ class ScheduledMessagingAPITests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn('receiver_phone', response.data)
 
+    # ------------------------
+    # Bulk create
+    # ------------------------
+    def bulk_item(self, **overrides):
+        item = {
+            "sender_name": "Alice",
+            "receiver_name": "Bob",
+            "receiver_phone": "+12025550123",
+            "message": "Campaign",
+            "scheduled_time": (timezone.now() + timedelta(hours=2)).isoformat()
+        }
+        item.update(overrides)
+        return item
+
+    def test_bulk_create_keeps_valid_items(self):
+        url = reverse('bulk-create-messages')
+        payload = [
+            self.bulk_item(),
+            self.bulk_item(receiver_phone="08012345678"),
+            self.bulk_item(scheduled_time=(timezone.now() - timedelta(minutes=5)).isoformat()),
+            self.bulk_item(receiver_name="  Carol  "),
+        ]
+
+        response = self.client.post(url, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([e['index'] for e in response.data['errors']], [1, 2])
+        self.assertIn('receiver_phone', response.data['errors'][0]['errors'])
+        self.assertIn('scheduled_time', response.data['errors'][1]['errors'])
+        self.assertTrue(Message.objects.filter(receiver_name="Carol").exists())
+
+    def test_bulk_create_accepts_ndjson(self):
+        url = reverse('bulk-create-messages')
+        body = "\n".join(json.dumps(self.bulk_item(receiver_name=f"R{i}")) for i in range(3))
+
+        response = self.client.post(url, body, content_type='application/x-ndjson')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data['ids']), 3)
+
+    def test_bulk_create_with_no_valid_items_fails(self):
+        url = reverse('bulk-create-messages')
+        response = self.client.post(url, [self.bulk_item(message="")], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['created'], 0)
+        self.assertIn('message', response.data['errors'][0]['errors'])
+
+    def test_bulk_rows_default_to_the_bulk_lane(self):
+        response = self.client.post(reverse('bulk-create-messages'), [
+            self.bulk_item(), self.bulk_item(priority="transactional"), self.bulk_item(priority="urgent"),
+        ], format='json')
+
+        lanes = list(Message.objects.filter(id__in=response.data['ids']).order_by('id')
+                     .values_list('priority', flat=True))
+        self.assertEqual(lanes, [Message.Priority.BULK, Message.Priority.TRANSACTIONAL])
+        self.assertIn('priority', response.data['errors'][0]['errors'])
+        self.assertEqual(self.message.priority, Message.Priority.TRANSACTIONAL)
+
+    def test_blank_priority_is_rejected_on_every_path(self):
+        item = self.bulk_item(priority="")
+        single = self.client.post(reverse('create-message'), item, format='json')
+        bulk = self.client.post(reverse('bulk-create-messages'), [item], format='json')
+
+        self.assertEqual(single.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('priority', single.data)
+        self.assertEqual(bulk.data['created'], 0)
+        self.assertIn('priority', bulk.data['errors'][0]['errors'])
+
+    # ------------------------
+    # Idempotency keys
+    # ------------------------
+    def test_create_with_idempotency_key_is_replayed(self):
+        url = reverse('create-message')
+        first = self.client.post(url, self.bulk_item(), format='json', HTTP_IDEMPOTENCY_KEY="order-42")
+        again = self.client.post(url, self.bulk_item(message="Changed"), format='json',
+                                 HTTP_IDEMPOTENCY_KEY="order-42")
+        in_body = self.client.post(url, self.bulk_item(idempotency_key="order-42"), format='json')
+        too_long = self.client.post(url, self.bulk_item(), format='json', HTTP_IDEMPOTENCY_KEY="k" * 65)
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(again.status_code, status.HTTP_200_OK)
+        self.assertEqual(again.data, first.data)
+        self.assertEqual(in_body.data['id'], first.data['id'])
+        self.assertEqual(too_long.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Message.objects.filter(idempotency_key="order-42").count(), 1)
+
+        async_again = self.client.post(reverse('async-create-message'), self.bulk_item(),
+                                       content_type='application/json', HTTP_IDEMPOTENCY_KEY="order-42")
+        self.assertEqual(async_again.status_code, status.HTTP_200_OK)
+        self.assertEqual(async_again.json()['id'], first.data['id'])
+
+    def test_bulk_create_skips_used_idempotency_keys(self):
+        url = reverse('bulk-create-messages')
+        self.client.post(url, [self.bulk_item(idempotency_key="a")], format='json')
+
+        response = self.client.post(url, [
+            self.bulk_item(idempotency_key="a"),
+            self.bulk_item(idempotency_key="b"),
+            self.bulk_item(idempotency_key="b"),
+            self.bulk_item(),
+        ], format='json')
+        replay = self.client.post(url, [self.bulk_item(idempotency_key="b")], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(response.data['duplicates'], ["a", "b"])
+        self.assertEqual(replay.status_code, status.HTTP_200_OK)
+        self.assertEqual(replay.data['created'], 0)
+        self.assertEqual(Message.objects.exclude(idempotency_key=None).count(), 2)
+
+    def test_bulk_create_reports_a_key_lost_to_a_concurrent_request(self):
+        calls = []
+
+        def racing_check(messages):
+            result = drop_duplicate_keys(messages)
+            if not calls:
+                # another request stores "a" between the check and the insert
+                Message.objects.create(sender_name="Other", receiver_name="Ada", receiver_phone="+2348012345678",
+                                       message="Won the race", scheduled_time=self.future_time, idempotency_key="a")
+            calls.append(result)
+            return result
+
+        with mock.patch('api.serializers.drop_duplicate_keys', racing_check):
+            response = self.client.post(reverse('bulk-create-messages'), [
+                self.bulk_item(idempotency_key="a"),
+                self.bulk_item(idempotency_key="b"),
+            ], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data['created'], response.data['duplicates']), (1, ["a"]))
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(Message.objects.get(idempotency_key="a").sender_name, "Other")
+
+    # ------------------------
+    # Streaming import
+    # ------------------------
+    def test_import_csv_upload(self):
+        url = reverse('import-messages')
+        when = (timezone.now() + timedelta(hours=2)).isoformat()
+        body = (
+            "sender_name,receiver_name,receiver_phone,message,scheduled_time,priority\n"
+            f"Alice,Bob,+12025550123,Hi,{when},\n"
+            f"Alice,Eve,0801234,Hi,{when},\n"
+            f"Alice,Carol,+12025550124,Hi,{when},transactional\n"
+        )
+        upload = SimpleUploadedFile("campaign.csv", body.encode())
+
+        response = self.client.post(url, {"file": upload}, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['read'], 3)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(response.data['errors'][0]['line'], 3)
+        self.assertIn('receiver_phone', response.data['errors'][0]['errors'])
+        # an empty optional cell is the default, not an invalid value
+        self.assertEqual(dict(Message.objects.filter(sender_name="Alice").values_list('receiver_name', 'priority')),
+                         {"Bob": Message.Priority.BULK, "Carol": Message.Priority.TRANSACTIONAL})
+
+    def test_import_messages_command_ndjson(self):
+        items = [self.bulk_item(receiver_name=f"R{i}") for i in range(5)]
+        lines = [json.dumps(item) for item in items] + ["{not json"]
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson', delete=False) as handle:
+            handle.write("\n".join(lines))
+        self.addCleanup(os.remove, handle.name)
+        out = io.StringIO()
+
+        call_command('import_messages', handle.name, '--chunk-size', '2', stdout=out, stderr=io.StringIO())
+
+        self.assertEqual(Message.objects.filter(receiver_name__startswith="R").count(), 5)
+        self.assertIn("Imported 5 of 6 rows (1 invalid)", out.getvalue())
+
     # ------------------------
     # List messages
     # ------------------------
@@ -100,6 +295,59 @@ class ScheduledMessagingAPITests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 1)
 
+    def test_list_messages_limit_is_capped(self):
+        url = reverse('list-messages') + '?limit=100000'
+        with mock.patch('api.views.MAX_PAGE_SIZE', 2):
+            Message.objects.bulk_create(
+                Message(sender_name="S", receiver_name=f"R{i}", receiver_phone="+2348012345678",
+                        message="m", scheduled_time=self.future_time)
+                for i in range(3)
+            )
+            response = self.client.get(url)
+
+        self.assertEqual(len(response.data), 2)
+
+    def test_list_messages_cursor_pages_through_everything(self):
+        Message.objects.bulk_create(
+            Message(sender_name="S", receiver_name=f"R{i}", receiver_phone="+2348012345678",
+                    message="m", scheduled_time=self.future_time)
+            for i in range(4)
+        )
+        url = reverse('list-messages')
+        seen, cursor = [], ''
+        while cursor is not None:
+            response = self.client.get(url, {'cursor': cursor, 'limit': 2})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen += [row['id'] for row in response.data['results']]
+            cursor = response.data['next_cursor']
+
+        expected = list(Message.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_list_messages_filters(self):
+        Message.objects.create(
+            sender_name="S", receiver_name="Sent", receiver_phone="+2348012345678",
+            message="m", scheduled_time=self.future_time + timedelta(days=2),
+            sent_at=timezone.now()
+        )
+        url = reverse('list-messages')
+
+        sent = self.client.get(url, {'status': 'sent'}).data
+        pending = self.client.get(url, {'status': 'pending', 'cursor': ''}).data['results']
+        later = self.client.get(url, {
+            'scheduled_after': (self.future_time + timedelta(days=1)).isoformat()
+        }).data
+
+        self.assertEqual([row['receiver_name'] for row in sent], ["Sent"])
+        self.assertEqual([row['receiver_name'] for row in pending], ["John"])
+        self.assertEqual([row['receiver_name'] for row in later], ["Sent"])
+
+    def test_list_messages_bad_cursor(self):
+        response = self.client.get(reverse('list-messages'), {'cursor': 'nope'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('detail', response.data)
+
     # ------------------------
     # Get single message
     # ------------------------
@@ -118,6 +366,274 @@ class ScheduledMessagingAPITests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
         self.assertIn('detail', response.data)
 
+    # ------------------------
+    # Message cache
+    # ------------------------
+    @override_settings(MESSAGE_CACHE_LOCAL=True)
+    def test_get_message_is_served_from_cache(self):
+        url = reverse('get-message', args=[self.message.id])
+        self.client.get(url)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+
+        self.assertEqual(response.data['receiver_name'], "John")
+        self.assertEqual(cache_stats()['hits'], 1)
+        self.assertEqual(cache_stats()['misses'], 1)
+
+    def test_process_local_cache_is_not_trusted(self):
+        url = reverse('get-message', args=[self.message.id])
+        self.client.get(url)
+        # a write the process never sees, as from run_sender
+        Message.objects.filter(pk=self.message.pk).update(sent_at=timezone.now())
+
+        self.assertIsNotNone(self.client.get(url).data['sent_at'])
+        self.assertFalse(cache_stats()['enabled'])
+
+    @override_settings(MESSAGE_CACHE_LOCAL=True)
+    def test_cache_is_invalidated_on_save_and_update(self):
+        url = reverse('get-message', args=[self.message.id])
+        self.client.get(url)
+
+        self.message.receiver_name = "Johnny"
+        self.message.save()
+        self.assertEqual(self.client.get(url).data['receiver_name'], "Johnny")
+
+        sent_at = timezone.now()
+        Message.objects.filter(pk=self.message.pk).update(sent_at=sent_at)
+        invalidate_messages([self.message.pk])
+        self.assertIsNotNone(self.client.get(url).data['sent_at'])
+
+    @override_settings(MESSAGE_CACHE_LOCAL=True)
+    def test_list_reuses_cached_payloads(self):
+        url = reverse('list-messages')
+        self.client.get(url)
+
+        # only the id query; every payload comes from the cache
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+
+        self.assertEqual(response.data[0]['id'], self.message.id)
+
+    # ------------------------
+    # Fast response serializer
+    # ------------------------
+    def test_fast_serializer_matches_drf_bytes(self):
+        Message.objects.create(
+            sender_name="Zoë", receiver_name="Jöhn\u2028", receiver_phone="+2348012345678",
+            message="Hello 👋 \u2029", scheduled_time=self.future_time,
+            sent_at=timezone.now()
+        )
+        queryset = Message.objects.order_by('id')
+
+        slow = JSONRenderer().render(MessageResponseSerializer(queryset, many=True).data)
+        fast = FastJSONRenderer().render(serialize_messages(queryset))
+
+        self.assertEqual(fast, slow)
+
+    # ------------------------
+    # Stored bodies and segments
+    # ------------------------
+    def test_segment_info_by_encoding(self):
+        self.assertEqual(segment_info("a" * 160), ('gsm7', 1))
+        self.assertEqual(segment_info("a" * 161), ('gsm7', 2))
+        # Extended characters cost two septets each.
+        self.assertEqual(segment_info("€" * 80), ('gsm7', 1))
+        self.assertEqual(segment_info("€" * 81), ('gsm7', 2))
+        self.assertEqual(segment_info("a" * 69 + "👋"), ('ucs2', 2))
+        self.assertEqual(segment_info("é" * 70 + "ł"), ('ucs2', 2))
+
+    def test_campaign_bodies_are_stored_once(self):
+        url = reverse('bulk-create-messages')
+        payload = [self.bulk_item(receiver_name=f"R{i}", message="Sale ends at midnight")
+                   for i in range(5)]
+
+        response = self.client.post(url, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        body = MessageBody.objects.get(text="Sale ends at midnight")
+        self.assertEqual(body.messages.count(), 5)
+        self.assertEqual(MessageBody.objects.count(), 2)
+
+    def test_encoding_and_segments_are_computed_on_save(self):
+        self.assertEqual((self.message.encoding, self.message.segments), ('gsm7', 1))
+
+        self.message.message = "Привет " * 20
+        self.message.save()
+        self.message.refresh_from_db()
+
+        self.assertEqual(self.message.message, "Привет " * 20)
+        self.assertEqual((self.message.encoding, self.message.segments), ('ucs2', 3))
+        response = self.client.get(reverse('get-message', args=[self.message.id]))
+        self.assertEqual(response.data['segments'], 3)
+
+    def test_partial_save_skips_rendering(self):
+        msg = Message.objects.get(pk=self.message.pk)
+        msg.status = Message.Status.DEAD
+        with self.assertNumQueries(1):
+            msg.save(update_fields=['status'])
+        msg.receiver_name = "Привет"
+        with self.assertNumQueries(2):
+            msg.save(update_fields=['receiver_name', 'encoding', 'segments'])
+        self.assertEqual(msg.encoding, 'ucs2')
+
+    # ------------------------
+    # Async (ASGI) endpoints
+    # ------------------------
+    def test_async_endpoints_match_sync_ones(self):
+        Message.objects.create(
+            sender_name="Dennis", receiver_name="Jane", receiver_phone="+2348012345679",
+            message="Hello Jane", scheduled_time=self.future_time
+        )
+        for sync_name, async_name, args in (('list-messages', 'async-list-messages', []),
+                                            ('get-message', 'async-get-message', [self.message.id])):
+            for query in ('', '?limit=1&status=pending', '?cursor='):
+                sync = self.client.get(reverse(sync_name, args=args) + query)
+                cache.clear()
+                fast = self.client.get(reverse(async_name, args=args) + query)
+                self.assertEqual(fast.status_code, sync.status_code)
+                self.assertEqual(fast.content, sync.content)
+
+        missing = self.client.get(reverse('async-get-message', args=[999]))
+        self.assertEqual(missing.status_code, status.HTTP_404_NOT_FOUND)
+        bad = self.client.get(reverse('async-list-messages') + '?status=lost')
+        self.assertEqual(bad.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_async_create_message(self):
+        url = reverse('async-create-message')
+        payload = self.bulk_item(receiver_name="Async")
+
+        response = self.client.post(url, payload, content_type='application/json')
+        invalid = self.client.post(url, self.bulk_item(receiver_phone="0801"), content_type='application/json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()['receiver_name'], "Async")
+        self.assertEqual(response.json()['segments'], 1)
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('receiver_phone', invalid.json())
+
+    # ------------------------
+    # Archival
+    # ------------------------
+    def test_archive_moves_old_sent_rows_and_ids_still_resolve(self):
+        old = timezone.now() - timedelta(days=120)
+        for i in range(5):
+            Message.objects.create(
+                sender_name="Dennis", receiver_name=f"Old {i}", receiver_phone="+2348012345678",
+                message="Old news", scheduled_time=old, sent_at=old, status=Message.Status.SENT
+            )
+        recent = Message.objects.create(
+            sender_name="Dennis", receiver_name="Recent", receiver_phone="+2348012345678",
+            message="Fresh", scheduled_time=self.future_time,
+            sent_at=timezone.now(), status=Message.Status.SENT
+        )
+        archived_id = Message.objects.get(receiver_name="Old 0").id
+        before = self.client.get(reverse('get-message', args=[archived_id])).content
+
+        first = archive_messages(days=90, chunk_size=2, limit=3)
+        rest = archive_messages(days=90, chunk_size=2)
+
+        self.assertEqual((first['archived'], first['remaining']), (3, 2))
+        self.assertEqual((rest['archived'], rest['remaining']), (2, 0))
+        self.assertEqual(ArchivedMessage.objects.count(), 5)
+        self.assertEqual(ArchivedMessage.objects.first().month, old.date().replace(day=1))
+        self.assertTrue(Message.objects.filter(pk=recent.pk).exists())
+        self.assertTrue(Message.objects.filter(pk=self.message.pk).exists())
+        self.assertFalse(Message.objects.filter(pk=archived_id).exists())
+
+        cache.clear()
+        response = self.client.get(reverse('get-message', args=[archived_id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, before)
+        response = self.client.get(reverse('async-get-message', args=[archived_id]))
+        self.assertEqual(response.content, before)
+
+    def test_archive_takes_dead_and_suppressed_rows_but_not_pending_ones(self):
+        old = timezone.now() - timedelta(days=120)
+        finished = [
+            Message.objects.create(
+                sender_name="Dennis", receiver_name=f"Done {status}", receiver_phone="+2348012345678",
+                message="Never sent", scheduled_time=old, status=status
+            ).pk
+            for status in (Message.Status.DEAD, Message.Status.SUPPRESSED)
+        ]
+        waiting = Message.objects.create(
+            sender_name="Dennis", receiver_name="Waiting", receiver_phone="+2348012345678",
+            message="Still due", scheduled_time=old
+        )
+
+        stats = archive_messages(days=90)
+
+        self.assertEqual((stats['archived'], stats['remaining']), (2, 0))
+        self.assertEqual(set(ArchivedMessage.objects.values_list('id', flat=True)), set(finished))
+        self.assertEqual(ArchivedMessage.objects.first().month, old.date().replace(day=1))
+        self.assertTrue(Message.objects.filter(pk=waiting.pk).exists())
+
+    def test_archive_never_deletes_a_row_it_could_not_copy(self):
+        old = timezone.now() - timedelta(days=120)
+        reused = Message.objects.create(
+            sender_name="Dennis", receiver_name="Newer", receiver_phone="+2348012345678",
+            message="Reused id", scheduled_time=old, sent_at=old, status=Message.Status.SENT
+        )
+        ArchivedMessage.objects.create(
+            id=reused.id, sender_name="Dennis", receiver_name="Older", receiver_phone="+2348012345678",
+            body=reused.body, scheduled_time=old, sent_at=old, created_at=old, status=Message.Status.SENT,
+            encoding=reused.encoding, segments=reused.segments, month=old.date().replace(day=1)
+        )
+
+        stats = archive_messages(days=90)
+
+        self.assertEqual((stats['archived'], stats['remaining'], stats['blocked']), (0, 0, 1))
+        self.assertTrue(Message.objects.filter(pk=reused.pk).exists())
+        self.assertEqual(ArchivedMessage.objects.get(pk=reused.pk).receiver_name, "Older")
+
+    # ------------------------
+    # Admin changelist
+    # ------------------------
+    def admin_search(self, **params):
+        admin, _ = User.objects.get_or_create(username='admin', is_staff=True, is_superuser=True)
+        self.client.force_login(admin)
+        response = self.client.get(reverse('admin:api_message_changelist'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {msg.receiver_name for msg in response.context['cl'].result_list}
+
+    def make_admin_rows(self):
+        for name, phone, body in (("Ada", "+2348031111111", "Your parcel is ready"),
+                                  ("Bola", "+2348032222222", "Meeting moved to noon"),
+                                  ("Chidi", "+14155550000", "Your parcel shipped")):
+            Message.objects.create(sender_name="Shop", receiver_name=name, receiver_phone=phone,
+                                   message=body, scheduled_time=self.future_time)
+
+    def test_admin_phone_prefix_and_delivery_filter(self):
+        self.make_admin_rows()
+        Message.objects.filter(receiver_name="Ada").update(sent_at=timezone.now())
+
+        self.assertEqual(self.admin_search(q="+234803"), {"Ada", "Bola"})
+        self.assertEqual(self.admin_search(q="+2348031"), {"Ada"})
+        self.assertEqual(self.admin_search(delivery="sent"), {"Ada"})
+        self.assertNotIn("Ada", self.admin_search(delivery="pending"))
+
+    def test_admin_full_text_search_on_bodies(self):
+        self.make_admin_rows()
+
+        with mock.patch('api.admin.ADMIN_FULL_TEXT_SEARCH', True), \
+                CaptureQueriesContext(connection) as queries:
+            found = self.admin_search(q="parcel")
+        self.assertEqual(found, {"Ada", "Chidi"})
+        # matched as a subquery of the changelist query, not fetched first
+        fts = [q['sql'] for q in queries if 'MATCH' in q['sql']]
+        self.assertTrue(fts)
+        self.assertTrue(all('"api_message"' in sql for sql in fts))
+        self.assertEqual(self.admin_search(q="parcel"), set())
+
+    def test_capped_count_paginator(self):
+        self.make_admin_rows()
+        paginator = CappedCountPaginator(Message.objects.all(), 2)
+        paginator.cap = 2
+
+        self.assertEqual(paginator.count, 3)
+        self.assertEqual(CappedCountPaginator(Message.objects.all(), 2).count, 4)
+
     # ------------------------
     # Health check
     # ------------------------
@@ -128,3 +644,99 @@ class ScheduledMessagingAPITests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['status'], 'healthy')
         self.assertEqual(response.data['service'], 'scheduled-messaging-api')
+
+
+class ScheduleTests(APITestCase):
+    """Recurring schedules become messages only a window ahead of their time."""
+
+    def setUp(self):
+        self.now = timezone.now().replace(minute=0, second=0, microsecond=0) + timedelta(minutes=30)
+        self.recipients = RecipientList.objects.create(name="Members")
+        Recipient.objects.bulk_create(
+            Recipient(recipient_list=self.recipients, name=f"Member {i}", phone=f"+23480100000{i:02d}")
+            for i in range(3)
+        )
+
+    def schedule(self, rule="FREQ=HOURLY;BYMINUTE=0;BYSECOND=0", **fields):
+        fields.setdefault('starts_at', self.now - timedelta(minutes=1))
+        return Schedule.objects.create(
+            name="Reminder", sender_name="Gym", template="Class on {date} at {time}",
+            recipient_list=self.recipients, rule=rule, time_zone="UTC", **fields
+        )
+
+    def test_cron_and_rrule_occurrences(self):
+        friday = datetime(2026, 10, 16, 12, tzinfo=dt_timezone.utc)
+        weekdays = [when.strftime('%a %H:%M') for when in islice(occurrences("30 9 * * 1-5", "Africa/Lagos", friday), 2)]
+        mondays = list(islice(occurrences("FREQ=WEEKLY;BYDAY=MO;BYHOUR=9;BYMINUTE=0;BYSECOND=0", "UTC", friday), 2))
+        # 01:00 London every day, across the October DST change.
+        nightly = [when.utcoffset() for when in islice(occurrences("0 1 * * *", "Europe/London", friday), 10)]
+
+        self.assertEqual(weekdays, ["Mon 09:30", "Tue 09:30"])
+        self.assertEqual([when.day for when in mondays], [19, 26])
+        self.assertEqual({nightly[0], nightly[-1]}, {timedelta(hours=1), timedelta(0)})
+
+    def test_cron_weekday_ranges_and_steps_follow_crontab(self):
+        friday = datetime(2026, 10, 16, 12, tzinfo=dt_timezone.utc)
+
+        def days(field):
+            return [when.strftime('%a') for when in islice(occurrences(f"0 9 * * {field}", "UTC", friday), 7)]
+
+        self.assertEqual(days("0-6"), ["Sat", "Sun", "Mon", "Tue", "Wed", "Thu", "Fri"])
+        self.assertEqual(days("0-5"), ["Sun", "Mon", "Tue", "Wed", "Thu", "Fri", "Sun"])
+        self.assertEqual(days("*/2")[:4], ["Sat", "Sun", "Tue", "Thu"])
+        self.assertEqual(days("5-7")[:3], ["Sat", "Sun", "Fri"])
+        self.assertEqual(days("MON-fri,0")[:3], ["Sun", "Mon", "Tue"])
+
+    def test_rules_that_cannot_produce_an_occurrence_are_invalid(self):
+        for rule in ("DTSTART:20260101T090000\nRRULE:FREQ=DAILY", "0 9 * * 6-2", "0 9 * * 8", "0 9 * *"):
+            with self.assertRaises(ValidationError, msg=rule):
+                validate_rule(rule)
+        validate_rule("DTSTART:20260101T090000Z\nRRULE:FREQ=DAILY")
+
+    def test_only_the_window_is_materialized(self):
+        schedule = self.schedule()
+        self.assertEqual(schedule.next_run_at, self.now + timedelta(minutes=30))
+
+        materialize_schedules(self.now, window=3 * 3600)
+        schedule.refresh_from_db()
+
+        rows = Message.objects.order_by('scheduled_time', 'receiver_phone')
+        self.assertEqual(rows.count(), 3 * 3)
+        self.assertEqual(schedule.next_run_at, self.now + timedelta(hours=3, minutes=30))
+        first = rows.first()
+        self.assertEqual(first.message, f"Class on {first.scheduled_time:%Y-%m-%d} at {first.scheduled_time:%H:%M}")
+        self.assertEqual((first.sender_name, first.priority), ("Gym", Message.Priority.BULK))
+
+        # Sliding on: the next hour adds one occurrence, nothing is repeated.
+        materialize_schedules(self.now + timedelta(hours=1), window=3 * 3600)
+        self.assertEqual(Message.objects.count(), 4 * 3)
+
+    def test_repeated_pass_writes_nothing_twice(self):
+        schedule = self.schedule()
+        materialize_schedules(self.now, window=3600)
+        # A second worker that read the old next_run_at.
+        Schedule.objects.filter(pk=schedule.pk).update(next_run_at=self.now + timedelta(minutes=30))
+        materialize_schedules(self.now, window=3600)
+
+        self.assertEqual(Message.objects.count(), 3)
+
+    def test_missed_occurrences_are_skipped_and_ends_at_finishes(self):
+        schedule = self.schedule(rule="*/10 * * * *", starts_at=self.now - timedelta(days=7),
+                                 ends_at=self.now + timedelta(minutes=25))
+        Schedule.objects.filter(pk=schedule.pk).update(next_run_at=self.now - timedelta(days=3))
+
+        materialize_schedules(self.now, window=3600, grace=900)
+        schedule.refresh_from_db()
+
+        times = sorted(set(Message.objects.values_list('scheduled_time', flat=True)))
+        self.assertEqual(times[0], self.now - timedelta(minutes=10))
+        self.assertEqual(times[-1], self.now + timedelta(minutes=20))
+        self.assertIsNone(schedule.next_run_at)
+        self.assertEqual(materialize_schedules(self.now + timedelta(hours=1)), 0)
+
+    def test_bad_rule_is_rejected(self):
+        schedule = Schedule(name="x", sender_name="x", template="x", recipient_list=self.recipients,
+                            rule="every day")
+        with self.assertRaises(ValidationError):
+            schedule.full_clean()
+
@@ -1,7 +1,10 @@
 from django.urls import path
+from . import async_views
 from .views import (
     RootAPIView,
     CreateMessageAPIView,
+    BulkCreateMessagesAPIView,
+    ImportMessagesAPIView,
     ListMessagesAPIView,
     GetMessageAPIView,
     HealthCheckAPIView
@@ -10,7 +13,13 @@ from .views import (
 urlpatterns = [
     path('', RootAPIView.as_view(), name='root'),
     path('messages/', CreateMessageAPIView.as_view(), name='create-message'),
+    path('messages/bulk/', BulkCreateMessagesAPIView.as_view(), name='bulk-create-messages'),
+    path('messages/import/', ImportMessagesAPIView.as_view(), name='import-messages'),
     path('messages/list/', ListMessagesAPIView.as_view(), name='list-messages'),
     path('messages/<int:message_id>/', GetMessageAPIView.as_view(), name='get-message'),
     path('health/', HealthCheckAPIView.as_view(), name='health-check'),
+    # Async equivalents for ASGI deployments (app.asgi).
+    path('async/messages/', async_views.create_message, name='async-create-message'),
+    path('async/messages/list/', async_views.list_messages, name='async-list-messages'),
+    path('async/messages/<int:message_id>/', async_views.get_message, name='async-get-message'),
 ]
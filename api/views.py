@@ -1,14 +1,46 @@
 from rest_framework.views import APIView
+from rest_framework.parsers import JSONParser, MultiPartParser
 from rest_framework.response import Response
 from rest_framework import status
+from django.db import IntegrityError, transaction
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
+from .cache import cache_stats, get_message_payload, get_message_payloads
+from .importer import guess_format, import_messages, text_stream, FORMATS
 from .models import Message
+from .pagination import MAX_PAGE_SIZE, keyset_page
+from .parsers import NDJSONParser
+from .renderers import FastJSONRenderer
 from .serializers import (
+    IDEMPOTENCY_KEY_LENGTH,
     MessageCreateSerializer,
     MessageResponseSerializer
 )
 
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+
+def idempotency_key(request, data):
+    """The client's ``Idempotency-Key`` header, else the body field, else None."""
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if key is None:
+        return data.get('idempotency_key') if hasattr(data, 'get') else None
+    key = key.strip()
+    if not key or len(key) > IDEMPOTENCY_KEY_LENGTH:
+        raise ValueError(
+            f"{IDEMPOTENCY_HEADER} must be 1 to {IDEMPOTENCY_KEY_LENGTH} characters"
+        )
+    return key
+
+
+def existing_message(key):
+    """Payload of the message already created with idempotency ``key``, if any."""
+    if not key:
+        return None
+    pk = Message.objects.filter(idempotency_key=key).values_list('id', flat=True).first()
+    return get_message_payload(pk) if pk is not None else None
+
 
 class RootAPIView(APIView):
     def get(self, request):
@@ -17,50 +49,185 @@ class RootAPIView(APIView):
             "status": "active",
             "endpoints": {
                 "create_message": "/messages/",
+                "bulk_create_messages": "/messages/bulk/",
+                "import_messages": "/messages/import/",
                 "list_messages": "/messages/",
                 "get_message": "/messages/{id}"
             }
         })
 
 class CreateMessageAPIView(APIView):
+    """Create one message.
+
+    A repeated ``Idempotency-Key`` returns the message created the first time
+    with 200 instead of scheduling it again.
+    """
     def post(self, request):
+        try:
+            key = idempotency_key(request, request.data)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        existing = existing_message(key)
+        if existing:
+            return Response(existing)
+
         serializer = MessageCreateSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        message = serializer.save()
+        try:
+            with transaction.atomic():
+                message = serializer.save(idempotency_key=key or None)
+        except IntegrityError:
+            # Lost the race to a concurrent request with the same key.
+            existing = existing_message(key)
+            if existing is None:
+                raise
+            return Response(existing)
 
         return Response(
             MessageResponseSerializer(message).data,
             status=status.HTTP_201_CREATED
         )
 
-class ListMessagesAPIView(APIView):
-    def get(self, request):
-        skip = int(request.GET.get('skip', 0))
-        limit = int(request.GET.get('limit', 100))
+class BulkCreateMessagesAPIView(APIView):
+    """Create many messages from a JSON array or an NDJSON body.
+
+    Valid items are inserted in chunks; invalid ones are reported by their
+    position in the request without failing the rest, and items carrying an
+    ``idempotency_key`` that was already used are skipped and listed.
+    """
+    parser_classes = [JSONParser, NDJSONParser]
+    max_items = 50_000
+
+    def post(self, request):
+        serializer = MessageCreateSerializer(
+            data=request.data, many=True, max_length=self.max_items
+        )
+        serializer.is_valid(raise_exception=True)
+        messages = serializer.save()
+
+        return Response(
+            {
+                "created": len(messages),
+                "ids": [message.id for message in messages],
+                "errors": serializer.item_errors,
+                "duplicates": serializer.duplicate_keys
+            },
+            status=status.HTTP_201_CREATED if messages
+            else status.HTTP_200_OK if serializer.duplicate_keys
+            else status.HTTP_400_BAD_REQUEST
+        )
+
+class ImportMessagesAPIView(APIView):
+    """Stream a CSV or NDJSON upload (multipart field ``file``) into messages.
+
+    Large uploads are spooled to disk by Django and read back incrementally.
+    """
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response(
+                {"detail": "Upload a CSV or NDJSON file in the 'file' field."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        fmt = request.data.get('format') or guess_format(upload.name)
+        if fmt not in FORMATS:
+            return Response(
+                {"detail": f"Unknown format '{fmt}'; expected one of {', '.join(FORMATS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        queryset = Message.objects.all()[skip: skip + limit]
+        stats = import_messages(text_stream(upload), fmt)
 
         return Response(
-            MessageResponseSerializer(queryset, many=True).data
+            stats,
+            status=status.HTTP_201_CREATED if stats['created'] else status.HTTP_400_BAD_REQUEST
         )
 
+def page_params(params):
+    """``(skip, limit)`` from the query string; ``limit`` capped at MAX_PAGE_SIZE."""
+    try:
+        skip = max(0, int(params.get('skip', 0)))
+        limit = min(max(1, int(params.get('limit', 100))), MAX_PAGE_SIZE)
+    except ValueError:
+        raise ValueError("skip and limit must be integers.")
+    return skip, limit
+
+
+def filter_messages(queryset, params):
+    """Apply the list filters (``status``, ``scheduled_after``/``_before``)."""
+    state = params.get('status')
+    if state == 'sent':
+        queryset = queryset.filter(sent_at__isnull=False)
+    elif state == 'pending':
+        queryset = queryset.filter(sent_at__isnull=True)
+    elif state:
+        raise ValueError("status must be 'sent' or 'pending'.")
+
+    for param, lookup in (('scheduled_after', 'scheduled_time__gte'),
+                          ('scheduled_before', 'scheduled_time__lt')):
+        value = params.get(param)
+        if not value:
+            continue
+        when = parse_datetime(value)
+        if when is None:
+            raise ValueError(f"{param} must be an ISO 8601 datetime.")
+        if timezone.is_naive(when):
+            when = timezone.make_aware(when)
+        queryset = queryset.filter(**{lookup: when})
+    return queryset
+
+
+class ListMessagesAPIView(APIView):
+    """List messages newest first.
+
+    Passing ``cursor`` (empty for the first page) switches from skip/limit
+    to keyset pagination and wraps the rows as ``{"results", "next_cursor"}``.
+    ``limit`` is capped at MAX_PAGE_SIZE. Both modes filter on
+    ``status=sent|pending`` and ``scheduled_after``/``scheduled_before``.
+    """
+    renderer_classes = [FastJSONRenderer]
+
+    def filter_queryset(self, request, queryset):
+        return filter_messages(queryset, request.GET)
+
+    def get(self, request):
+        try:
+            skip, limit = page_params(request.GET)
+            queryset = self.filter_queryset(request, Message.objects.all())
+            if 'cursor' in request.GET:
+                rows, next_cursor = keyset_page(
+                    queryset.only('id', 'created_at'), request.GET['cursor'], limit
+                )
+                return Response({
+                    "results": get_message_payloads([row.id for row in rows]),
+                    "next_cursor": next_cursor
+                })
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        ids = list(queryset.values_list('id', flat=True)[skip: skip + limit])
+
+        return Response(get_message_payloads(ids))
+
 class GetMessageAPIView(APIView):
+    renderer_classes = [FastJSONRenderer]
+
     def get(self, request, message_id: int):
-        try:
-            message = Message.objects.get(pk=message_id)
-        except Message.DoesNotExist:
+        payload = get_message_payload(message_id)
+        if payload is None:
             return Response(
                 {"detail": f"Message with ID {message_id} not found"},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        return Response(
-            MessageResponseSerializer(message).data
-        )
+        return Response(payload)
 
 class HealthCheckAPIView(APIView):
     def get(self, request):
         return Response({
             "status": "healthy",
-            "service": "scheduled-messaging-api"
+            "service": "scheduled-messaging-api",
+            "cache": cache_stats()
         })
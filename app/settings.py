@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/6.0/ref/settings/
 
 from pathlib import Path
 from decouple import config
+from django.core.exceptions import ImproperlyConfigured
 import os
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -79,12 +80,57 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DB_ENGINE=sqlite (default) or postgres. The sender writes while the API
+# reads, so SQLite runs in WAL mode (readers never block the writer) and
+# waits SQLITE_BUSY_TIMEOUT seconds for the write lock instead of failing
+# with "database is locked"; IMMEDIATE transactions take that lock up front
+# so a read-then-write transaction cannot deadlock on the upgrade. WAL mode
+# is written into the database file, so it defaults off for the db.sqlite3
+# checked into the repository; set SQLITE_PATH (or SQLITE_WAL=True) for a
+# deployment's own database.
+DB_ENGINE = config('DB_ENGINE', default='sqlite')
+
+if DB_ENGINE == 'postgres':
+    # Either Django's native pool (psycopg 3 + psycopg_pool) or persistent
+    # per-thread connections; Django refuses to combine the two.
+    DB_POOL = config('DB_POOL', default=False, cast=bool)
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': config('DB_NAME', default='scheduled_sms'),
+            'USER': config('DB_USER', default='postgres'),
+            'PASSWORD': config('DB_PASSWORD', default=''),
+            'HOST': config('DB_HOST', default='localhost'),
+            'PORT': config('DB_PORT', default='5432'),
+            'CONN_MAX_AGE': 0 if DB_POOL else config('DB_CONN_MAX_AGE', default=60, cast=int),
+            'CONN_HEALTH_CHECKS': config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool),
+            'OPTIONS': {
+                'pool': {
+                    'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+                    'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+                    'timeout': config('DB_POOL_TIMEOUT', default=10, cast=int),
+                },
+            } if DB_POOL else {},
+        }
     }
-}
+elif DB_ENGINE == 'sqlite':
+    SQLITE_PATH = config('SQLITE_PATH', default=str(BASE_DIR / 'db.sqlite3'))
+    SQLITE_WAL = config('SQLITE_WAL', default=SQLITE_PATH != str(BASE_DIR / 'db.sqlite3'), cast=bool)
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': SQLITE_PATH,
+            'OPTIONS': {
+                'timeout': config('SQLITE_BUSY_TIMEOUT', default=20, cast=float),
+                'transaction_mode': config('SQLITE_TRANSACTION_MODE', default='IMMEDIATE'),
+                'init_command': (
+                    'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;' if SQLITE_WAL else ''
+                ),
+            },
+        }
+    }
+else:
+    raise ImproperlyConfigured(f"DB_ENGINE must be 'sqlite' or 'postgres', not {DB_ENGINE!r}")
 
 
 # Password validation
@@ -129,6 +175,23 @@ REST_FRAMEWORK = {
 'DEFAULT_RENDERER_CLASSES': ['rest_framework.renderers.JSONRenderer'],
 'DEFAULT_PARSER_CLASSES': ['rest_framework.parsers.JSONParser'],
 }
+# --------- CACHE ---------
+# Message payloads are only cached in a shared backend: point CACHE_BACKEND/
+# CACHE_LOCATION at Redis or Memcached to turn the read cache on. locmem is
+# per process, so a send or delivery report written by run_sender or another
+# worker could not invalidate it; it is ignored unless MESSAGE_CACHE_LOCAL
+# says a single process serves the API and sends.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='scheduled-sms'),
+        'TIMEOUT': config('MESSAGE_CACHE_TTL', default=300, cast=int),
+        'OPTIONS': {'MAX_ENTRIES': config('MESSAGE_CACHE_MAX_ENTRIES', default=10000, cast=int)},
+    }
+}
+MESSAGE_CACHE_ALIAS = 'default'
+MESSAGE_CACHE_LOCAL = config('MESSAGE_CACHE_LOCAL', default=False, cast=bool)
+
 # --------- CORS (same as FastAPI) ---------
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",   # React
@@ -137,6 +200,95 @@ CORS_ALLOWED_ORIGINS = [
     "https://santa-lake.vercel.app",
 ]
 
-# --------- TERMII SETTINGS ---------
+# --------- SMS GATEWAY SETTINGS ---------
 API_KEY   = config('API_KEY')
-SENDER_ID = config('SENDER_ID', default='DjangoApp')
\ No newline at end of file
+SENDER_ID = config('SENDER_ID', default='DjangoApp')
+
+# 'kudi' for real sends, 'mock' for the in-process gateway used in load tests.
+SMS_PROVIDER = config('SMS_PROVIDER', default='kudi')
+# Mock gateway behaviour: seconds per request, share of rows rejected, and
+# requests/second before it starts throttling (0 = never).
+MOCK_GATEWAY_LATENCY = config('MOCK_GATEWAY_LATENCY', default=0.0, cast=float)
+MOCK_GATEWAY_ERROR_RATE = config('MOCK_GATEWAY_ERROR_RATE', default=0.0, cast=float)
+MOCK_GATEWAY_MAX_RPS = config('MOCK_GATEWAY_MAX_RPS', default=0.0, cast=float)
+
+# --------- KUDI DISPATCH ---------
+KUDI_BASE_URL = config('KUDI_BASE_URL', default='https://my.kudisms.net/api/autocomposesms')
+# Rows packed into one Kudi request; 1 reproduces the old per-message sends.
+KUDI_BATCH_SIZE = config('KUDI_BATCH_SIZE', default=100, cast=int)
+# Parallel Kudi requests per tick, and the provider's requests-per-second quota.
+# The quota is enforced per host: `run_sender --processes N` splits it between
+# its workers, but separate hosts each take all of it. With several sender
+# hosts set each one's share (KUDI_RATE_LIMIT or --rate-limit) so they add up
+# to the quota, and keep the web tier from sending (SENDER_IN_PROCESS=False,
+# no /sms/trigger calls) or count it as one more host.
+KUDI_CONCURRENCY = config('KUDI_CONCURRENCY', default=4, cast=int)
+KUDI_RATE_LIMIT = config('KUDI_RATE_LIMIT', default=10, cast=float)
+# Due rows fetched per keyset page; bounds the tick's memory on large campaigns.
+DUE_PAGE_SIZE = config('DUE_PAGE_SIZE', default=1000, cast=int)
+# How long a worker owns the rows it claims before another worker may retry them.
+CLAIM_LEASE_SECONDS = config('CLAIM_LEASE_SECONDS', default=300, cast=int)
+# 'precise' wakes exactly when the next message is due; 'interval' polls every minute.
+SCHEDULER_MODE = config('SCHEDULER_MODE', default='precise')
+# Longest the precise scheduler sleeps before re-checking the database.
+SCHEDULER_MAX_SLEEP = config('SCHEDULER_MAX_SLEEP', default=60, cast=int)
+# Failed sends back off exponentially from RETRY_BASE_SECONDS (capped at
+# RETRY_MAX_SECONDS) and are dead-lettered after MAX_SEND_ATTEMPTS rejections;
+# throttling and outages back off without counting as an attempt, and only
+# dead-letter after MAX_TRANSIENT_FAILURES of them in a row (about 15 hours
+# of outage at the defaults).
+MAX_SEND_ATTEMPTS = config('MAX_SEND_ATTEMPTS', default=5, cast=int)
+MAX_TRANSIENT_FAILURES = config('MAX_TRANSIENT_FAILURES', default=20, cast=int)
+RETRY_BASE_SECONDS = config('RETRY_BASE_SECONDS', default=60, cast=int)
+RETRY_MAX_SECONDS = config('RETRY_MAX_SECONDS', default=3600, cast=int)
+# Start the in-process scheduler under runserver; turn off when deploying
+# `manage.py run_sender` separately.
+SENDER_IN_PROCESS = config('SENDER_IN_PROCESS', default=True, cast=bool)
+# A run_sender worker counts as live while its heartbeat is this recent.
+SENDER_HEARTBEAT_TTL = config('SENDER_HEARTBEAT_TTL', default=30, cast=int)
+# Due rows are claimed by weighted fair queuing over (lane, sender) queues.
+# One transactional row weighs TRANSACTIONAL_WEIGHT bulk rows; SENDER_WEIGHTS
+# ("Shop A:3,Shop B:2") favours particular senders, unlisted ones weigh 1.
+TRANSACTIONAL_WEIGHT = config('TRANSACTIONAL_WEIGHT', default=10, cast=float)
+SENDER_WEIGHTS = config('SENDER_WEIGHTS', default='')
+# The same text to the same number within SEND_DEDUP_WINDOW seconds is
+# suppressed as a duplicate (0 turns this off). RECIPIENT_MAX_PER_WINDOW caps
+# sends to one number per RECIPIENT_WINDOW_SECONDS (0 means no cap); the rest
+# wait for the next window. Both are tracked per sender process.
+SEND_DEDUP_WINDOW = config('SEND_DEDUP_WINDOW', default=600, cast=int)
+RECIPIENT_MAX_PER_WINDOW = config('RECIPIENT_MAX_PER_WINDOW', default=0, cast=int)
+RECIPIENT_WINDOW_SECONDS = config('RECIPIENT_WINDOW_SECONDS', default=3600, cast=int)
+
+# --------- RECURRING SCHEDULES ---------
+# Schedule occurrences become Message rows this many seconds before they are
+# due; keep it well above SCHEDULER_MAX_SLEEP so each tick stays ahead.
+SCHEDULE_WINDOW_SECONDS = config('SCHEDULE_WINDOW_SECONDS', default=3600, cast=int)
+# Occurrences missed by more than this (no sender running) are skipped, not sent late.
+SCHEDULE_MISFIRE_GRACE = config('SCHEDULE_MISFIRE_GRACE', default=3600, cast=int)
+
+# --------- DELIVERY REPORTS ---------
+# Provider callbacks at /sms/dlr are buffered and written in one bulk_update
+# when DLR_FLUSH_SIZE are waiting or every DLR_FLUSH_INTERVAL seconds. Past
+# DLR_MAX_BUFFERED the webhook answers 503 so the provider retries later.
+DLR_FLUSH_SIZE = config('DLR_FLUSH_SIZE', default=500, cast=int)
+DLR_FLUSH_INTERVAL = config('DLR_FLUSH_INTERVAL', default=1.0, cast=float)
+DLR_MAX_BUFFERED = config('DLR_MAX_BUFFERED', default=100_000, cast=int)
+# Reports naming a provider id not stored yet (the callback beat the sender's
+# write-back) are retried for this many seconds, then dropped.
+DLR_UNMATCHED_TTL = config('DLR_UNMATCHED_TTL', default=300, cast=int)
+# Shared secret the provider sends as X-DLR-Token or ?token=. Required: the
+# webhook refuses every report while it is empty.
+DLR_TOKEN = config('DLR_TOKEN', default='')
+# Reports still buffered at shutdown with the database unreachable are kept
+# here and replayed by the next process.
+DLR_SPOOL_PATH = config('DLR_SPOOL_PATH', default=str(BASE_DIR / 'dlr_spool.ndjson'))
+
+# --------- ARCHIVAL ---------
+# Sent, dead-lettered and suppressed messages older than this move to the
+# archive table (archive_messages).
+ARCHIVE_AFTER_DAYS = config('ARCHIVE_AFTER_DAYS', default=90, cast=int)
+
+# --------- ADMIN ---------
+# Let the Message admin search match words in message bodies (SQLite FTS5 /
+# PostgreSQL tsvector, built by migration 0010).
+ADMIN_FULL_TEXT_SEARCH = config('ADMIN_FULL_TEXT_SEARCH', default=False, cast=bool)
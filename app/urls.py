@@ -16,9 +16,11 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import include, path
+from sender.views import metrics
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('api.urls')),
     path('sms/', include('sender.urls')),
+    path('metrics', metrics, name='metrics'),
 ]
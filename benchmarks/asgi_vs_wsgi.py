@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+"""Load-test the WSGI deployment against the ASGI one.
+
+Seeds a SQLite file, starts gunicorn (sync views, ``app.wsgi``) and uvicorn
+(async views, ``app.asgi``) on it in turn, and drives each with the same
+number of concurrent keep-alive clients:
+
+    API_KEY=x python benchmarks/asgi_vs_wsgi.py --clients 64 --seconds 10
+
+Scenarios:
+
+  get      GET one message by id (cache-backed read)
+  list     GET a 50-row page of the message list
+  trigger  polls of ``get`` while one client keeps the sender busy on a
+           slow mock gateway (MOCK_GATEWAY_LATENCY per batch); under WSGI
+           each in-flight send holds a worker thread
+
+gunicorn and uvicorn are not project dependencies; install them to run
+this. Both servers get the same process count (--workers); gunicorn gets
+--threads threads per process.
+"""
+import argparse, asyncio, os, random, socket, subprocess, sys, tempfile, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
+
+import httpx
+
+DEPLOYMENTS = {
+    "wsgi": {"prefix": "", "trigger": "/sms/trigger"},
+    "asgi": {"prefix": "/async", "trigger": "/sms/async/trigger"},
+}
+
+
+def seed(args):
+    import django
+    django.setup()
+    from datetime import timedelta
+    from django.core.management import call_command
+    from django.utils import timezone
+    from api.models import Message
+
+    call_command("migrate", verbosity=0)
+    now = timezone.now()
+    Message.objects.bulk_create(
+        (Message(sender_name="Bench", receiver_name=f"User {i}", receiver_phone=f"+234801{i:07d}",
+                 message="Load test", scheduled_time=now + timedelta(days=1))
+         for i in range(args.rows)),
+        batch_size=5000
+    )
+    return list(Message.objects.values_list("id", flat=True))
+
+
+def due_rows(count):
+    from datetime import timedelta
+    from django.utils import timezone
+    from api.models import Message
+    past = timezone.now() - timedelta(minutes=1)
+    Message.objects.bulk_create(
+        Message(sender_name="Bench", receiver_name=f"Due {i}", receiver_phone=f"+234802{i:07d}",
+                message="Due", scheduled_time=past)
+        for i in range(count)
+    )
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(kind, port, args, env):
+    if kind == "wsgi":
+        cmd = ["gunicorn", "app.wsgi:application", "--bind", f"127.0.0.1:{port}",
+               "--workers", str(args.workers), "--threads", str(args.threads), "--log-level", "warning"]
+    else:
+        cmd = ["uvicorn", "app.asgi:application", "--port", str(port),
+               "--workers", str(args.workers), "--log-level", "warning"]
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/health/", timeout=1)
+            return proc
+        except httpx.TransportError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError(f"{kind} server did not start")
+
+
+async def load(base, paths, clients, seconds, background=None):
+    """Hammer ``paths`` with ``clients`` concurrent clients; returns latencies."""
+    latencies, errors = [], 0
+    limits = httpx.Limits(max_connections=clients + 1)
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=60) as client:
+        deadline = time.monotonic() + seconds
+
+        async def worker():
+            nonlocal errors
+            while time.monotonic() < deadline:
+                started = time.monotonic()
+                try:
+                    resp = await client.get(random.choice(paths))
+                    resp.raise_for_status()
+                    latencies.append(time.monotonic() - started)
+                except httpx.HTTPError:
+                    errors += 1
+
+        async def busy_sender():
+            while time.monotonic() < deadline:
+                await client.post(background)
+
+        tasks = [worker() for _ in range(clients)]
+        if background:
+            tasks.append(busy_sender())
+        await asyncio.gather(*tasks)
+    return latencies, errors
+
+
+def report(kind, scenario, latencies, errors, seconds):
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else 0
+    print(f"{kind:<5} {scenario:<8} {len(latencies) / seconds:9.0f} req/s  "
+          f"p50 {pct(0.50):7.1f} ms  p99 {pct(0.99):7.1f} ms  errors {errors}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--gateway-latency", type=float, default=0.5)
+    parser.add_argument("--scenarios", nargs="+", default=["get", "list", "trigger"])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {
+            **os.environ,
+            "DB_ENGINE": "sqlite",
+            "SQLITE_PATH": os.path.join(tmp, "load.sqlite3"),
+            "SENDER_IN_PROCESS": "False",
+            "SMS_PROVIDER": "mock",
+            "MOCK_GATEWAY_LATENCY": str(args.gateway_latency),
+            "KUDI_BATCH_SIZE": "1",
+            "KUDI_RATE_LIMIT": "1000",
+        }
+        os.environ.update(env)
+        ids = seed(args)
+
+        for kind, routes in DEPLOYMENTS.items():
+            port = free_port()
+            server = start_server(kind, port, args, env)
+            base = f"http://127.0.0.1:{port}"
+            prefix = routes["prefix"]
+            gets = [f"{prefix}/messages/{pk}/" for pk in random.sample(ids, min(1000, len(ids)))]
+            try:
+                for scenario in args.scenarios:
+                    background = None
+                    paths = gets
+                    if scenario == "list":
+                        paths = [f"{prefix}/messages/list/?limit=50&skip={skip}" for skip in range(0, 1000, 50)]
+                    elif scenario == "trigger":
+                        due_rows(int(args.seconds / args.gateway_latency * 8) + 8)
+                        background = routes["trigger"]
+                    latencies, errors = asyncio.run(
+                        load(base, paths, args.clients, args.seconds, background)
+                    )
+                    report(kind, scenario, latencies, errors, args.seconds)
+            finally:
+                server.terminate()
+                server.wait()
+
+
+if __name__ == "__main__":
+    main()
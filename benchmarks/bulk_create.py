@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""Rows/sec through POST /messages/ versus POST /messages/bulk/.
+
+Runs in-process with DRF's APIClient against a throwaway test database:
+
+    API_KEY=x python benchmarks/bulk_create.py --rows 2000
+"""
+import argparse, json, os, sys, time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
+
+import django
+django.setup()
+
+from django.db import connection
+from django.test.utils import setup_test_environment
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+
+def make_items(count):
+    when = (timezone.now() + timedelta(hours=1)).isoformat()
+    return [
+        {
+            "sender_name": "Bench",
+            "receiver_name": f"User {i}",
+            "receiver_phone": f"+234801{i:07d}",
+            "message": "Scheduled campaign message",
+            "scheduled_time": when
+        }
+        for i in range(count)
+    ]
+
+
+def report(label, rows, elapsed):
+    print(f"{label:<18} {rows:>7} rows  {elapsed:7.2f}s  {rows / elapsed:9.0f} rows/s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--chunk", type=int, default=1000, help="items per bulk request")
+    args = parser.parse_args()
+
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+    client = APIClient()
+    try:
+        items = make_items(args.rows)
+        started = time.perf_counter()
+        for item in items:
+            client.post("/messages/", item, format="json")
+        report("single endpoint", args.rows, time.perf_counter() - started)
+
+        started = time.perf_counter()
+        for start in range(0, args.rows, args.chunk):
+            client.post("/messages/bulk/", items[start:start + args.chunk], format="json")
+        report("bulk (json)", args.rows, time.perf_counter() - started)
+
+        body = "\n".join(json.dumps(item) for item in items)
+        started = time.perf_counter()
+        client.post("/messages/bulk/", body, content_type="application/x-ndjson")
+        report("bulk (ndjson)", args.rows, time.perf_counter() - started)
+    finally:
+        connection.creation.destroy_test_db(connection.settings_dict["NAME"], verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+"""Concurrent readers and writers against one SQLite file.
+
+Runs the same workload under the legacy SQLite settings (rollback journal,
+deferred transactions, Python's 5 s busy timeout) and under the defaults
+from app/settings.py (WAL, IMMEDIATE, SQLITE_BUSY_TIMEOUT). Readers list
+messages like the API; writers create messages and mark them sent inside a
+read-then-write transaction, like the sender's bookkeeping:
+
+    API_KEY=x python benchmarks/db_contention.py --readers 4 --writers 4 --seconds 10
+
+Each mode runs in a fresh process against a fresh database file so the
+settings are read from the environment exactly as in production.
+"""
+import argparse, json, os, subprocess, sys, tempfile, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
+
+MODES = {
+    "legacy": {"SQLITE_WAL": "False", "SQLITE_TRANSACTION_MODE": "DEFERRED", "SQLITE_BUSY_TIMEOUT": "5"},
+    "tuned": {},
+}
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+def reader(deadline, results):
+    from django.db import connections
+    from api.models import Message
+    from api.serializers import serialize_messages
+    ok = errors = 0
+    latencies = []
+    while time.monotonic() < deadline:
+        started = time.monotonic()
+        try:
+            serialize_messages(Message.objects.order_by('-created_at', '-id')[:50])
+            ok += 1
+        except Exception:
+            errors += 1
+        latencies.append(time.monotonic() - started)
+    connections.close_all()
+    results.put(("read", ok, errors, latencies))
+
+
+def writer(index, deadline, results):
+    from django.db import connections, transaction
+    from django.utils import timezone
+    from api.models import Message
+    ok = errors = 0
+    latencies = []
+    while time.monotonic() < deadline:
+        started = time.monotonic()
+        try:
+            with transaction.atomic():
+                msg = Message.objects.filter(sent_at__isnull=True).order_by('id').first()
+                Message.objects.create(
+                    sender_name="Bench", receiver_name=f"Writer {index}",
+                    receiver_phone="+2348012345678", message="Contention",
+                    scheduled_time=timezone.now()
+                )
+                if msg:
+                    Message.objects.filter(pk=msg.pk).update(sent_at=timezone.now())
+            ok += 1
+        except Exception:
+            errors += 1
+        latencies.append(time.monotonic() - started)
+    connections.close_all()
+    results.put(("write", ok, errors, latencies))
+
+
+def run(args):
+    """One mode, in this process: migrate, seed, fork the workload, report JSON."""
+    import django
+    django.setup()
+    import multiprocessing
+    from django.core.management import call_command
+    from django.db import connection, connections
+    from django.utils import timezone
+    from api.models import Message
+
+    call_command("migrate", verbosity=0)
+    now = timezone.now()
+    Message.objects.bulk_create(
+        Message(sender_name="Bench", receiver_name=f"User {i}", receiver_phone="+2348012345678",
+                message="Seed", scheduled_time=now)
+        for i in range(args.seed)
+    )
+    journal = connection.cursor().execute("PRAGMA journal_mode").fetchone()[0]
+    connections.close_all()
+
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    deadline = time.monotonic() + args.seconds
+    procs = [context.Process(target=reader, args=(deadline, results)) for _ in range(args.readers)]
+    procs += [context.Process(target=writer, args=(i, deadline, results)) for i in range(args.writers)]
+    for proc in procs:
+        proc.start()
+    totals = {"read": [0, 0, []], "write": [0, 0, []]}
+    for _ in procs:
+        kind, ok, errors, latencies = results.get()
+        totals[kind][0] += ok
+        totals[kind][1] += errors
+        totals[kind][2].extend(latencies)
+    for proc in procs:
+        proc.join()
+
+    report = {"journal_mode": journal}
+    for kind, (ok, errors, latencies) in totals.items():
+        report[kind] = {
+            "per_second": round(ok / args.seconds, 1),
+            "errors": errors,
+            "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+            "max_ms": round(max(latencies, default=0) * 1000, 1),
+        }
+    print(json.dumps(report))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--seed", type=int, default=10_000)
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run(args)
+        return
+
+    for mode, overrides in MODES.items():
+        with tempfile.TemporaryDirectory() as tmp:
+            env = {**os.environ, **overrides, "DB_ENGINE": "sqlite",
+                   "SQLITE_PATH": os.path.join(tmp, "bench.sqlite3")}
+            out = subprocess.run(
+                [sys.executable, __file__, "--mode", mode, *sys.argv[1:]],
+                env=env, capture_output=True, text=True, check=True
+            ).stdout
+        report = json.loads(out.strip().splitlines()[-1])
+        print(f"{mode:>6} ({report['journal_mode']}):")
+        for kind in ("read", "write"):
+            r = report[kind]
+            print(f"    {kind:>5}: {r['per_second']:>8}/s  errors {r['errors']:>5}  "
+                  f"p99 {r['p99_ms']:>7} ms  max {r['max_ms']:>7} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+"""Show the scheduler's due-scan stays flat as sent history grows.
+
+Seeds a throwaway test database with N already-sent rows plus a fixed
+number of due rows, then times the tick's query and prints its plan:
+
+    API_KEY=x python benchmarks/due_scan.py --history 10000 100000 1000000
+"""
+import argparse, os, sys, time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
+
+import django
+django.setup()
+
+from django.db import connection
+from django.utils import timezone
+from api.models import Message
+
+CHUNK = 50_000
+
+
+def seed(count, sent):
+    now = timezone.now()
+    for start in range(0, count, CHUNK):
+        Message.objects.bulk_create(
+            Message(
+                sender_name="Bench",
+                receiver_name=f"User {i}",
+                receiver_phone=f"+234801{i % 10_000_000:07d}",
+                message="x" * 160,
+                scheduled_time=now - timedelta(days=30, seconds=i) if sent else now - timedelta(seconds=i),
+                sent_at=now - timedelta(days=30) if sent else None,
+                status=Message.Status.SENT if sent else Message.Status.PENDING,
+            )
+            for i in range(start, min(start + CHUNK, count))
+        )
+
+
+def due_query():
+    return Message.objects.filter(scheduled_time__lte=timezone.now(), status=Message.Status.PENDING)
+
+
+def time_query(repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        list(due_query().values_list("id", flat=True))
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--history", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--due", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        seed(args.due, sent=False)
+        seeded = 0
+        print(f"{'history':>10} {'due':>6} {'best ms':>9}")
+        for target in sorted(args.history):
+            seed(target - seeded, sent=True)
+            seeded = target
+            print(f"{target:>10} {args.due:>6} {time_query(args.repeat) * 1000:>9.2f}")
+        print("plan:", due_query().explain())
+    finally:
+        connection.creation.destroy_test_db(connection.settings_dict["NAME"], verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+"""Compare one-shot ``requests.post`` against the pooled ``KudiProvider``.
+
+Runs against the local mock Kudi server, so it only measures connection
+setup and HTTP overhead:
+
+    API_KEY=x python benchmarks/gateway_keepalive.py --requests 500
+"""
+import argparse, os, sys, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
+
+import django
+django.setup()
+
+import requests
+from sender.providers import KudiProvider
+from sender.mock_gateway import MockKudiServer
+
+ROWS = [("+2348012345678", "Hi John,\n\nHello\n\n- Dennis")]
+
+
+def bench(label, send, count):
+    started = time.perf_counter()
+    for _ in range(count):
+        send()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<14} {count / elapsed:8.0f} req/s  {elapsed * 1000 / count:6.2f} ms/req")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    with MockKudiServer() as server:
+        payload = {"token": "x", "gateway": 2, "data": [["DjangoApp", *ROWS[0]]]}
+        bench("requests.post", lambda: requests.post(server.url, json=payload, timeout=15), args.requests)
+
+        client = KudiProvider(base_url=server.url, token="x", pool_size=1)
+        bench("KudiProvider", lambda: client.send(ROWS), args.requests)
+        print("client stats:", client.stats())
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+"""Per-row cost of rendering a message list: DRF serializer vs fast path.
+
+    API_KEY=x python benchmarks/response_serializer.py --rows 100 --repeat 200
+"""
+import argparse, os, sys, time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
+
+import django
+django.setup()
+
+from django.db import connection
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from api.models import Message
+from api.renderers import FastJSONRenderer, orjson
+from api.serializers import MessageResponseSerializer, serialize_messages
+
+
+def bench(label, render, rows, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        render()
+        best = min(best, time.perf_counter() - started)
+    print(f"{label:<28} {best * 1e6 / rows:8.1f} us/row")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        now = timezone.now()
+        Message.objects.bulk_create(
+            Message(sender_name="Bench", receiver_name=f"User {i}", receiver_phone=f"+234801{i:07d}",
+                    message="x" * 160, scheduled_time=now + timedelta(hours=1),
+                    sent_at=now if i % 2 else None)
+            for i in range(args.rows)
+        )
+        queryset = Message.objects.all()[:args.rows]
+
+        slow = bench("DRF serializer + JSONRenderer",
+                     lambda: JSONRenderer().render(MessageResponseSerializer(queryset, many=True).data),
+                     args.rows, args.repeat)
+        fast = bench("values_list + FastJSONRenderer",
+                     lambda: FastJSONRenderer().render(serialize_messages(queryset)),
+                     args.rows, args.repeat)
+        print(f"speedup {slow / fast:.1f}x (orjson {'on' if orjson else 'off'})")
+    finally:
+        connection.creation.destroy_test_db(connection.settings_dict["NAME"], verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
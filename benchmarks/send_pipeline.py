@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+"""Load-test the whole send tick offline against the in-process mock gateway.
+
+    API_KEY=x python benchmarks/send_pipeline.py --due 20000 --latency 0.05 \
+        --batch-size 100 --concurrency 8 --rate 1000
+"""
+import argparse, json, os, sys
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
+
+import django
+django.setup()
+
+from django.db import connection
+from django.utils import timezone
+from api.models import Message
+from sender import views
+from sender.mock_gateway import MockProvider
+from sender.providers import set_provider
+from sender.ratelimit import TokenBucket
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--due", type=int, default=10_000)
+    parser.add_argument("--latency", type=float, default=0.05, help="mock seconds per request")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--max-rps", type=float, default=0.0, help="mock throttling threshold")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=1000, help="sender's own requests/second cap")
+    args = parser.parse_args()
+
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        past = timezone.now() - timedelta(minutes=1)
+        Message.objects.bulk_create(
+            (Message(sender_name="Bench", receiver_name=f"User {i}", receiver_phone=f"+234801{i:07d}",
+                     message="Scheduled campaign message", scheduled_time=past)
+             for i in range(args.due)),
+            batch_size=5000
+        )
+        provider = MockProvider(latency=args.latency, error_rate=args.error_rate,
+                                max_rps=args.max_rps or None, seed=0)
+        set_provider(provider)
+        views._rate_limiter = TokenBucket(args.rate)
+
+        stats = views.dispatch_due_messages(batch_size=args.batch_size, concurrency=args.concurrency)
+        print(json.dumps(stats, indent=2))
+    finally:
+        connection.creation.destroy_test_db(connection.settings_dict["NAME"], verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
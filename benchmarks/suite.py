@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+"""End-to-end benchmark suite: API endpoints and the scheduler tick.
+
+Seeds a throwaway test database with N historical (sent) and M due rows
+from a fixed random seed, then measures create, list and get through the
+full Django stack, claiming single pages off the full due backlog, and one
+sender tick against the local mock Kudi server.
+Each benchmark reports ops/sec, p50/p95/p99 latency, queries per op and
+peak Python memory (the tick's is traced while it runs, so its throughput
+reads low). Save the JSON and compare it on the next commit:
+
+    API_KEY=x python benchmarks/suite.py --historical 100000 --due 5000 --output before.json
+    API_KEY=x python benchmarks/suite.py --historical 100000 --due 5000 --compare before.json
+
+Per-page claim cost should not grow with the backlog; check it at a
+realistic size with ``--historical 0 --due 200000``.
+"""
+import argparse, json, os, random, subprocess, sys, time, tracemalloc
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
+
+import django
+django.setup()
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from api.models import Message
+from sender import views
+from sender.mock_gateway import MockKudiServer
+from sender.providers import KudiProvider, set_provider
+from sender.ratelimit import TokenBucket
+from app.settings import CLAIM_LEASE_SECONDS, DUE_PAGE_SIZE
+
+CHUNK = 20_000
+HOST = "localhost"
+# Lower is better for these; everything else higher is better.
+LOWER_IS_BETTER = ("p50_ms", "p95_ms", "p99_ms", "queries_per_op", "peak_kb")
+
+
+def seed(rng, historical, due):
+    now = timezone.now()
+    bodies = [f"Campaign {i}: your order update" for i in range(20)]
+
+    def row(i, sent):
+        when = now - timedelta(days=rng.randint(1, 365)) if sent else now - timedelta(seconds=rng.randint(1, 3600))
+        return Message(
+            sender_name=f"Shop {i % 50}",
+            receiver_name=f"User {i}",
+            receiver_phone=f"+234{rng.randint(7000000000, 9099999999)}",
+            message=rng.choice(bodies),
+            scheduled_time=when,
+            sent_at=when if sent else None,
+            status=Message.Status.SENT if sent else Message.Status.PENDING,
+        )
+
+    for start in range(0, historical, CHUNK):
+        Message.objects.bulk_create(row(i, True) for i in range(start, min(start + CHUNK, historical)))
+    Message.objects.bulk_create(row(historical + i, False) for i in range(due))
+
+
+def percentile(samples, pct):
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))] if samples else 0.0
+
+
+def measure(operation, count, memory_ops=50):
+    """Run ``operation`` ``count`` times; latency, queries and peak memory.
+
+    tracemalloc slows Python down several-fold, so peak memory comes from a
+    separate run of ``memory_ops`` operations after the timed ones.
+    """
+    latencies = []
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        for _ in range(count):
+            op_started = time.perf_counter()
+            operation()
+            latencies.append(time.perf_counter() - op_started)
+        elapsed = time.perf_counter() - started
+    latencies.sort()
+    result = {
+        "ops": count,
+        "ops_per_sec": round(count / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "queries_per_op": round(len(queries) / count, 2),
+    }
+    if memory_ops:
+        tracemalloc.start()
+        for _ in range(memory_ops):
+            operation()
+        result["peak_kb"] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+        tracemalloc.stop()
+    return result
+
+
+def bench_api(rng, requests):
+    client = Client(HTTP_HOST=HOST)
+    ids = list(Message.objects.values_list("id", flat=True))
+    future = (timezone.now() + timedelta(days=1)).isoformat()
+
+    def create():
+        resp = client.post("/messages/", {
+            "sender_name": "Bench", "receiver_name": "Load", "receiver_phone": "+2348012345678",
+            "message": "Benchmark create", "scheduled_time": future,
+        }, content_type="application/json")
+        assert resp.status_code == 201, resp.content
+
+    def list_page():
+        resp = client.get(f"/messages/list/?limit=50&skip={rng.randint(0, 1000)}")
+        assert resp.status_code == 200
+
+    def get_one():
+        resp = client.get(f"/messages/{rng.choice(ids)}/")
+        assert resp.status_code == 200
+
+    return {
+        "create": measure(create, requests),
+        "list": measure(list_page, requests),
+        "get": measure(get_one, requests),
+    }
+
+
+def bench_claim(pages):
+    """Claim and release one page at a time; the backlog stays at full size."""
+    lease = timedelta(seconds=CLAIM_LEASE_SECONDS)
+
+    def claim_page():
+        token, rows = views.claim_due_page(timezone.now(), DUE_PAGE_SIZE, lease)
+        assert rows
+        views.release_claims([token])
+
+    result = measure(claim_page, pages, memory_ops=0)
+    result["page_size"] = DUE_PAGE_SIZE
+    return result
+
+
+def bench_tick(due):
+    """One tick draining all ``due`` rows; memory is traced on that same tick."""
+    with MockKudiServer() as server:
+        provider = KudiProvider(base_url=server.url, token="bench")
+        previous = set_provider(provider)
+        views._rate_limiter = TokenBucket(1_000_000)
+        stats = {}
+        try:
+            tracemalloc.start()
+            result = measure(lambda: stats.update(views.dispatch_due_messages()), 1, memory_ops=0)
+            result["peak_kb"] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+            tracemalloc.stop()
+        finally:
+            set_provider(previous)
+            provider.close()
+    result["msgs_per_sec"] = stats["per_second"]
+    result["sent"] = stats["sent"]
+    result["queries_per_msg"] = round(result["queries_per_op"] / max(1, due), 3)
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline):
+    print(f"\n{'benchmark':<8} {'metric':<15} {'baseline':>12} {'current':>12} {'change':>9}")
+    for name, metrics in current["results"].items():
+        for metric, value in metrics.items():
+            before = baseline["results"].get(name, {}).get(metric)
+            if not isinstance(value, (int, float)) or not before:
+                continue
+            change = (value - before) / before * 100
+            worse = change > 0 if metric in LOWER_IS_BETTER else change < 0
+            flag = " !" if worse and abs(change) >= 10 else ""
+            print(f"{name:<8} {metric:<15} {before:>12} {value:>12} {change:>+8.1f}%{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--historical", type=int, default=100_000)
+    parser.add_argument("--due", type=int, default=5_000)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--pages", type=int, default=20, help="Pages claimed by the claim benchmark")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the results JSON here")
+    parser.add_argument("--compare", help="Baseline results JSON to diff against")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        started = time.perf_counter()
+        seed(rng, args.historical, args.due)
+        seeded = time.perf_counter() - started
+        results = {"claim": bench_claim(args.pages), "tick": bench_tick(args.due)}
+        results.update(bench_api(rng, args.requests))
+    finally:
+        connection.creation.destroy_test_db(connection.settings_dict["NAME"], verbosity=0)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": timezone.now().isoformat(),
+        "params": {**vars(args), "seed_seconds": round(seeded, 2), "vendor": connection.vendor},
+        "results": results,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as out:
+            json.dump(report, out, indent=2)
+    if args.compare:
+        with open(args.compare) as baseline:
+            compare(report, json.load(baseline))
+
+
+if __name__ == "__main__":
+    main()
@@ -13,5 +13,5 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
 django.setup()
 
 # 3. fire the same function the scheduler uses
-from sender.views import send_due_messages
-send_due_messages()
\ No newline at end of file
+from sender.views import dispatch_due_messages
+dispatch_due_messages()
\ No newline at end of file
@@ -4,10 +4,28 @@ class SenderConfig(AppConfig):
     name = 'sender'
 
     def ready(self):
+        from django.db.models.signals import post_save
+        from api.models import Message, Schedule
+        from api.signals import messages_bulk_created
+        from .health import collect_queue_metrics
+        from .metrics import REGISTRY
+        from .signals import wake_scheduler, wake_scheduler_bulk, wake_scheduler_schedule
+        if collect_queue_metrics not in REGISTRY.collectors:
+            REGISTRY.collectors.append(collect_queue_metrics)
+        post_save.connect(wake_scheduler, sender=Message, dispatch_uid='sender_wake_scheduler')
+        post_save.connect(wake_scheduler_schedule, sender=Schedule,
+                          dispatch_uid='sender_wake_scheduler_schedule')
+        messages_bulk_created.connect(wake_scheduler_bulk, sender=Message,
+                                      dispatch_uid='sender_wake_scheduler_bulk')
+
         # make sure we run only once (manage.py runserver spawns 2 processes)
         import os
         if os.environ.get('RUN_MAIN', None) != 'true':
             return
+        # a dedicated `manage.py run_sender` does the sending instead
+        from django.conf import settings
+        if not settings.SENDER_IN_PROCESS:
+            return
         
         from .views import start_scheduler
         start_scheduler()
\ No newline at end of file
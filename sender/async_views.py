@@ -0,0 +1,87 @@
+# ------------------------------------------------------------------
+# Async due-message dispatch, for ASGI deployments
+# ------------------------------------------------------------------
+# Same claim/send/write-back cycle as dispatch_due_messages, but the
+# provider requests are coroutines on one event loop: a tick waiting on the
+# gateway holds no threads, and an ASGI worker keeps serving requests while
+# it runs. Database work goes through sync_to_async, one statement batch at
+# a time, exactly as the sync path issues it.
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from app.settings import (
+    KUDI_BATCH_SIZE,
+    KUDI_CONCURRENCY,
+    DUE_PAGE_SIZE,
+    CLAIM_LEASE_SECONDS
+)
+from datetime import timedelta
+from . import views
+from .metrics import DB_SECONDS, GATEWAY_SECONDS
+from .providers import get_provider
+import asyncio, logging, time
+
+logger = logging.getLogger()
+
+
+async def asend_batch(send, provider, batch, limit):
+    """Send one batch once a concurrency slot and a rate-limit token are free."""
+    async with limit:
+        await views._rate_limiter.aacquire()
+        rows = [(msg.receiver_phone, views.render_sms(msg)) for msg in batch]
+        try:
+            with GATEWAY_SECONDS.time(provider=provider.name):
+                result = await send(rows)
+        except Exception as exc:
+            return batch, *views.transport_failure(provider, batch, exc)
+        return batch, *views.split_result(provider, batch, result)
+
+
+async def adispatch_due_messages(batch_size=None, concurrency=None, page_size=None):
+    """Async ``dispatch_due_messages``: at most ``concurrency`` requests in flight."""
+    logger.info("Running scheduled message job (async)...")
+    started = time.monotonic()
+    batch_size = max(1, batch_size or KUDI_BATCH_SIZE)
+    concurrency = max(1, concurrency or KUDI_CONCURRENCY)
+    page_size = max(batch_size, page_size or DUE_PAGE_SIZE)
+
+    lease = timedelta(seconds=CLAIM_LEASE_SECONDS)
+    provider = get_provider()
+    limit = asyncio.Semaphore(concurrency)
+    await sync_to_async(views.expand_schedules)()
+
+    due_count = sent_count = failed_count = dead_count = suppressed_count = deferred_count = 0
+    tokens = []
+    async with provider.async_session(concurrency) as send:
+        while True:
+            with DB_SECONDS.time(phase='fetch'):
+                token, page = await sync_to_async(views.claim_due_page)(timezone.now(), page_size, lease)
+            if not page:
+                break
+            tokens.append(token)
+            claimed = len(page)
+            due_count += claimed
+            page, suppressed, deferred = await sync_to_async(views.hold_back)(page)
+            suppressed_count += suppressed
+            deferred_count += deferred
+            pending = [asend_batch(send, provider, batch, limit)
+                       for batch in views.chunked(page, batch_size)]
+            for done in asyncio.as_completed(pending):
+                batch, sent, errors = await done
+                sent, dead = await sync_to_async(views.write_back)(batch, sent, errors)
+                sent_count += sent
+                dead_count += dead
+                failed_count += len(errors)
+            if claimed < page_size:
+                break
+    with DB_SECONDS.time(phase='save'):
+        await sync_to_async(views.release_claims)(tokens)
+    return views.tick_report(started, due_count, sent_count, failed_count, dead_count,
+                             suppressed_count, deferred_count)
+
+
+@csrf_exempt
+async def asend_due_messages(request):
+    stats = await adispatch_due_messages()
+    return JsonResponse({"status": "ok", **stats})
@@ -0,0 +1,151 @@
+# ------------------------------------------------------------------
+# Standalone sender daemon (manage.py run_sender)
+# ------------------------------------------------------------------
+# The Message table is the durable queue: rows are claimed with a lease
+# (see claim_due_page), so any number of daemon processes on any number of
+# hosts can drain it, and rows held by a worker that dies are retried once
+# its lease expires. The web process does not need to run a scheduler.
+from django.db import close_old_connections, connections
+from django.utils import timezone
+from app.settings import KUDI_RATE_LIMIT, SENDER_HEARTBEAT_TTL
+from datetime import timedelta
+from .metrics import serve_metrics
+from .models import SenderHeartbeat
+from .scheduler import DueTimeScheduler
+from .views import dispatch_due_messages, set_rate_limit, worker_id
+import logging, multiprocessing, signal, threading
+
+logger = logging.getLogger()
+
+# Heartbeats of workers silent this long (killed, or on a host that is gone)
+# are deleted by the live workers' beats.
+HEARTBEAT_RETENTION = timedelta(seconds=10 * SENDER_HEARTBEAT_TTL)
+
+
+class SenderWorker:
+    """One sender process: precise scheduler + heartbeat + clean shutdown.
+
+    The scheduler thread sends; the main thread writes a heartbeat every
+    ``poll_interval`` seconds, so a long tick does not look like a dead
+    worker. SIGTERM/SIGINT stop the scheduler: a tick in progress finishes
+    its current page and releases any unsent claims, and the heartbeat row
+    is removed before the process exits. With ``metrics_port`` set the
+    worker also serves its send-pipeline metrics at ``:port/metrics``.
+    ``rate_limit`` (requests per second, default KUDI_RATE_LIMIT) is this
+    worker's share of the provider's quota.
+    """
+
+    def __init__(self, poll_interval=5, batch_size=None, concurrency=None, page_size=None,
+                 metrics_port=None, rate_limit=None):
+        self.poll_interval = poll_interval
+        self.metrics_port = metrics_port
+        self.rate_limit = rate_limit
+        self.tick_options = {
+            'batch_size': batch_size,
+            'concurrency': concurrency,
+            'page_size': page_size,
+        }
+        self.worker_id = worker_id()
+        self.started_at = timezone.now()
+        self.last_tick = {}
+        self._stop = threading.Event()
+        self.scheduler = DueTimeScheduler(
+            self.tick,
+            max_sleep=poll_interval,
+            retry_after=poll_interval
+        )
+
+    def tick(self):
+        # Long-lived thread: drop connections the server closed or that
+        # outlived CONN_MAX_AGE, as Django does around each request.
+        close_old_connections()
+        try:
+            self.last_tick = dispatch_due_messages(
+                should_stop=lambda: self.scheduler.stopping, **self.tick_options
+            )
+        finally:
+            close_old_connections()
+
+    def beat(self):
+        # Two autocommit statements rather than update_or_create: on SQLite a
+        # read-then-write transaction fails at once under writer contention
+        # instead of waiting for the lock.
+        now = timezone.now()
+        fields = {'last_beat_at': now, 'last_tick': self.last_tick}
+        if not SenderHeartbeat.objects.filter(worker_id=self.worker_id).update(**fields):
+            SenderHeartbeat.objects.create(
+                worker_id=self.worker_id, started_at=self.started_at, **fields
+            )
+        SenderHeartbeat.objects.filter(last_beat_at__lt=now - HEARTBEAT_RETENTION).delete()
+
+    def beat_safely(self):
+        close_old_connections()
+        try:
+            self.beat()
+        except Exception:
+            logger.exception("Sender heartbeat failed")
+
+    def stop(self, *args):
+        self._stop.set()
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        if self.rate_limit:
+            set_rate_limit(self.rate_limit)
+        logger.info(f"Sender worker {self.worker_id} started")
+        metrics_server = serve_metrics(self.metrics_port) if self.metrics_port else None
+        self.beat_safely()
+        self.scheduler.start()
+        while not self._stop.wait(self.poll_interval):
+            self.beat_safely()
+        logger.info(f"Sender worker {self.worker_id} shutting down")
+        self.scheduler.shutdown(wait=True)
+        SenderHeartbeat.objects.filter(worker_id=self.worker_id).delete()
+        if metrics_server:
+            metrics_server.shutdown()
+            metrics_server.server_close()
+        connections.close_all()
+
+
+def _run_child(options):
+    SenderWorker(**options).run()
+
+
+def run_sender(processes=1, **options):
+    """Run ``processes`` workers; the parent forwards SIGTERM/SIGINT.
+
+    Each worker keeps its own metrics, so with ``metrics_port`` worker ``i``
+    listens on ``metrics_port + i``. Each also keeps its own rate limiter,
+    so the host's ``rate_limit`` (default KUDI_RATE_LIMIT) is split evenly
+    between them rather than granted to each.
+    """
+    if processes <= 1:
+        SenderWorker(**options).run()
+        return
+
+    # Children must not share the parent's database sockets.
+    connections.close_all()
+    context = multiprocessing.get_context('fork')
+    port = options.pop('metrics_port', None)
+    options['rate_limit'] = (options.get('rate_limit') or KUDI_RATE_LIMIT) / processes
+    children = [
+        context.Process(
+            target=_run_child,
+            args=({**options, 'metrics_port': port + i if port else None},),
+            daemon=False
+        )
+        for i in range(processes)
+    ]
+    for child in children:
+        child.start()
+
+    def forward(signum, frame):
+        for child in children:
+            if child.is_alive():
+                child.terminate()
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+
+    for child in children:
+        child.join()
@@ -0,0 +1,168 @@
+# ------------------------------------------------------------------
+# Send-time duplicate suppression and per-recipient rate limiting
+# ------------------------------------------------------------------
+# The idempotency key stops a client creating the same message twice; this
+# catches what it cannot: two different rows carrying the same text to the
+# same number, and a number receiving more than its share. Both structures
+# live in the sender process's memory and hold 64-bit fingerprints rather
+# than the texts, so a window of traffic costs a few dozen bytes a row.
+# They are per process: workers on other hosts or other run_sender
+# processes keep their own windows.
+#
+# Rows written by a recurring schedule are never duplicates: repeating the
+# same text is the point, and each occurrence already has its own
+# idempotency key. They still count toward the recipient cap.
+from api import sms
+from api.schedules import is_occurrence
+import hashlib, threading, time
+
+
+def fingerprint(*parts):
+    """64-bit blake2b digest of ``parts`` as an int."""
+    digest = hashlib.blake2b('\0'.join(parts).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+def message_fingerprint(row):
+    """Fingerprint of what the recipient would see: number plus rendered text."""
+    text = sms.render_sms(row.receiver_name, row.body__text, row.sender_name)
+    return fingerprint(row.receiver_phone, text)
+
+
+class WindowedSet:
+    """Fingerprints seen in the last ``window`` seconds, each with a message id.
+
+    Kept in two generations: lookups check both, inserts go to the current
+    one, and every ``window`` seconds the current generation becomes the
+    previous one and the old previous is dropped whole. An entry is
+    remembered for between ``window`` and ``2 * window`` seconds without
+    storing a timestamp per entry.
+    """
+
+    def __init__(self, window, clock=time.monotonic):
+        self.window = window
+        self._clock = clock
+        self._current, self._previous = {}, {}
+        self._rotated = clock()
+
+    def _rotate(self):
+        now = self._clock()
+        elapsed = now - self._rotated
+        if elapsed < self.window:
+            return
+        self._previous = self._current if elapsed < 2 * self.window else {}
+        self._current = {}
+        self._rotated = now
+
+    def get(self, key):
+        self._rotate()
+        value = self._current.get(key)
+        return self._previous.get(key) if value is None else value
+
+    def add(self, key, value):
+        self._rotate()
+        self._current[key] = value
+
+    def discard(self, key, value):
+        """Remove ``key`` wherever it still maps to ``value``."""
+        for generation in (self._current, self._previous):
+            if generation.get(key) == value:
+                del generation[key]
+
+    def __len__(self):
+        return len(self._current) + len(self._previous)
+
+
+class WindowedCounter:
+    """Per-key counts over fixed ``window``-second windows, capped at ``limit``."""
+
+    def __init__(self, limit, window, clock=time.monotonic):
+        self.limit = limit
+        self.window = window
+        self._clock = clock
+        self._counts = {}
+        self._started = clock()
+
+    def _roll(self):
+        now = self._clock()
+        if now - self._started >= self.window:
+            self._counts = {}
+            self._started = now
+        return now
+
+    def take(self, key):
+        """Count one for ``key``; False, counting nothing, once it is at the limit."""
+        self._roll()
+        count = self._counts.get(key, 0)
+        if count >= self.limit:
+            return False
+        self._counts[key] = count + 1
+        return True
+
+    def give_back(self, key):
+        count = self._counts.get(key, 0)
+        if count > 1:
+            self._counts[key] = count - 1
+        elif count:
+            del self._counts[key]
+
+    def resets_in(self):
+        """Seconds until the current window ends and every key starts from zero."""
+        return max(0.0, self._started + self.window - self._roll())
+
+
+class SendGuard:
+    """Screens claimed rows before they go to the provider.
+
+    ``dedup_window`` seconds of sent fingerprints (0 turns dedup off) and at
+    most ``max_per_recipient`` sends per number per ``recipient_window``
+    seconds (0 means no cap). Thread-safe: the scheduler and /sms/trigger
+    may tick concurrently in one process.
+    """
+
+    def __init__(self, dedup_window, max_per_recipient, recipient_window, clock=time.monotonic):
+        self.seen = WindowedSet(dedup_window, clock) if dedup_window > 0 else None
+        self.recipients = (
+            WindowedCounter(max_per_recipient, recipient_window, clock)
+            if max_per_recipient > 0 else None
+        )
+        self._lock = threading.Lock()
+
+    def screen(self, rows):
+        """Split claimed rows into ``(send, duplicates, deferred)``.
+
+        ``duplicates`` maps a suppressed row's id to the id of the row that
+        already carried the same text to the same number, in this page or
+        within the window. ``deferred`` are rows whose number is at its cap;
+        they are not counted and can go once ``retry_in()`` has passed.
+        """
+        if self.seen is None and self.recipients is None:
+            return rows, {}, []
+        send, duplicates, deferred = [], {}, []
+        with self._lock:
+            for row in rows:
+                key = (message_fingerprint(row)
+                       if self.seen is not None and not is_occurrence(row.idempotency_key) else None)
+                original = self.seen.get(key) if key is not None else None
+                if original is not None and original != row.id:
+                    duplicates[row.id] = original
+                elif self.recipients is not None and not self.recipients.take(row.receiver_phone):
+                    deferred.append(row)
+                else:
+                    if key is not None:
+                        self.seen.add(key, row.id)
+                    send.append(row)
+        return send, duplicates, deferred
+
+    def forget(self, rows):
+        """Undo ``screen`` for rows that failed to send, so their retry goes out."""
+        with self._lock:
+            for row in rows:
+                if self.seen is not None and not is_occurrence(row.idempotency_key):
+                    self.seen.discard(message_fingerprint(row), row.id)
+                if self.recipients is not None:
+                    self.recipients.give_back(row.receiver_phone)
+
+    def retry_in(self):
+        with self._lock:
+            return self.recipients.resets_in() if self.recipients is not None else 0.0
@@ -0,0 +1,314 @@
+# ------------------------------------------------------------------
+# Delivery reports: buffered in memory, written in batches
+# ------------------------------------------------------------------
+# Providers call /sms/dlr once per message, often in bursts of thousands a
+# second. A row-by-row UPDATE in the request would hold every callback to a
+# database round trip, so the webhook only parses and appends to a
+# DlrBuffer, which writes everything pending in one lookup and one
+# bulk_update when DLR_FLUSH_SIZE reports are waiting or DLR_FLUSH_INTERVAL
+# seconds have passed, whichever comes first.
+#
+# Nothing is lost across a graceful shutdown: close() (run at exit) flushes
+# what is left and, if the database is unreachable, spools it to
+# DLR_SPOOL_PATH for the next process to replay. A hard crash loses at most
+# the last interval's reports; the provider got its 2xx for those already.
+from collections import namedtuple
+from datetime import datetime, timezone as dt_timezone
+from django.db import DatabaseError, close_old_connections, connection
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from api.cache import invalidate_messages
+from api.models import Message
+from app.settings import (
+    DLR_FLUSH_SIZE,
+    DLR_FLUSH_INTERVAL,
+    DLR_MAX_BUFFERED,
+    DLR_UNMATCHED_TTL,
+    DLR_SPOOL_PATH
+)
+from .metrics import DB_SECONDS, DLR_BUFFERED, DLR_FLUSHES, DLR_UNMATCHED
+import atexit, json, logging, os, threading, time
+
+logger = logging.getLogger()
+
+Delivery = Message.Delivery
+
+# ``message_id`` is our row id and ``ref`` the provider's; a report carries
+# at least one. ``received`` is the buffer's clock when it arrived.
+DlrReport = namedtuple('DlrReport', 'message_id ref status at received')
+
+# Provider status strings, SMPP short forms included.
+STATUSES = {
+    'delivrd': Delivery.DELIVERED, 'delivered': Delivery.DELIVERED,
+    'undeliv': Delivery.FAILED, 'undelivered': Delivery.FAILED, 'failed': Delivery.FAILED,
+    'rejectd': Delivery.REJECTED, 'rejected': Delivery.REJECTED,
+    'expired': Delivery.EXPIRED,
+    'acceptd': Delivery.ACCEPTED, 'accepted': Delivery.ACCEPTED, 'enroute': Delivery.ACCEPTED,
+    'sent': Delivery.ACCEPTED, 'buffered': Delivery.ACCEPTED,
+}
+# Once a message has one of these, a late "accepted" does not undo it.
+FINAL = frozenset({Delivery.DELIVERED, Delivery.FAILED, Delivery.REJECTED, Delivery.EXPIRED})
+
+
+def parse_time(value, default):
+    if value in (None, ''):
+        return default
+    if isinstance(value, (int, float)) or str(value).replace('.', '', 1).isdigit():
+        try:
+            return datetime.fromtimestamp(float(value), dt_timezone.utc)
+        except (OSError, OverflowError, ValueError):
+            raise ValueError(f"Timestamp {value!r} is out of range")
+    when = parse_datetime(str(value))
+    if when is None:
+        raise ValueError(f"Unreadable timestamp {value!r}")
+    return when if timezone.is_aware(when) else timezone.make_aware(when, dt_timezone.utc)
+
+
+def parse_report(item, received, now=None):
+    """One provider callback as a DlrReport; ValueError if it is unusable."""
+    if not isinstance(item, dict):
+        raise ValueError("A report is an object")
+    status = STATUSES.get(str(item.get('status') or '').strip().lower())
+    if status is None:
+        raise ValueError(f"Unknown status {item.get('status')!r}")
+    ref = str(item.get('message_id') or '').strip()[:64] or None
+    message_id = item.get('reference')
+    if message_id not in (None, ''):
+        try:
+            message_id = int(message_id)
+        except (TypeError, ValueError):
+            raise ValueError(f"reference {message_id!r} is not a message id")
+    else:
+        message_id = None
+    if ref is None and message_id is None:
+        raise ValueError("A report needs message_id or reference")
+    at = parse_time(item.get('timestamp'), now or timezone.now())
+    return DlrReport(message_id, ref, status, at, received)
+
+
+def newer(report, current):
+    """Whether ``report`` should replace ``current`` for the same message."""
+    if current is None:
+        return True
+    if (report.status in FINAL) != (current.status in FINAL):
+        return report.status in FINAL
+    return report.at >= current.at
+
+
+def write_reports(reports):
+    """Apply ``reports`` in one lookup and one bulk_update.
+
+    Returns ``(rows written, reports that matched no message)``. Several
+    reports for one message collapse to the final or latest one, and a
+    message that already has a final status keeps it.
+    """
+    if not reports:
+        return 0, []
+    refs = {r.ref for r in reports if r.ref is not None}
+    ids = {r.message_id for r in reports if r.message_id is not None}
+    rows = (
+        Message.objects.filter(Q(provider_ref__in=refs) | Q(id__in=ids))
+        .values_list('id', 'provider_ref', 'delivery_status')
+    )
+    by_ref, current = {}, {}
+    for msg_id, ref, status in rows:
+        current[msg_id] = status
+        if ref is not None:
+            by_ref[ref] = msg_id
+
+    best, unmatched = {}, []
+    for report in reports:
+        msg_id = report.message_id if report.message_id in current else by_ref.get(report.ref)
+        if msg_id is None:
+            unmatched.append(report)
+        elif newer(report, best.get(msg_id)):
+            best[msg_id] = report
+
+    updates = [
+        Message(
+            id=msg_id,
+            delivery_status=report.status,
+            delivered_at=report.at if report.status == Delivery.DELIVERED else None
+        )
+        for msg_id, report in best.items()
+        if current[msg_id] not in FINAL and current[msg_id] != report.status
+    ]
+    if updates:
+        Message.objects.bulk_update(updates, ['delivery_status', 'delivered_at'])
+        invalidate_messages([msg.id for msg in updates])
+    return len(updates), unmatched
+
+
+def report_to_json(report):
+    return json.dumps({
+        'message_id': report.ref, 'reference': report.message_id,
+        'status': report.status, 'timestamp': report.at.isoformat()
+    })
+
+
+class DlrBuffer:
+    """Delivery reports waiting to be written, and the thread that writes them.
+
+    ``add`` only appends under a lock, so the webhook answers in well under
+    a millisecond whatever the database is doing. Past ``max_buffered``
+    pending reports it refuses (the webhook answers 503). Reports whose
+    provider id is not stored yet are retried on later flushes for
+    ``unmatched_ttl`` seconds. ``background=False`` leaves flushing to the
+    caller, as the tests do.
+    """
+
+    def __init__(self, flush_size=DLR_FLUSH_SIZE, interval=DLR_FLUSH_INTERVAL,
+                 max_buffered=DLR_MAX_BUFFERED, unmatched_ttl=DLR_UNMATCHED_TTL,
+                 spool_path=DLR_SPOOL_PATH, background=True, clock=time.monotonic):
+        self.flush_size = flush_size
+        self.interval = interval
+        self.max_buffered = max_buffered
+        self.unmatched_ttl = unmatched_ttl
+        self.spool_path = spool_path
+        self.background = background
+        self.clock = clock
+        self.dropped = 0
+        self._pending = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._stopping = False
+        self._replaying = self._claim_spool()
+
+    def __len__(self):
+        return len(self._pending)
+
+    # -----  INTAKE  -----
+    def add(self, reports):
+        """Queue ``reports``; False, queueing none, when the buffer is full."""
+        with self._lock:
+            if len(self._pending) + len(reports) > self.max_buffered:
+                return False
+            self._pending.extend(reports)
+            size = len(self._pending)
+        DLR_BUFFERED.set(size)
+        if size >= self.flush_size:
+            self._wake.set()
+        if self.background and self._thread is None:
+            self.start()
+        return True
+
+    # -----  FLUSHING  -----
+    def flush(self, trigger='interval'):
+        """Write everything pending; returns rows written.
+
+        On a database error the unwritten reports go back in the buffer for
+        the next flush, and the error is raised.
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+            if not pending:
+                return 0
+            DLR_FLUSHES.inc(trigger=trigger)
+            written, retry = 0, []
+            try:
+                for start in range(0, len(pending), self.flush_size):
+                    with DB_SECONDS.time(phase='dlr'):
+                        count, unmatched = write_reports(pending[start:start + self.flush_size])
+                    written += count
+                    retry.extend(unmatched)
+            except DatabaseError:
+                self._requeue(retry + pending[start:])
+                raise
+            now = self.clock()
+            keep = [r for r in retry if now - r.received < self.unmatched_ttl]
+            if len(keep) < len(retry):
+                self.dropped += len(retry) - len(keep)
+                DLR_UNMATCHED.inc(len(retry) - len(keep))
+                logger.warning(f"Dropped {len(retry) - len(keep)} delivery reports matching no message")
+            self._requeue(keep)
+            if self._replaying:
+                os.unlink(self._replaying)
+                self._replaying = None
+            return written
+
+    def _requeue(self, reports):
+        with self._lock:
+            self._pending[:0] = reports
+            size = len(self._pending)
+        DLR_BUFFERED.set(size)
+
+    # -----  THREAD  -----
+    def start(self):
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='dlr-flusher', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopping:
+            triggered = self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stopping:
+                break
+            try:
+                self.flush('size' if triggered else 'interval')
+            except DatabaseError:
+                logger.exception("Delivery report flush failed; retrying next interval")
+            finally:
+                close_old_connections()
+        connection.close()
+
+    def close(self):
+        """Stop the thread and write what is left, spooling it if that fails."""
+        self._stopping = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        try:
+            self.flush('shutdown')
+        except DatabaseError:
+            logger.exception("Delivery report flush failed at shutdown; spooling")
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if pending:
+            self._spool(pending)
+
+    # -----  SPOOL  -----
+    def _spool(self, reports):
+        # Appended, so workers shutting down together each keep their own.
+        with open(self.spool_path, 'a') as spool:
+            spool.writelines(report_to_json(r) + '\n' for r in reports)
+        logger.warning(f"Spooled {len(reports)} delivery reports to {self.spool_path}")
+
+    def _claim_spool(self):
+        """Load a spool left by an earlier process; returns the claimed file.
+
+        The file is renamed first so only one worker replays it, and kept
+        until a flush has written its reports.
+        """
+        if not self.spool_path or not os.path.exists(self.spool_path):
+            return None
+        claimed = f"{self.spool_path}.{os.getpid()}"
+        try:
+            os.replace(self.spool_path, claimed)
+        except FileNotFoundError:
+            return None
+        received = self.clock()
+        with open(claimed) as spool:
+            for line in spool:
+                if line.strip():
+                    self._pending.append(parse_report(json.loads(line), received))
+        logger.info(f"Replaying {len(self._pending)} spooled delivery reports")
+        return claimed
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+def get_dlr_buffer():
+    """The process's buffer, created on first use and closed at exit."""
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = DlrBuffer()
+            atexit.register(_buffer.close)
+        return _buffer
@@ -0,0 +1,73 @@
+from django.db.models import Count, Min
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from api.models import Message
+from .metrics import LANE_DUE, LANE_LAG, MESSAGES_DUE, QUEUE_LAG
+from .models import SenderHeartbeat
+from datetime import timedelta
+
+
+def due_rows(now):
+    """Pending rows due at ``now``, annotated with ``due_at``.
+
+    A row backing off after a failure counts from its retry time rather
+    than its scheduled time.
+    """
+    return Message.objects.filter(
+        sent_at__isnull=True,
+        status=Message.Status.PENDING,
+        scheduled_time__lte=now
+    ).annotate(
+        due_at=Coalesce('next_attempt_at', 'scheduled_time')
+    ).filter(due_at__lte=now)
+
+
+def due_backlog(now=None):
+    """``(count, oldest)`` of pending rows that are due right now."""
+    backlog = due_rows(now or timezone.now()).aggregate(count=Count('id'), oldest=Min('due_at'))
+    return backlog['count'], backlog['oldest']
+
+
+def lane_backlog(now=None):
+    """``{lane: (count, oldest)}`` for every lane, in one grouped query."""
+    backlog = {lane: (0, None) for lane in Message.Priority.values}
+    rows = due_rows(now or timezone.now()).order_by().values('priority').annotate(
+        count=Count('id'), oldest=Min('due_at')
+    )
+    for row in rows:
+        backlog[row['priority']] = (row['count'], row['oldest'])
+    return backlog
+
+
+def lag_seconds(now, oldest):
+    return round((now - oldest).total_seconds(), 3) if oldest else 0.0
+
+
+def queue_health(stale_after):
+    """Ready/lag summary of the outbound queue.
+
+    ``workers`` counts sender processes that beat in the last
+    ``stale_after`` seconds. ``lag_seconds`` is how far behind the queue is:
+    now minus the oldest pending row that is due.
+    """
+    now = timezone.now()
+    live = SenderHeartbeat.objects.filter(
+        last_beat_at__gte=now - timedelta(seconds=stale_after)
+    ).count()
+    _, oldest = due_backlog(now)
+    return {
+        "ready": live > 0,
+        "workers": live,
+        "lag_seconds": lag_seconds(now, oldest)
+    }
+
+
+def collect_queue_metrics():
+    """Refresh the due/lag gauges, overall and per lane; a scrape-time collector."""
+    now = timezone.now()
+    backlog = lane_backlog(now)
+    for lane, (count, oldest) in backlog.items():
+        LANE_DUE.set(count, lane=lane)
+        LANE_LAG.set(lag_seconds(now, oldest), lane=lane)
+    MESSAGES_DUE.set(sum(count for count, _ in backlog.values()))
+    QUEUE_LAG.set(lag_seconds(now, min((oldest for _, oldest in backlog.values() if oldest), default=None)))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from sender.daemon import run_sender
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the SMS sender as its own process, draining due messages until "
+        "SIGTERM/SIGINT. Set SENDER_IN_PROCESS=False on the web tier when "
+        "using this."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1,
+                            help="Worker processes to fork (default 1)")
+        parser.add_argument('--poll-interval', type=float, default=5,
+                            help="Longest sleep between due checks, and heartbeat interval, in seconds")
+        parser.add_argument('--batch-size', type=int, help="Defaults to KUDI_BATCH_SIZE")
+        parser.add_argument('--concurrency', type=int, help="Defaults to KUDI_CONCURRENCY")
+        parser.add_argument('--page-size', type=int, help="Defaults to DUE_PAGE_SIZE")
+        parser.add_argument('--metrics-port', type=int,
+                            help="Serve Prometheus metrics on this port (worker i uses port + i)")
+        parser.add_argument('--rate-limit', type=float,
+                            help="This host's provider requests per second, split between the "
+                                 "processes (default KUDI_RATE_LIMIT)")
+
+    def handle(self, *args, **options):
+        run_sender(
+            processes=options['processes'],
+            poll_interval=options['poll_interval'],
+            batch_size=options['batch_size'],
+            concurrency=options['concurrency'],
+            page_size=options['page_size'],
+            metrics_port=options['metrics_port'],
+            rate_limit=options['rate_limit']
+        )
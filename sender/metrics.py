@@ -0,0 +1,204 @@
+# ------------------------------------------------------------------
+# Minimal Prometheus-style metrics for the send pipeline
+# ------------------------------------------------------------------
+# Counters and histograms live in process memory and are rendered in the
+# Prometheus text format (version 0.0.4). Each process exposes its own:
+# the web process at /metrics, run_sender workers via --metrics-port.
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import bisect, threading, time
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; spans a fast local DB query up to the 15 s gateway timeout.
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            lines.extend(self._samples())
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        return [f"{self.name}{_labels(self.labelnames, key)} {value}"
+                for key, value in sorted(self._values.items())]
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # [per-bucket counts, sum, count]; cumulated at render time
+                series = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), [None, None, 0])[2]
+
+    def _samples(self):
+        lines = []
+        for key, (counts, total, count) in sorted(self._values.items()):
+            running = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                running += bucket_count
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames + ('le',), key + (bound,))} {running}")
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames + ('le',), key + ('+Inf',))} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        # Called before each scrape to refresh gauges computed on demand.
+        self.collectors = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        for collect in self.collectors:
+            collect()
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        for metric in self.metrics:
+            metric.reset()
+
+
+REGISTRY = Registry()
+
+MESSAGES_DUE = REGISTRY.register(Gauge(
+    'sms_messages_due', "Pending messages whose send time has passed."))
+QUEUE_LAG = REGISTRY.register(Gauge(
+    'sms_queue_lag_seconds', "Now minus the oldest due pending message's send time."))
+LANE_DUE = REGISTRY.register(Gauge(
+    'sms_lane_messages_due', "Pending messages whose send time has passed, by lane.", ['lane']))
+LANE_LAG = REGISTRY.register(Gauge(
+    'sms_lane_lag_seconds', "Now minus the oldest due pending message's send time, by lane.", ['lane']))
+MESSAGES_SENT = REGISTRY.register(Counter(
+    'sms_messages_sent_total', "Messages accepted by the provider.", ['provider']))
+SEND_ERRORS = REGISTRY.register(Counter(
+    'sms_send_errors_total', "Rejected or failed messages by provider error code.", ['provider', 'code']))
+SEND_RATE = REGISTRY.register(Gauge(
+    'sms_tick_send_rate', "Messages per second sent by the most recent tick."))
+TICKS = REGISTRY.register(Counter(
+    'sms_ticks_total', "Completed send ticks."))
+TICK_SECONDS = REGISTRY.register(Histogram(
+    'sms_tick_duration_seconds', "Wall time of a whole send tick."))
+GATEWAY_SECONDS = REGISTRY.register(Histogram(
+    'sms_gateway_request_seconds', "Latency of one provider batch request.", ['provider']))
+DB_SECONDS = REGISTRY.register(Histogram(
+    'sms_db_seconds', "Database time in the send tick by phase (schedule, fetch, save, dlr).", ['phase']))
+DLR_RECEIVED = REGISTRY.register(Counter(
+    'sms_dlr_received_total', "Delivery reports accepted by the webhook, by status.", ['status']))
+DLR_UNMATCHED = REGISTRY.register(Counter(
+    'sms_dlr_unmatched_total', "Delivery reports dropped because no message matched them."))
+DLR_BUFFERED = REGISTRY.register(Gauge(
+    'sms_dlr_buffered', "Delivery reports waiting to be written."))
+DLR_FLUSHES = REGISTRY.register(Counter(
+    'sms_dlr_flushes_total', "Delivery report flushes, by trigger (size, interval, shutdown).", ['trigger']))
+HELD_BACK = REGISTRY.register(Counter(
+    'sms_held_back_total', "Due messages not sent: duplicates suppressed or rate-limited recipients deferred.", ['reason']))
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_metrics(port, host=''):
+    """Serve REGISTRY at http://host:port/metrics from a daemon thread."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    return server
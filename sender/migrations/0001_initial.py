@@ -0,0 +1,24 @@
+# Generated by Django 6.0 on 2026-10-16 23:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SenderHeartbeat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('worker_id', models.CharField(max_length=64, unique=True)),
+                ('started_at', models.DateTimeField()),
+                ('last_beat_at', models.DateTimeField()),
+                ('last_tick', models.JSONField(blank=True, default=dict)),
+            ],
+        ),
+    ]
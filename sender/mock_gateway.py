@@ -0,0 +1,173 @@
+# ------------------------------------------------------------------
+# Local stand-ins for an SMS gateway, for tests, benchmarks and load tests
+# ------------------------------------------------------------------
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from app.settings import (
+    MOCK_GATEWAY_LATENCY,
+    MOCK_GATEWAY_ERROR_RATE,
+    MOCK_GATEWAY_MAX_RPS
+)
+from .providers import KUDI_OK, SendResult, SmsProvider
+from .ratelimit import TokenBucket
+from contextlib import asynccontextmanager
+import asyncio, json, random, threading, time, uuid
+
+MOCK_ERROR = "109"
+
+
+class MockBehaviour:
+    """Latency, per-row error rate and throttling shared by both mocks.
+
+    ``latency`` is seconds per request, or a ``(low, high)`` range drawn
+    uniformly. ``error_rate`` is the chance each row is rejected with
+    ``MOCK_ERROR``. With ``max_rps`` set, requests past that rate are
+    throttled as a real gateway would (HTTP 429 / ``"throttled"``).
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0, max_rps=None, seed=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.bucket = TokenBucket(max_rps) if max_rps else None
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.throttled = 0
+        self.rows = 0
+        self.phones = []
+
+    def delay(self):
+        if isinstance(self.latency, (tuple, list)):
+            with self._lock:
+                return self._random.uniform(*self.latency)
+        return self.latency
+
+    def handle(self, phones):
+        """Record a request and return per-row codes, or None if throttled."""
+        time.sleep(self.delay())
+        return self.record(phones)
+
+    def record(self, phones):
+        with self._lock:
+            self.requests += 1
+            if self.bucket is not None and not self.bucket.try_acquire():
+                self.throttled += 1
+                return None
+            self.rows += len(phones)
+            self.phones.extend(phones)
+            return [
+                MOCK_ERROR if self.error_rate and self._random.random() < self.error_rate else KUDI_OK
+                for _ in phones
+            ]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "throttled": self.throttled,
+                "rows": self.rows
+            }
+
+
+class MockProvider(MockBehaviour, SmsProvider):
+    """In-process gateway: no sockets, just the configured behaviour."""
+    name = 'mock'
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            latency=MOCK_GATEWAY_LATENCY,
+            error_rate=MOCK_GATEWAY_ERROR_RATE,
+            max_rps=MOCK_GATEWAY_MAX_RPS or None
+        )
+
+    def send_batch(self, rows):
+        return self.result(rows, self.handle([phone for phone, _ in rows]))
+
+    @asynccontextmanager
+    async def async_session(self, concurrency):
+        async def send(rows):
+            await asyncio.sleep(self.delay())
+            return self.result(rows, self.record([phone for phone, _ in rows]))
+        yield send
+
+    @staticmethod
+    def result(rows, codes):
+        if codes is None:
+            return SendResult(["throttled"] * len(rows), "throttled")
+        return SendResult(
+            [None if code == KUDI_OK else code for code in codes], "mock",
+            [uuid.uuid4().hex if code == KUDI_OK else None for code in codes]
+        )
+
+
+class _KudiHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so clients can keep the connection open between requests.
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; without this, delayed ACKs
+    # add ~40 ms to every request on a reused connection.
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        codes = self.server.behaviour.handle([row[1] for row in payload.get("data", [])])
+
+        if codes is None:
+            status, body = 429, {"status": "error", "error_code": "429", "msg": "Too many requests"}
+        else:
+            ok = all(code == KUDI_OK for code in codes)
+            status, body = 200, {
+                "status": "success" if ok else "error",
+                "error_code": KUDI_OK if ok else MOCK_ERROR,
+                "data": [{"error_code": code, "message_id": uuid.uuid4().hex} for code in codes]
+            }
+        body = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockKudiServer(ThreadingHTTPServer):
+    """Kudi-compatible HTTP server on localhost.
+
+    Takes the same options as ``MockBehaviour`` (by default it accepts every
+    row instantly). Use as a context manager; ``url`` points a
+    ``KudiProvider`` at it.
+    """
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, **behaviour):
+        super().__init__((host, port), _KudiHandler)
+        self.behaviour = MockBehaviour(**behaviour)
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/api/autocomposesms"
+
+    @property
+    def requests(self):
+        return self.behaviour.requests
+
+    @property
+    def rows(self):
+        return self.behaviour.rows
+
+    @property
+    def phones(self):
+        return self.behaviour.phones
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
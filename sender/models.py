@@ -1,3 +1,19 @@
 from django.db import models
 
-# Create your models here.
+
+class SenderHeartbeat(models.Model):
+    """Liveness of one ``run_sender`` worker process.
+
+    Written by the worker's main thread every ``poll_interval`` seconds; the
+    sender health endpoint treats a worker as live while its last beat is
+    recent. Rows silent for ``HEARTBEAT_RETENTION`` are pruned by the other
+    workers' beats.
+    """
+    worker_id    = models.CharField(max_length=64, unique=True)
+    started_at   = models.DateTimeField()
+    last_beat_at = models.DateTimeField()
+    # Summary of the worker's most recent tick (see dispatch_due_messages).
+    last_tick    = models.JSONField(default=dict, blank=True)
+
+    def __str__(self):
+        return f"{self.worker_id} @ {self.last_beat_at}"
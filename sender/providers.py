@@ -0,0 +1,209 @@
+# ------------------------------------------------------------------
+# SMS providers: one interface, pluggable gateways
+# ------------------------------------------------------------------
+from collections import namedtuple
+from contextlib import asynccontextmanager
+from requests.adapters import HTTPAdapter
+from app.settings import (
+    API_KEY,        # re-use this field for Kudi token
+    SENDER_ID,      # re-use this field for Kudi senderID
+    KUDI_BASE_URL,
+    KUDI_CONCURRENCY,
+    SMS_PROVIDER
+)
+import asyncio, threading, requests
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# Kudi: new endpoint
+BASE_URL = KUDI_BASE_URL
+KUDI_OK = "000"
+
+# ``errors`` has one entry per row sent: None if the provider accepted it,
+# otherwise the provider's error code. ``detail`` is the raw response for logs.
+# ``refs``, when the provider returns them, are its per-row message ids; its
+# delivery reports name messages by these.
+SendResult = namedtuple('SendResult', 'errors detail refs', defaults=(None,))
+
+
+class SmsProvider:
+    """What the sender needs from an SMS gateway.
+
+    ``send_batch`` takes ``[(phone, text), ...]`` and returns a
+    ``SendResult``; transport failures are raised, not returned. Providers
+    are shared by every worker thread, so implementations must be
+    thread-safe.
+
+    ``async_session`` is the async sender's entry point: it yields a
+    coroutine function with the same contract as ``send_batch``. The default
+    runs ``send_batch`` on a thread; providers with a native async client
+    override it.
+    """
+    name = None
+
+    def send_batch(self, rows):
+        raise NotImplementedError
+
+    @asynccontextmanager
+    async def async_session(self, concurrency):
+        async def send(rows):
+            return await asyncio.to_thread(self.send_batch, rows)
+        yield send
+
+    def stats(self):
+        return {}
+
+    def close(self):
+        pass
+
+
+class KudiProvider(SmsProvider):
+    """Kudi ``autocomposesms`` over one keep-alive ``requests.Session``.
+
+    The connection pool is sized to the sender's worker count, so every
+    batch after the first reuses an open TLS connection instead of paying a
+    fresh handshake.
+    """
+    name = 'kudi'
+
+    def __init__(self, base_url=BASE_URL, token=API_KEY, sender_id=SENDER_ID,
+                 pool_size=KUDI_CONCURRENCY, timeout=15):
+        self.base_url = base_url
+        self.token = token
+        self.sender_id = sender_id
+        self.timeout = timeout
+        self.adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=max(1, pool_size),
+            pool_block=True,
+            max_retries=0
+        )
+        self.session = requests.Session()
+        self.session.headers["Connection"] = "keep-alive"
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+
+    def send(self, rows):
+        """POST ``[(phone, text), ...]`` as one Kudi request."""
+        return self.session.post(self.base_url, json=self.payload(rows), timeout=self.timeout)
+
+    def payload(self, rows):
+        return {
+            "token": self.token,
+            "gateway": 2,
+            "data": [[self.sender_id, phone, text] for phone, text in rows]
+        }
+
+    def send_batch(self, rows):
+        resp = self.send(rows)
+        return SendResult(self.parse_result(resp, len(rows)), resp.text, self.parse_refs(resp, len(rows)))
+
+    @asynccontextmanager
+    async def async_session(self, concurrency):
+        """One ``httpx.AsyncClient`` per tick, holding ``concurrency`` keep-alive connections.
+
+        The client belongs to the running event loop, so it is not kept on
+        the provider. Without httpx this falls back to the threaded default.
+        """
+        if httpx is None:
+            async with super().async_session(concurrency) as send:
+                yield send
+            return
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(limits=limits, timeout=self.timeout) as client:
+            async def send(rows):
+                resp = await client.post(self.base_url, json=self.payload(rows))
+                return SendResult(self.parse_result(resp, len(rows)), resp.text,
+                                  self.parse_refs(resp, len(rows)))
+            yield send
+
+    @staticmethod
+    def parse_result(resp, count):
+        """Per-row error codes from a Kudi response.
+
+        Kudi answers a multi-row request with one ``error_code`` for the
+        whole call. If the body also carries a per-row ``data`` list of the
+        same length as the request, each entry's own ``error_code`` wins for
+        its row.
+        """
+        if resp.status_code == 429:
+            return ["throttled"] * count
+        if resp.status_code != 200:
+            return [f"http_{resp.status_code}"] * count
+        body = resp.json()
+        rows = body.get("data")
+        if isinstance(rows, list) and len(rows) == count and all(
+            isinstance(row, dict) and "error_code" in row for row in rows
+        ):
+            codes = [row["error_code"] for row in rows]
+        else:
+            codes = [body.get("error_code")] * count
+        return [None if code == KUDI_OK else str(code) for code in codes]
+
+    @staticmethod
+    def parse_refs(resp, count):
+        """Per-row ``message_id`` from a Kudi response's ``data`` list, if it has them."""
+        if resp.status_code != 200:
+            return None
+        rows = resp.json().get("data")
+        if not isinstance(rows, list) or len(rows) != count:
+            return None
+        refs = [row.get("message_id") if isinstance(row, dict) else None for row in rows]
+        return [str(ref) if ref not in (None, "") else None for ref in refs]
+
+    def stats(self):
+        """Connection-reuse counters from the underlying urllib3 pools."""
+        pools = self.adapter.poolmanager.pools
+        opened = sent = 0
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            opened += pool.num_connections
+            sent += pool.num_requests
+        return {
+            "requests": sent,
+            "connections": opened,
+            "reused": max(0, sent - opened)
+        }
+
+    def close(self):
+        self.session.close()
+
+
+def _mock_provider():
+    from .mock_gateway import MockProvider
+    return MockProvider.from_settings()
+
+
+PROVIDERS = {
+    'kudi': KudiProvider,
+    'mock': _mock_provider,
+}
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_provider():
+    """Process-wide provider (SMS_PROVIDER) used by every send path."""
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            try:
+                factory = PROVIDERS[SMS_PROVIDER]
+            except KeyError:
+                raise ValueError(f"Unknown SMS_PROVIDER {SMS_PROVIDER!r}; expected one of {sorted(PROVIDERS)}")
+            _provider = factory()
+        return _provider
+
+
+def set_provider(provider):
+    """Swap the process-wide provider (tests, benchmarks, load tests)."""
+    global _provider
+    with _provider_lock:
+        previous, _provider = _provider, provider
+    return previous
@@ -0,0 +1,54 @@
+import asyncio
+import threading
+import time
+
+
+class TokenBucket:
+    """Thread-safe token bucket shared by the sender workers.
+
+    ``rate`` tokens are added per second up to ``capacity``; ``acquire``
+    blocks until a token is available, so the gateway never sees more than
+    ``rate`` requests per second once the initial burst is spent.
+    """
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1, rate))
+        self._tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self):
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def _take(self):
+        """Take a token if one is ready; otherwise return seconds to wait."""
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        while wait := self._take():
+            self._sleep(wait)
+
+    async def aacquire(self):
+        """``acquire`` for the async sender: waits without blocking the loop."""
+        while wait := self._take():
+            await asyncio.sleep(wait)
@@ -0,0 +1,91 @@
+# ------------------------------------------------------------------
+# Failed sends: jittered exponential backoff, then dead letter
+# ------------------------------------------------------------------
+from django.utils import timezone
+from api.cache import invalidate_messages
+from api.models import Message
+from app.settings import (
+    MAX_SEND_ATTEMPTS,
+    MAX_TRANSIENT_FAILURES,
+    RETRY_BASE_SECONDS,
+    RETRY_MAX_SECONDS
+)
+from datetime import timedelta
+import random, re
+
+_random = random.Random()
+
+# Prefix of the error recorded when the request itself failed (connection
+# refused, timeout): nothing was said about the rows.
+TRANSPORT_ERROR = 'transport'
+# Provider answers meaning "not now" rather than "never".
+TRANSIENT_CODE = re.compile(r'^(throttled|http_(408|429|5\d\d))$')
+
+
+def backoff_delay(attempt, base=RETRY_BASE_SECONDS, cap=RETRY_MAX_SECONDS, rand=_random.random):
+    """Seconds to wait after the ``attempt``-th failure (1-based).
+
+    Exponential from ``base`` up to ``cap``, with "equal jitter": half of the
+    delay is fixed and half is random, so rows that failed together (one
+    rejected batch) do not all come back in the same tick.
+    """
+    delay = min(cap, base * 2 ** (attempt - 1))
+    return delay / 2 + rand() * delay / 2
+
+
+def is_transient(error):
+    """Whether ``error`` is throttling or an outage rather than a rejection of the row."""
+    error = str(error)
+    return error.startswith(f"{TRANSPORT_ERROR}:") or TRANSIENT_CODE.match(error) is not None
+
+
+def record_failures(rows, errors, now=None):
+    """Reschedule failed rows, or dead-letter them after MAX_SEND_ATTEMPTS.
+
+    ``rows`` are the claimed due rows (with ``attempt_count`` and
+    ``transient_failures``) and ``errors`` maps their id to the provider's
+    error. Only rejections of the row count as attempts: throttling and
+    transport or 5xx failures back off without using one, so a provider
+    outage delays the backlog instead of dead-lettering it. They have their
+    own count, reset by a rejection, which grows their back-off the same
+    way and dead-letters a row only after MAX_TRANSIENT_FAILURES in a row.
+    One ``bulk_update`` for the whole set. Returns the number of rows moved
+    to dead letter.
+    """
+    if not errors:
+        return 0
+    now = now or timezone.now()
+    updates, dead = [], 0
+    for row in rows:
+        if row.id not in errors:
+            continue
+        error = errors[row.id]
+        if is_transient(error):
+            attempts, failures = row.attempt_count, row.transient_failures + 1
+            streak, limit = failures, MAX_TRANSIENT_FAILURES
+        else:
+            attempts, failures = row.attempt_count + 1, 0
+            streak, limit = attempts, MAX_SEND_ATTEMPTS
+        message = Message(
+            id=row.id,
+            attempt_count=attempts,
+            transient_failures=failures,
+            last_error=str(error)[:255],
+            claimed_by=None,
+            claimed_until=None
+        )
+        if streak >= limit:
+            message.status = Message.Status.DEAD
+            message.next_attempt_at = None
+            dead += 1
+        else:
+            message.status = Message.Status.PENDING
+            message.next_attempt_at = now + timedelta(seconds=backoff_delay(streak))
+        updates.append(message)
+
+    Message.objects.bulk_update(updates, [
+        'status', 'attempt_count', 'transient_failures', 'next_attempt_at', 'last_error',
+        'claimed_by', 'claimed_until'
+    ])
+    invalidate_messages([message.id for message in updates])
+    return dead
@@ -0,0 +1,151 @@
+# ------------------------------------------------------------------
+# Next-due-time scheduler: sleep until the earliest unsent message
+# ------------------------------------------------------------------
+from django.db.models import Min
+from django.utils import timezone
+from api.models import Message, Schedule
+from app.settings import SCHEDULE_WINDOW_SECONDS
+from datetime import timedelta
+import heapq, logging, threading
+
+logger = logging.getLogger()
+
+# Past this many pending wake-ups only the earliest half are kept; the
+# database is re-read after every tick anyway.
+MAX_HEAP = 1024
+
+
+def next_due_times(now):
+    """``(upcoming times, any overdue)`` of pending rows, as of ``now``.
+
+    A row that never failed is due at ``scheduled_time`` (message_due_idx)
+    and one backing off after a failure at ``next_attempt_at``
+    (message_retry_idx). Each lookup is a single seek on its index, so this
+    costs the same with 200 or 200k rows waiting.
+    """
+    pending = Message.objects.filter(status=Message.Status.PENDING)
+    queues = (
+        (pending.filter(next_attempt_at__isnull=True), 'scheduled_time'),
+        (pending.filter(next_attempt_at__isnull=False), 'next_attempt_at'),
+    )
+    upcoming, overdue = [], False
+    for rows, field in queues:
+        upcoming.append(
+            rows.filter(**{f'{field}__gt': now}).order_by(field).values_list(field, flat=True).first()
+        )
+        overdue = overdue or rows.filter(**{f'{field}__lte': now}).exists()
+    return [when for when in upcoming if when is not None], overdue
+
+
+class DueTimeScheduler:
+    """Run ``job`` exactly when the earliest unsent message falls due.
+
+    Wake-up times live in a min-heap seeded from the database and fed by
+    ``notify`` (wired to Message post_save), so a newly created message that
+    is due sooner than anything else interrupts the current sleep. With
+    nothing due the thread only re-reads the earliest due time (a few index
+    seeks) every ``max_sleep`` seconds, which also picks up rows written by other
+    processes. Rows still due after a tick (failed or leased elsewhere) are
+    retried after ``retry_after`` seconds rather than in a tight loop.
+    Recurring schedules wake it ``schedule_window`` seconds before their
+    next run, when the tick would materialize them.
+    """
+
+    def __init__(self, job, max_sleep=60, retry_after=60, schedule_window=SCHEDULE_WINDOW_SECONDS):
+        self.job = job
+        self.max_sleep = max_sleep
+        self.retry_after = timedelta(seconds=retry_after)
+        self.schedule_window = timedelta(seconds=schedule_window)
+        self._heap = []
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def stopping(self):
+        return self._stopping
+
+    def start(self):
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='due-time-scheduler', daemon=True)
+        self._thread.start()
+
+    def shutdown(self, wait=True):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if wait and self._thread:
+            self._thread.join()
+
+    def notify(self, when):
+        """Make sure the scheduler wakes no later than ``when``."""
+        with self._cond:
+            self._push(when)
+            if self._heap[0] == when:
+                self._cond.notify()
+
+    def _push(self, when):
+        heapq.heappush(self._heap, when)
+        if len(self._heap) > MAX_HEAP:
+            self._heap = heapq.nsmallest(MAX_HEAP // 2, self._heap)
+
+    def _seed(self, backoff):
+        """Push the next wake-up times known to the database.
+
+        The next future due time is always pushed. Rows that are
+        already overdue are pushed for now, except right after a tick: then
+        they could not be sent and are retried ``retry_after`` later instead
+        of spinning on them. Schedules count as due once their next run is
+        inside the materialization window, with the same back-off.
+        """
+        now = timezone.now()
+        try:
+            upcoming, overdue = next_due_times(now)
+            next_run = Schedule.objects.filter(active=True).aggregate(at=Min('next_run_at'))['at']
+        except Exception:
+            logger.exception("Could not read the next due time")
+            return
+        with self._cond:
+            for when in upcoming:
+                self._push(when)
+            if next_run is not None:
+                expand_at = next_run - self.schedule_window
+                if expand_at > now:
+                    self._push(expand_at)
+                else:
+                    overdue = True
+            if overdue:
+                self._push(now + self.retry_after if backoff else now)
+
+    def _wait(self):
+        """Sleep until the heap head is due, max_sleep passes, or shutdown."""
+        with self._cond:
+            while not self._stopping:
+                now = timezone.now()
+                if self._heap and self._heap[0] <= now:
+                    while self._heap and self._heap[0] <= now:
+                        heapq.heappop(self._heap)
+                    return 'due'
+                timeout = self.max_sleep
+                if self._heap:
+                    timeout = min(timeout, (self._heap[0] - now).total_seconds())
+                if not self._cond.wait(timeout) and timeout == self.max_sleep:
+                    return 'idle'
+            return 'stop'
+
+    def _run(self):
+        self._seed(backoff=False)
+        while True:
+            state = self._wait()
+            if state == 'stop':
+                return
+            if state == 'due':
+                try:
+                    self.job()
+                except Exception:
+                    logger.exception("Scheduled send tick failed")
+            self._seed(backoff=state == 'due')
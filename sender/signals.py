@@ -0,0 +1,31 @@
+from django.db import transaction
+from app.settings import SCHEDULE_WINDOW_SECONDS
+from datetime import timedelta
+
+
+def _notify(when):
+    from .views import get_scheduler
+    notify = getattr(get_scheduler(), 'notify', None)
+    if notify is not None:
+        notify(when)
+
+
+def wake_scheduler(sender, instance, created, **kwargs):
+    """Wake the precise scheduler when a new message may be due sooner."""
+    if not created or instance.sent_at is not None:
+        return
+    when = instance.scheduled_time
+    transaction.on_commit(lambda: _notify(when))
+
+
+def wake_scheduler_bulk(sender, earliest, **kwargs):
+    """Same as ``wake_scheduler`` for rows inserted with bulk_create."""
+    _notify(earliest)
+
+
+def wake_scheduler_schedule(sender, instance, **kwargs):
+    """Wake the precise scheduler when a schedule's next run enters the window."""
+    if not instance.active or instance.next_run_at is None:
+        return
+    when = instance.next_run_at - timedelta(seconds=SCHEDULE_WINDOW_SECONDS)
+    transaction.on_commit(lambda: _notify(when))
@@ -1,3 +1,1071 @@
-from django.test import TestCase
+from unittest import mock
+from collections import Counter
+from datetime import timedelta
+from pathlib import Path
+import os, random, signal, sqlite3, subprocess, sys, tempfile, threading, time
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from contextlib import asynccontextmanager
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DatabaseError
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from api.cache import get_message_payload
+from api.models import Message, Recipient, RecipientList, Schedule
+from sender import views
+from sender.mock_gateway import MOCK_ERROR, MockKudiServer, MockProvider
+from sender.providers import KudiProvider, set_provider
+from sender.ratelimit import TokenBucket
+from sender.async_views import adispatch_due_messages
+from sender.daemon import SenderWorker, run_sender
+from sender.dedup import SendGuard, WindowedCounter, WindowedSet
+from sender.dlr import DlrBuffer, parse_report
+from sender.health import collect_queue_metrics, queue_health
+from sender.lanes import fair_pick, parse_weights, queue_weight
+from sender.metrics import REGISTRY, Histogram, DB_SECONDS, GATEWAY_SECONDS, SEND_ERRORS
+from sender.models import SenderHeartbeat
+from sender.retry import backoff_delay
+from sender.scheduler import DueTimeScheduler
+
+
+def fresh_send_guard(test, dedup_window=600, max_per_recipient=0, recipient_window=3600):
+    """Give ``test`` its own send guard so dedup windows do not leak between tests."""
+    guard = SendGuard(dedup_window, max_per_recipient, recipient_window)
+    patcher = mock.patch.object(views, '_send_guard', guard)
+    patcher.start()
+    test.addCleanup(patcher.stop)
+    return guard
+
+
+def kudi_response(body, status_code=200):
+    resp = mock.Mock(status_code=status_code, text=str(body))
+    resp.json.return_value = body
+    return resp
+
+
+class SendDueMessagesTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        fresh_send_guard(self)
+        past = timezone.now() - timedelta(minutes=5)
+        self.messages = [
+            Message.objects.create(
+                sender_name="Dennis",
+                receiver_name=f"John {i}",
+                receiver_phone=f"+23480123456{i:02d}",
+                message="Hello John",
+                scheduled_time=past
+            )
+            for i in range(5)
+        ]
+
+    # ------------------------
+    # Batched dispatch
+    # ------------------------
+    @mock.patch('requests.Session.post')
+    def test_batches_rows_into_one_request(self, post):
+        post.return_value = kudi_response({"error_code": "000"})
+
+        stats = views.dispatch_due_messages(batch_size=2)
+
+        self.assertEqual(post.call_count, 3)
+        rows = post.call_args_list[0].kwargs['json']['data']
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(stats['sent'], 5)
+        self.assertFalse(Message.objects.filter(sent_at__isnull=True).exists())
+
+    @mock.patch('requests.Session.post')
+    def test_per_row_results_map_back_to_message_ids(self, post):
+        post.return_value = kudi_response({
+            "error_code": "000",
+            "data": [{"error_code": "000"}, {"error_code": "101"},
+                     {"error_code": "000"}, {"error_code": "000"},
+                     {"error_code": "000"}]
+        })
+
+        views.dispatch_due_messages(batch_size=5)
+
+        pending = Message.objects.filter(sent_at__isnull=True)
+        self.assertEqual(post.call_count, 1)
+        self.assertEqual(pending.count(), 1)
+
+    @mock.patch('requests.Session.post')
+    def test_failed_batch_leaves_rows_pending(self, post):
+        post.return_value = kudi_response({"error_code": "109"})
+
+        views.dispatch_due_messages(batch_size=5)
+
+        self.assertEqual(Message.objects.filter(sent_at__isnull=True).count(), 5)
+
+    @mock.patch('requests.Session.post')
+    def test_claims_due_rows_in_pages(self, post):
+        post.return_value = kudi_response({"error_code": "000"})
+
+        # The schedule scan; 3 pages (2 + 2 + 1 rows) of queue scan, one
+        # queue read, claim and read-back; one UPDATE per batch and the
+        # final release.
+        with self.assertNumQueries(1 + 3 * 4 + 3 + 1):
+            stats = views.dispatch_due_messages(batch_size=2, page_size=2)
+
+        self.assertEqual(stats['due'], 5)
+        self.assertEqual(stats['sent'], 5)
+        phones = [row[1] for call in post.call_args_list for row in call.kwargs['json']['data']]
+        self.assertEqual(sorted(phones), sorted(m.receiver_phone for m in self.messages))
+
+    @mock.patch('requests.Session.post')
+    def test_failed_rows_are_tried_once_and_released(self, post):
+        post.return_value = kudi_response({"error_code": "109"})
+
+        stats = views.dispatch_due_messages(batch_size=1, page_size=1)
+
+        self.assertEqual(stats['due'], 5)
+        self.assertEqual(post.call_count, 5)
+        self.assertFalse(Message.objects.filter(claimed_by__isnull=False).exists())
+
+    @mock.patch('requests.Session.post')
+    def test_failures_back_off_and_are_skipped(self, post):
+        post.return_value = kudi_response({"error_code": "109"})
+
+        stats = views.dispatch_due_messages(batch_size=5)
+
+        self.assertEqual(stats['failed'], 5)
+        failed = Message.objects.get(pk=self.messages[0].pk)
+        self.assertEqual(failed.attempt_count, 1)
+        self.assertEqual(failed.last_error, "109")
+        self.assertEqual(failed.status, Message.Status.PENDING)
+        self.assertGreater(failed.next_attempt_at, timezone.now())
+
+        # still backing off: the next tick does not touch the rows
+        post.reset_mock()
+        self.assertEqual(views.dispatch_due_messages(batch_size=5)['due'], 0)
+        post.assert_not_called()
+
+    @mock.patch('sender.retry.MAX_SEND_ATTEMPTS', 2)
+    @mock.patch('requests.Session.post')
+    def test_dead_letter_after_max_attempts(self, post):
+        post.return_value = kudi_response({"error_code": "109"})
+        Message.objects.update(attempt_count=1)
+
+        stats = views.dispatch_due_messages(batch_size=5)
+
+        self.assertEqual(stats['dead'], 5)
+        self.assertEqual(Message.objects.filter(status=Message.Status.DEAD).count(), 5)
+        Message.objects.update(next_attempt_at=None)
+        self.assertEqual(views.dispatch_due_messages(batch_size=5)['due'], 0)
+
+    @mock.patch('requests.Session.post')
+    def test_skips_rows_leased_by_another_worker(self, post):
+        post.return_value = kudi_response({"error_code": "000"})
+        leased = self.messages[0]
+        Message.objects.filter(pk=leased.pk).update(
+            claimed_by="other-worker",
+            claimed_until=timezone.now() + timedelta(minutes=5)
+        )
+
+        stats = views.dispatch_due_messages(batch_size=5)
+
+        self.assertEqual(stats['sent'], 4)
+        leased.refresh_from_db()
+        self.assertIsNone(leased.sent_at)
+        self.assertEqual(leased.claimed_by, "other-worker")
+
+    @mock.patch('requests.Session.post')
+    def test_reclaims_expired_leases(self, post):
+        post.return_value = kudi_response({"error_code": "000"})
+        Message.objects.update(
+            claimed_by="crashed-worker",
+            claimed_until=timezone.now() - timedelta(seconds=1)
+        )
+
+        stats = views.dispatch_due_messages(batch_size=5)
+
+        self.assertEqual(stats['sent'], 5)
+
+    @override_settings(MESSAGE_CACHE_LOCAL=True)
+    @mock.patch('requests.Session.post')
+    def test_marking_sent_drops_cached_payloads(self, post):
+        post.return_value = kudi_response({"error_code": "000"})
+        cached = self.messages[0]
+        self.assertIsNone(get_message_payload(cached.id)['sent_at'])
+
+        views.dispatch_due_messages(batch_size=5)
+
+        self.assertIsNotNone(get_message_payload(cached.id)['sent_at'])
+
+    @mock.patch('requests.Session.post')
+    def test_trigger_endpoint_reports_sent_count(self, post):
+        post.return_value = kudi_response({"error_code": "000"})
+
+        response = self.client.get('/sms/trigger')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["sent"], 5)
+
+
+class BackoffTests(TestCase):
+
+    def setUp(self):
+        fresh_send_guard(self)
+        self.msg = Message.objects.create(
+            sender_name="Dennis", receiver_name="John", receiver_phone="+2348012345678",
+            message="Hello", scheduled_time=timezone.now() - timedelta(minutes=2), attempt_count=4
+        )
+
+    def assert_backed_off_without_an_attempt(self, error):
+        self.msg.refresh_from_db()
+        self.assertEqual(self.msg.status, Message.Status.PENDING)
+        self.assertEqual(self.msg.attempt_count, 4)
+        self.assertTrue(self.msg.last_error.startswith(error))
+        self.assertGreater(self.msg.next_attempt_at, timezone.now())
+
+    @mock.patch('sender.retry.MAX_SEND_ATTEMPTS', 5)
+    @mock.patch('requests.Session.post')
+    def test_throttling_does_not_use_an_attempt(self, post):
+        post.return_value = kudi_response({}, status_code=429)
+        self.assertEqual(views.dispatch_due_messages()['dead'], 0)
+        self.assert_backed_off_without_an_attempt("throttled")
+
+    @mock.patch('sender.retry.MAX_SEND_ATTEMPTS', 5)
+    @mock.patch('requests.Session.post', side_effect=ConnectionError("refused"))
+    def test_transport_failure_does_not_use_an_attempt(self, post):
+        self.assertEqual(views.dispatch_due_messages()['dead'], 0)
+        self.assert_backed_off_without_an_attempt("transport: ConnectionError")
+
+    @mock.patch('sender.retry.MAX_SEND_ATTEMPTS', 5)
+    @mock.patch('requests.Session.post')
+    def test_rejection_uses_the_last_attempt(self, post):
+        post.return_value = kudi_response({"error_code": "109"})
+        self.assertEqual(views.dispatch_due_messages()['dead'], 1)
+        self.msg.refresh_from_db()
+        self.assertEqual((self.msg.status, self.msg.attempt_count), (Message.Status.DEAD, 5))
+
+    @mock.patch('sender.retry.MAX_TRANSIENT_FAILURES', 3)
+    @mock.patch('sender.retry.backoff_delay', side_effect=lambda n: 60 * n)
+    @mock.patch('requests.Session.post')
+    def test_repeated_outages_grow_the_backoff_then_dead_letter(self, post, delay):
+        post.return_value = kudi_response({}, status_code=503)
+        for _ in range(3):
+            Message.objects.filter(pk=self.msg.pk).update(next_attempt_at=None)
+            views.dispatch_due_messages()
+
+        self.assertEqual([call.args[0] for call in delay.call_args_list], [1, 2])
+        self.msg.refresh_from_db()
+        self.assertEqual((self.msg.status, self.msg.attempt_count, self.msg.transient_failures),
+                         (Message.Status.DEAD, 4, 3))
+
+    @mock.patch('sender.retry.MAX_SEND_ATTEMPTS', 6)
+    @mock.patch('requests.Session.post')
+    def test_rejection_resets_the_outage_streak(self, post):
+        Message.objects.filter(pk=self.msg.pk).update(transient_failures=7)
+        post.return_value = kudi_response({"error_code": "109"})
+        views.dispatch_due_messages()
+        self.msg.refresh_from_db()
+        self.assertEqual((self.msg.attempt_count, self.msg.transient_failures), (5, 0))
+
+    def test_backoff_grows_with_jitter_and_is_capped(self):
+        self.assertEqual(backoff_delay(1, base=60, cap=3600, rand=lambda: 0.0), 30)
+        self.assertEqual(backoff_delay(1, base=60, cap=3600, rand=lambda: 1.0), 60)
+        self.assertEqual(backoff_delay(3, base=60, cap=3600, rand=lambda: 1.0), 240)
+        self.assertEqual(backoff_delay(20, base=60, cap=3600, rand=lambda: 1.0), 3600)
+
+
+class TokenBucketTests(TestCase):
+
+    def test_burst_then_throttles(self):
+        now = [0.0]
+        bucket = TokenBucket(rate=2, capacity=2, clock=lambda: now[0])
+
+        self.assertTrue(bucket.try_acquire())
+        self.assertTrue(bucket.try_acquire())
+        self.assertFalse(bucket.try_acquire())
+
+        now[0] += 0.5
+        self.assertTrue(bucket.try_acquire())
+        self.assertFalse(bucket.try_acquire())
+
+    def test_acquire_sleeps_until_refill(self):
+        now = [0.0]
+        slept = []
+
+        def sleep(seconds):
+            slept.append(seconds)
+            now[0] += seconds
+
+        bucket = TokenBucket(rate=4, capacity=1, clock=lambda: now[0], sleep=sleep)
+        bucket.acquire()
+        bucket.acquire()
+
+        self.assertEqual(slept, [0.25])
+
+
+class KudiProviderTests(TestCase):
+
+    def test_reuses_one_connection_across_requests(self):
+        with MockKudiServer() as server:
+            client = KudiProvider(base_url=server.url, token="x", pool_size=2)
+            for _ in range(5):
+                resp = client.send([("+2348012345678", "Hello")])
+                self.assertEqual(resp.json()["error_code"], "000")
+            stats = client.stats()
+            client.close()
+
+        self.assertEqual(server.rows, 5)
+        self.assertEqual(stats, {"requests": 5, "connections": 1, "reused": 4})
+
+
+class ConcurrentClaimTests(SimpleTestCase):
+    """Several sender processes racing over one SQLite file send each row once."""
+
+    ROWS = 200
+    WORKERS = 4
+
+    SEED = (
+        "from datetime import timedelta\n"
+        "from django.utils import timezone\n"
+        "from api.models import Message\n"
+        "past = timezone.now() - timedelta(minutes=1)\n"
+        "Message.objects.bulk_create(Message(sender_name='S', receiver_name='R',"
+        " receiver_phone=f'+234800{{i:07d}}', message='m', scheduled_time=past)"
+        " for i in range({rows}))"
+    )
+    DISPATCH = (
+        "from sender.views import dispatch_due_messages\n"
+        "dispatch_due_messages(batch_size=5, concurrency=2, page_size=10)"
+    )
+
+    def manage(self, env, *args):
+        return subprocess.Popen(
+            [sys.executable, 'manage.py', *args],
+            cwd=Path(__file__).resolve().parent.parent,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE
+        )
+
+    def run_all(self, procs):
+        for proc in procs:
+            _, err = proc.communicate(timeout=120)
+            self.assertEqual(proc.returncode, 0, err.decode())
+
+    def test_each_row_is_sent_exactly_once(self):
+        with tempfile.TemporaryDirectory() as tmp, MockKudiServer() as server:
+            env = {
+                **os.environ,
+                'API_KEY': 'x',
+                'SQLITE_PATH': os.path.join(tmp, 'claim.sqlite3'),
+                'KUDI_BASE_URL': server.url,
+                'KUDI_RATE_LIMIT': '1000',
+            }
+            self.run_all([self.manage(env, 'migrate', '-v', '0')])
+            self.run_all([self.manage(env, 'shell', '-c', self.SEED.format(rows=self.ROWS))])
+            self.run_all([self.manage(env, 'shell', '-c', self.DISPATCH) for _ in range(self.WORKERS)])
+
+        counts = Counter(server.phones)
+        self.assertEqual(len(counts), self.ROWS)
+        self.assertEqual(max(counts.values()), 1)
+
+
+class DueTimeSchedulerTests(TestCase):
+
+    def test_notify_wakes_the_sleeping_scheduler(self):
+        ran = threading.Event()
+        scheduler = DueTimeScheduler(ran.set, max_sleep=30)
+        with mock.patch.object(scheduler, '_seed'):
+            scheduler.start()
+            scheduler.notify(timezone.now() + timedelta(milliseconds=50))
+            self.assertTrue(ran.wait(5))
+            scheduler.shutdown()
+        self.assertFalse(scheduler.running)
+
+    def test_seed_backs_off_overdue_rows_after_a_tick(self):
+        now = timezone.now()
+        upcoming = now + timedelta(seconds=5)
+        Message.objects.create(
+            sender_name="Dennis", receiver_name="John", receiver_phone="+2348012345678",
+            message="late", scheduled_time=now - timedelta(minutes=1)
+        )
+        Message.objects.create(
+            sender_name="Dennis", receiver_name="John", receiver_phone="+2348012345678",
+            message="soon", scheduled_time=upcoming
+        )
+        scheduler = DueTimeScheduler(lambda: None, retry_after=60)
+
+        scheduler._seed(backoff=True)
+
+        self.assertEqual(min(scheduler._heap), upcoming)
+        self.assertGreater(max(scheduler._heap), now + timedelta(seconds=59))
+
+    def test_seed_wakes_backing_off_rows_at_their_retry_time(self):
+        now = timezone.now()
+        retry_at = now + timedelta(seconds=30)
+        Message.objects.create(
+            sender_name="Dennis", receiver_name="John", receiver_phone="+2348012345678",
+            message="failed once", scheduled_time=now - timedelta(minutes=1), next_attempt_at=retry_at
+        )
+        Message.objects.create(
+            sender_name="Dennis", receiver_name="John", receiver_phone="+2348012345678",
+            message="gave up", scheduled_time=now - timedelta(minutes=1), status=Message.Status.DEAD
+        )
+        scheduler = DueTimeScheduler(lambda: None)
+
+        with self.assertNumQueries(5):
+            scheduler._seed(backoff=False)
+
+        # not overdue: nothing is pushed for now
+        self.assertEqual(scheduler._heap, [retry_at])
+
+    def test_new_message_notifies_running_scheduler(self):
+        scheduler = mock.Mock()
+        when = timezone.now() + timedelta(minutes=1)
+        with mock.patch('sender.views._scheduler', scheduler), \
+                self.captureOnCommitCallbacks(execute=True):
+            Message.objects.create(
+                sender_name="Dennis", receiver_name="John", receiver_phone="+2348012345678",
+                message="Hello", scheduled_time=when
+            )
+        scheduler.notify.assert_called_once_with(when)
+
+
+class MockProviderTests(TestCase):
+
+    def setUp(self):
+        fresh_send_guard(self)
+        past = timezone.now() - timedelta(minutes=5)
+        Message.objects.bulk_create(
+            Message(sender_name="Dennis", receiver_name="John", receiver_phone=f"+2348012345{i:03d}",
+                    message="Hello", scheduled_time=past)
+            for i in range(20)
+        )
+
+    def use(self, provider):
+        previous = set_provider(provider)
+        self.addCleanup(set_provider, previous)
+        return provider
+
+    def test_pipeline_runs_against_in_process_gateway(self):
+        provider = self.use(MockProvider())
+
+        stats = views.dispatch_due_messages(batch_size=5)
+
+        self.assertEqual(stats['sent'], 20)
+        self.assertEqual(provider.stats(), {"requests": 4, "throttled": 0, "rows": 20})
+
+    def test_error_rate_rejects_rows(self):
+        self.use(MockProvider(error_rate=0.5, seed=1))
+
+        stats = views.dispatch_due_messages(batch_size=5)
+
+        self.assertGreater(stats['sent'], 0)
+        self.assertLess(stats['sent'], 20)
+        self.assertEqual(Message.objects.filter(sent_at__isnull=True).count(), 20 - stats['sent'])
+
+    def test_throttling_past_max_rps(self):
+        provider = MockProvider(max_rps=2)
+
+        results = [provider.send_batch([("+2348012345678", "Hi")]) for _ in range(4)]
+
+        self.assertEqual([r.errors[0] for r in results], [None, None, "throttled", "throttled"])
+        self.assertEqual(provider.stats()['throttled'], 2)
+
+    def test_http_mock_reports_throttling_as_429(self):
+        with MockKudiServer(max_rps=1) as server:
+            client = KudiProvider(base_url=server.url, token="x")
+            first = client.send_batch([("+2348012345678", "Hi")])
+            second = client.send_batch([("+2348012345678", "Hi")])
+            client.close()
+
+        self.assertEqual(first.errors, [None])
+        self.assertEqual(second.errors, ["throttled"])
+
+
+class MetricsTests(TestCase):
+
+    def setUp(self):
+        REGISTRY.reset()
+        self.addCleanup(REGISTRY.reset)
+        fresh_send_guard(self)
+        past = timezone.now() - timedelta(minutes=5)
+        Message.objects.bulk_create(
+            Message(sender_name="Dennis", receiver_name="John", receiver_phone=f"+2348012345{i:03d}",
+                    message="Hello", scheduled_time=past)
+            for i in range(10)
+        )
+
+    def test_histogram_renders_cumulative_buckets(self):
+        histogram = Histogram('t_seconds', "Test.", ['phase'], buckets=(0.1, 1))
+        for value in (0.05, 0.5, 2):
+            histogram.observe(value, phase='fetch')
+
+        lines = histogram.render()
+
+        self.assertIn('t_seconds_bucket{phase="fetch",le="0.1"} 1', lines)
+        self.assertIn('t_seconds_bucket{phase="fetch",le="1"} 2', lines)
+        self.assertIn('t_seconds_bucket{phase="fetch",le="+Inf"} 3', lines)
+        self.assertIn('t_seconds_count{phase="fetch"} 3', lines)
+
+    def test_tick_records_timings_and_error_codes(self):
+        previous = set_provider(MockProvider(error_rate=0.5, seed=1))
+        self.addCleanup(set_provider, previous)
+
+        stats = views.dispatch_due_messages(batch_size=5)
+
+        self.assertEqual(GATEWAY_SECONDS.count(provider='mock'), 2)
+        self.assertEqual(DB_SECONDS.count(phase='fetch'), 1)
+        self.assertGreaterEqual(DB_SECONDS.count(phase='save'), 2)
+        self.assertEqual(SEND_ERRORS.value(provider='mock', code=MOCK_ERROR), stats['failed'])
+
+    def test_metrics_endpoint_reports_due_and_lag(self):
+        response = self.client.get('/metrics')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('sms_messages_due 10', body)
+        lag = next(float(line.split()[1]) for line in body.splitlines()
+                   if line.startswith('sms_queue_lag_seconds '))
+        self.assertGreater(lag, 200)
+
+
+class AsyncDispatchTests(TestCase):
+
+    def setUp(self):
+        fresh_send_guard(self)
+        past = timezone.now() - timedelta(minutes=5)
+        Message.objects.bulk_create(
+            Message(sender_name="Dennis", receiver_name="John", receiver_phone=f"+2348012345{i:03d}",
+                    message="Hello", scheduled_time=past)
+            for i in range(20)
+        )
+
+    def use(self, provider):
+        previous = set_provider(provider)
+        self.addCleanup(set_provider, previous)
+        return provider
+
+    def test_bounded_concurrency_against_mock(self):
+        in_flight = []
+
+        class Tracking(MockProvider):
+            @asynccontextmanager
+            async def async_session(self, concurrency):
+                async with super().async_session(concurrency) as send:
+                    async def tracked(rows):
+                        in_flight.append(1)
+                        self.peak = max(getattr(self, 'peak', 0), len(in_flight))
+                        try:
+                            return await send(rows)
+                        finally:
+                            in_flight.pop()
+                    yield tracked
+
+        provider = self.use(Tracking(latency=0.02, error_rate=0.25, seed=3))
+
+        stats = async_to_sync(adispatch_due_messages)(batch_size=2, concurrency=3)
+
+        self.assertEqual(provider.peak, 3)
+        self.assertEqual(stats['sent'] + stats['failed'], 20)
+        self.assertEqual(Message.objects.filter(sent_at__isnull=False).count(), stats['sent'])
+        self.assertFalse(Message.objects.filter(claimed_by__isnull=False).exists())
+
+    def test_async_trigger_sends_over_http(self):
+        with MockKudiServer() as server:
+            self.use(KudiProvider(base_url=server.url, token="x"))
+            response = self.client.post('/sms/async/trigger')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['sent'], 20)
+        self.assertEqual(len(server.phones), 20)
+
+
+class SendGuardTests(TestCase):
+    """Duplicate suppression and per-recipient caps at send time."""
+
+    def setUp(self):
+        cache.clear()
+        self.past = timezone.now() - timedelta(minutes=5)
+
+    def create(self, phone="+2348012345678", text="Your code is 1234", count=1):
+        return [
+            Message.objects.create(sender_name="Shop", receiver_name="Ada", receiver_phone=phone,
+                                   message=text, scheduled_time=self.past)
+            for _ in range(count)
+        ]
+
+    def use(self, provider):
+        previous = set_provider(provider)
+        self.addCleanup(set_provider, previous)
+        return provider
+
+    def test_windowed_set_evicts_by_generation(self):
+        now = [0.0]
+        seen = WindowedSet(10, clock=lambda: now[0])
+        seen.add(1, 'a')
+        now[0] = 15
+        seen.add(2, 'b')
+        self.assertEqual((seen.get(1), seen.get(2)), ('a', 'b'))
+        now[0] = 26
+        self.assertEqual((seen.get(1), seen.get(2)), (None, 'b'))
+        now[0] = 60
+        self.assertEqual((seen.get(2), len(seen)), (None, 0))
+
+    def test_windowed_counter_caps_each_key(self):
+        now = [0.0]
+        counter = WindowedCounter(2, 60, clock=lambda: now[0])
+        self.assertEqual([counter.take('x') for _ in range(3)], [True, True, False])
+        self.assertTrue(counter.take('y'))
+        counter.give_back('x')
+        self.assertTrue(counter.take('x'))
+        now[0] = 45
+        self.assertEqual(counter.resets_in(), 15)
+        now[0] = 61
+        self.assertTrue(counter.take('x'))
+
+    def test_duplicates_are_suppressed_not_sent(self):
+        fresh_send_guard(self)
+        provider = self.use(MockProvider())
+        first, *copies = self.create(count=3)
+        other = self.create(text="Your code is 9999")[0]
+
+        stats = views.dispatch_due_messages()
+        again = self.create()[0]
+        later = views.dispatch_due_messages()
+
+        self.assertEqual((stats['sent'], stats['suppressed']), (2, 2))
+        self.assertEqual(provider.rows, 2)
+        self.assertEqual(set(Message.objects.filter(sent_at__isnull=False).values_list('id', flat=True)),
+                         {first.id, other.id})
+        for msg in copies + [again]:
+            msg.refresh_from_db()
+            self.assertEqual(msg.status, Message.Status.SUPPRESSED)
+            self.assertEqual(msg.last_error, f"duplicate of {first.id}")
+            self.assertIsNone(msg.claimed_by)
+        self.assertEqual(later['suppressed'], 1)
+
+    def test_recipient_cap_defers_without_an_attempt(self):
+        guard = fresh_send_guard(self, max_per_recipient=2)
+        self.use(MockProvider())
+        self.create(text="One")
+        self.create(text="Two")
+        held = self.create(text="Three")[0]
+
+        stats = views.dispatch_due_messages()
+
+        held.refresh_from_db()
+        self.assertEqual((stats['sent'], stats['deferred']), (2, 1))
+        self.assertEqual(held.status, Message.Status.PENDING)
+        self.assertEqual(held.attempt_count, 0)
+        self.assertIsNone(held.claimed_by)
+        self.assertGreater(held.next_attempt_at, timezone.now() + timedelta(minutes=59))
+        self.assertEqual(views.dispatch_due_messages()['due'], 0)
+        self.assertGreater(guard.retry_in(), 3500)
+
+    def test_failed_sends_are_forgotten_so_retries_go_out(self):
+        guard = fresh_send_guard(self, max_per_recipient=1)
+        self.use(MockProvider(error_rate=1.0))
+        msg = self.create()[0]
+
+        stats = views.dispatch_due_messages()
+
+        self.assertEqual(stats['failed'], 1)
+        row = Message.objects.filter(id=msg.id).values_list(*views.DUE_FIELDS, named=True).get()
+        self.assertEqual(guard.screen([row]), ([row], {}, []))
+
+
+class DlrTests(TestCase):
+    """Delivery reports are buffered and written in batches."""
+
+    def setUp(self):
+        fresh_send_guard(self)
+        cache.clear()
+        self.now = [0.0]
+        self.buffer = DlrBuffer(flush_size=100, max_buffered=10, unmatched_ttl=60, spool_path=None,
+                                background=False, clock=lambda: self.now[0])
+        for patcher in (mock.patch.object(views, 'get_dlr_buffer', lambda: self.buffer),
+                        mock.patch.object(views, 'DLR_TOKEN', 'secret')):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        past = timezone.now() - timedelta(minutes=5)
+        self.sent = [
+            Message.objects.create(sender_name="Shop", receiver_name="Ada", receiver_phone=f"+23480123456{i}",
+                                   message=f"Order {i}", scheduled_time=past)
+            for i in range(3)
+        ]
+
+    def send(self):
+        previous = set_provider(MockProvider())
+        self.addCleanup(set_provider, previous)
+        views.dispatch_due_messages()
+        for msg in self.sent:
+            msg.refresh_from_db()
+
+    def post(self, payload, **extra):
+        extra.setdefault('HTTP_X_DLR_TOKEN', 'secret')
+        return self.client.post('/sms/dlr', payload, content_type='application/json', **extra)
+
+    def test_reports_by_provider_id_and_reference_are_written_on_flush(self):
+        self.send()
+        first, second, third = self.sent
+        self.assertTrue(all(msg.provider_ref for msg in self.sent))
+
+        resp = self.post([
+            {"message_id": first.provider_ref, "status": "DELIVRD", "timestamp": "2026-01-02T03:04:05Z"},
+            {"reference": second.id, "status": "undelivered"},
+            {"message_id": third.provider_ref, "status": "bogus"},
+        ])
+        self.assertEqual(resp.status_code, 202)
+        self.assertEqual(resp.json()["accepted"], 2)
+        self.assertEqual(resp.json()["errors"][0]["index"], 2)
+        first.refresh_from_db()
+        self.assertEqual(first.delivery_status, Message.Delivery.UNKNOWN)
+
+        with self.assertNumQueries(2):
+            self.assertEqual(self.buffer.flush(), 2)
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.delivery_status, Message.Delivery.DELIVERED)
+        self.assertEqual(first.delivered_at.isoformat(), "2026-01-02T03:04:05+00:00")
+        self.assertEqual(second.delivery_status, Message.Delivery.FAILED)
+        self.assertIsNone(second.delivered_at)
+        self.assertEqual(len(self.buffer), 0)
+
+    def test_out_of_range_timestamp_is_an_item_error(self):
+        resp = self.post([
+            {"reference": self.sent[0].id, "status": "delivered", "timestamp": "100000000000000000"},
+            {"reference": self.sent[1].id, "status": "delivered"},
+        ])
+        self.assertEqual(resp.status_code, 202)
+        self.assertEqual(resp.json()["accepted"], 1)
+        self.assertEqual(resp.json()["errors"][0]["index"], 0)
+
+    def test_late_intermediate_report_does_not_undo_a_final_one(self):
+        self.send()
+        msg = self.sent[0]
+        self.post({"reference": msg.id, "status": "delivered"})
+        self.post({"reference": msg.id, "status": "accepted"})
+        self.buffer.flush()
+        self.post({"reference": msg.id, "status": "enroute"})
+        self.buffer.flush()
+
+        msg.refresh_from_db()
+        self.assertEqual(msg.delivery_status, Message.Delivery.DELIVERED)
+
+    def test_unmatched_reports_are_retried_then_dropped(self):
+        self.post({"message_id": "not-yet-stored", "status": "delivered"})
+        self.buffer.flush()
+        self.assertEqual(len(self.buffer), 1)
+
+        Message.objects.filter(id=self.sent[0].id).update(provider_ref="not-yet-stored")
+        self.post({"message_id": "never-stored", "status": "delivered"})
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(len(self.buffer), 1)
+
+        self.now[0] = 61
+        self.buffer.flush()
+        self.assertEqual((len(self.buffer), self.buffer.dropped), (0, 1))
+
+    def test_failed_flush_at_shutdown_spools_for_the_next_process(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        spool = Path(tmp.name) / "dlr.ndjson"
+        msg = self.sent[0]
+        buffer = DlrBuffer(spool_path=str(spool), background=False)
+        buffer.add([parse_report({"reference": msg.id, "status": "delivered"}, 0)])
+        with mock.patch('sender.dlr.write_reports', side_effect=DatabaseError("down")):
+            buffer.close()
+        self.assertTrue(spool.exists())
+
+        replay = DlrBuffer(spool_path=str(spool), background=False)
+        self.assertEqual(len(replay), 1)
+        self.assertFalse(spool.exists())
+        self.assertEqual(replay.flush(), 1)
+        self.assertEqual(list(spool.parent.iterdir()), [])
+        msg.refresh_from_db()
+        self.assertEqual(msg.delivery_status, Message.Delivery.DELIVERED)
+
+    def test_size_trigger_wakes_the_flusher(self):
+        self.buffer.flush_size = 2
+        self.post({"reference": 1, "status": "sent"})
+        self.assertFalse(self.buffer._wake.is_set())
+        self.post({"reference": 2, "status": "sent"})
+        self.assertTrue(self.buffer._wake.is_set())
+
+    def test_full_buffer_and_bad_token_are_refused(self):
+        self.assertEqual(self.post([{"reference": i, "status": "sent"} for i in range(10)]).status_code, 202)
+        resp = self.post({"reference": 1, "status": "sent"})
+        self.assertEqual(resp.status_code, 503)
+        self.assertEqual(resp['Retry-After'], '5')
+        self.assertEqual(self.post("{").status_code, 400)
+
+        self.assertEqual(self.post({"reference": 1, "status": "sent"}, HTTP_X_DLR_TOKEN='wrong').status_code, 403)
+        resp = self.client.get('/sms/dlr', {"token": "secret", "reference": 1, "status": "sent"})
+        self.assertEqual(resp.status_code, 503)
+
+    def test_webhook_is_closed_without_a_token(self):
+        with mock.patch.object(views, 'DLR_TOKEN', ''):
+            resp = self.post({"reference": self.sent[0].id, "status": "delivered"}, HTTP_X_DLR_TOKEN='')
+        self.assertEqual(resp.status_code, 403)
+        self.assertEqual(len(self.buffer), 0)
+
+
+class LaneTests(TestCase):
+    """Due rows are claimed by lane and fairly across senders."""
+
+    def setUp(self):
+        self.now = timezone.now()
+
+    def due(self, sender, count, priority=Message.Priority.BULK, minutes_ago=60):
+        Message.objects.bulk_create(
+            Message(sender_name=sender, receiver_name="R", receiver_phone=f"+23480{i:09d}",
+                    message=f"{sender} {i}", priority=priority,
+                    scheduled_time=self.now - timedelta(minutes=minutes_ago, seconds=-i))
+            for i in range(count)
+        )
+
+    def claim(self, page_size):
+        _, rows = views.claim_due_page(timezone.now(), page_size, timedelta(minutes=5))
+        return rows
+
+    def test_transactional_row_jumps_an_older_bulk_campaign(self):
+        self.due("Campaign", 30)
+        self.due("Bank", 1, Message.Priority.TRANSACTIONAL, minutes_ago=1)
+
+        rows = self.claim(5)
+
+        self.assertEqual(len(rows), 5)
+        self.assertEqual((rows[0].sender_name, rows[0].priority), ("Bank", Message.Priority.TRANSACTIONAL))
+
+    def test_heavy_sender_does_not_starve_the_others(self):
+        self.due("Big", 40, minutes_ago=120)
+        self.due("Small", 3)
+
+        senders = Counter(row.sender_name for row in self.claim(6))
+
+        self.assertEqual(senders, {"Big": 3, "Small": 3})
+
+    def test_sender_weights_scale_their_share(self):
+        self.due("Big", 40)
+        self.due("Small", 40)
+
+        with mock.patch('sender.lanes.sender_weights', {"Big": 2.0}):
+            senders = Counter(row.sender_name for row in self.claim(6))
+
+        self.assertEqual(senders, {"Big": 4, "Small": 2})
+
+    def test_fair_pick_matches_a_full_ranking_reading_only_queue_heads(self):
+        rng = random.Random(7)
+        weights = {"A": 1.0, "B": 3.0}
+        queues = {(lane, sender): sorted((rng.randint(0, 500), rng.randint(1, 10**6))
+                                         for _ in range(rng.choice([0, 2, 40, 400])))
+                  for lane in Message.Priority.values for sender in ("A", "B", "C")}
+        read = Counter()
+
+        def fetch(queue, after, limit):
+            rows = [key for key in queues[queue] if after is None or key > after][:limit]
+            read[queue] += len(rows)
+            return rows
+
+        for page_size in (1, 7, 50, 300):
+            read.clear()
+            picked = fair_pick(list(queues), fetch, page_size, transactional_weight=10, weights=weights)
+            ranked = sorted(
+                (position / queue_weight(*queue, 10, weights), key)
+                for queue, keys in queues.items() for position, key in enumerate(keys, start=1)
+            )
+            self.assertEqual(picked, [key[1] for _, key in ranked[:page_size]])
+            self.assertLessEqual(sum(read.values()), 3 * page_size + len(queues))
+
+    def test_parse_weights(self):
+        self.assertEqual(parse_weights(" Shop A:3, B:0.5 ,"), {"Shop A": 3.0, "B": 0.5})
+        for bad in ("Shop", "Shop:x", "Shop:0", ":2"):
+            with self.assertRaises(ImproperlyConfigured):
+                parse_weights(bad)
+
+    def test_lane_lag_metrics(self):
+        REGISTRY.reset()
+        self.addCleanup(REGISTRY.reset)
+        self.due("Campaign", 2, minutes_ago=10)
+
+        collect_queue_metrics()
+        text = REGISTRY.render()
+
+        self.assertIn('sms_lane_messages_due{lane="bulk"} 2', text)
+        self.assertIn('sms_lane_messages_due{lane="transactional"} 0', text)
+        self.assertIn('sms_lane_lag_seconds{lane="transactional"} 0.0', text)
+        lag = next(line for line in text.splitlines() if line.startswith('sms_lane_lag_seconds{lane="bulk"}'))
+        self.assertGreater(float(lag.split()[-1]), 500)
+
+
+class ScheduledDispatchTests(TestCase):
+
+    def test_tick_materializes_and_sends_due_occurrences(self):
+        fresh_send_guard(self)
+        previous = set_provider(MockProvider())
+        self.addCleanup(set_provider, previous)
+        members = RecipientList.objects.create(name="Members")
+        Recipient.objects.create(recipient_list=members, name="Ada", phone="+2348012345678")
+        start = timezone.now() - timedelta(minutes=3)
+        schedule = Schedule.objects.create(name="Ping", sender_name="Gym", template="Ping at {time}",
+                                           recipient_list=members, rule="* * * * *", starts_at=start)
+        Schedule.objects.filter(pk=schedule.pk).update(next_run_at=start)
+
+        stats = views.dispatch_due_messages()
+
+        # The last 3 minutely occurrences are due now; the next hour's wait.
+        self.assertEqual(stats['sent'], 3)
+        self.assertEqual(Message.objects.filter(sent_at__isnull=True).count(), 60)
+
+    def test_repeating_schedule_is_not_suppressed_as_duplicates(self):
+        fresh_send_guard(self, dedup_window=600)
+        previous = set_provider(MockProvider())
+        self.addCleanup(set_provider, previous)
+        members = RecipientList.objects.create(name="Members")
+        Recipient.objects.create(recipient_list=members, name="Ada", phone="+2348012345678")
+        now = timezone.now()
+        # three */5 occurrences are due, whatever minute the test runs in
+        start = now.replace(minute=now.minute - now.minute % 5, second=0, microsecond=0) - timedelta(minutes=10)
+        schedule = Schedule.objects.create(name="Open", sender_name="Gym", template="The gym is open",
+                                           recipient_list=members, rule="*/5 * * * *", starts_at=start)
+        Schedule.objects.filter(pk=schedule.pk).update(next_run_at=start)
+        for _ in range(2):
+            Message.objects.create(sender_name="Gym", receiver_name="Ada", receiver_phone="+2348012345678",
+                                   message="The gym is open", scheduled_time=start)
+
+        stats = views.dispatch_due_messages()
+
+        # every occurrence goes out; the client's repeated message is still held back
+        self.assertEqual((stats['sent'], stats['suppressed']), (4, 1))
+        self.assertEqual(Message.objects.filter(status=Message.Status.SUPPRESSED, idempotency_key=None).count(), 1)
+
+
+class ScheduledWakeUpTests(TransactionTestCase):
+    """The precise scheduler runs ticks for schedules with nothing else queued."""
+
+    def test_scheduler_wakes_for_a_schedule_on_an_empty_queue(self):
+        fresh_send_guard(self)
+        previous = set_provider(MockProvider())
+        self.addCleanup(set_provider, previous)
+        members = RecipientList.objects.create(name="Members")
+        Recipient.objects.create(recipient_list=members, name="Ada", phone="+2348012345678")
+        Schedule.objects.create(name="Ping", sender_name="Gym", template="Ping at {time}",
+                                recipient_list=members, rule="* * * * *")
+        self.assertFalse(Message.objects.exists())
+
+        scheduler = DueTimeScheduler(views.dispatch_due_messages, max_sleep=30)
+        scheduler.start()
+        try:
+            deadline = time.monotonic() + 5
+            while not Message.objects.exists() and time.monotonic() < deadline:
+                time.sleep(0.05)
+        finally:
+            scheduler.shutdown()
+
+        self.assertTrue(Message.objects.exists())
+        self.assertGreater(Schedule.objects.get().next_run_at, timezone.now() + timedelta(minutes=59))
+
+    def test_new_schedule_notifies_running_scheduler(self):
+        scheduler = mock.Mock()
+        members = RecipientList.objects.create(name="Members")
+        with mock.patch('sender.views._scheduler', scheduler):
+            schedule = Schedule.objects.create(name="Ping", sender_name="Gym", template="Ping",
+                                               recipient_list=members, rule="0 9 * * *")
+        scheduler.notify.assert_called_once_with(schedule.next_run_at - timedelta(hours=1))
+
+
+class SenderDaemonTests(TestCase):
+
+    def setUp(self):
+        fresh_send_guard(self)
+
+    def test_tick_and_heartbeat_feed_health(self):
+        Message.objects.create(
+            sender_name="Dennis", receiver_name="John", receiver_phone="+2348012345678",
+            message="Hello", scheduled_time=timezone.now() - timedelta(minutes=2)
+        )
+        self.assertEqual(self.client.get('/sms/health').status_code, 503)
+        self.assertGreater(queue_health(30)['lag_seconds'], 100)
+
+        worker = SenderWorker(poll_interval=1)
+        previous = set_provider(MockProvider())
+        self.addCleanup(set_provider, previous)
+        worker.tick()
+        worker.beat()
+
+        response = self.client.get('/sms/health')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"ready": True, "workers": 1, "lag_seconds": 0.0})
+        self.assertEqual(SenderHeartbeat.objects.get().last_tick['sent'], 1)
+
+    def test_beat_prunes_dead_workers(self):
+        long_ago = timezone.now() - timedelta(days=1)
+        SenderHeartbeat.objects.create(worker_id="gone:1", started_at=long_ago, last_beat_at=long_ago)
+        recent = timezone.now() - timedelta(seconds=40)
+        SenderHeartbeat.objects.create(worker_id="late:2", started_at=recent, last_beat_at=recent)
+
+        SenderWorker(poll_interval=1).beat()
+
+        self.assertEqual(SenderHeartbeat.objects.count(), 2)
+        self.assertFalse(SenderHeartbeat.objects.filter(worker_id="gone:1").exists())
+
+    def test_tick_refreshes_stale_connections(self):
+        worker = SenderWorker(poll_interval=1)
+        with mock.patch('sender.daemon.close_old_connections') as close_old, \
+                mock.patch('sender.daemon.dispatch_due_messages', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                worker.tick()
+        self.assertEqual(close_old.call_count, 2)
+
+    def test_forked_workers_split_the_rate_limit(self):
+        context = mock.Mock()
+        with mock.patch('sender.daemon.multiprocessing.get_context', return_value=context), \
+                mock.patch('sender.daemon.connections'), mock.patch('sender.daemon.signal'):
+            run_sender(processes=4, poll_interval=1, rate_limit=10)
+        shares = [call.kwargs['args'][0]['rate_limit'] for call in context.Process.call_args_list]
+        self.assertEqual(shares, [2.5] * 4)
+
+
+class RunSenderProcessTests(SimpleTestCase):
+    """``manage.py run_sender`` drains the queue and exits cleanly on SIGTERM."""
+
+    def test_drains_queue_and_shuts_down_gracefully(self):
+        root = Path(__file__).resolve().parent.parent
+        with tempfile.TemporaryDirectory() as tmp:
+            db = os.path.join(tmp, 'sender.sqlite3')
+            env = {**os.environ, 'API_KEY': 'x', 'SQLITE_PATH': db, 'SMS_PROVIDER': 'mock'}
+            seed = (
+                "from datetime import timedelta\n"
+                "from django.utils import timezone\n"
+                "from api.models import Message\n"
+                "Message.objects.bulk_create(Message(sender_name='S', receiver_name='R',"
+                " receiver_phone='+2348000000000', message=f'm{i}',"
+                " scheduled_time=timezone.now() - timedelta(minutes=1)) for i in range(30))"
+            )
+            subprocess.run([sys.executable, 'manage.py', 'migrate', '-v', '0'], cwd=root, env=env, check=True)
+            subprocess.run([sys.executable, 'manage.py', 'shell', '-c', seed], cwd=root, env=env, check=True)
+
+            proc = subprocess.Popen(
+                [sys.executable, 'manage.py', 'run_sender', '--processes', '2', '--poll-interval', '0.2'],
+                cwd=root, env=env, stderr=subprocess.PIPE
+            )
+            try:
+                deadline = time.monotonic() + 30
+                while time.monotonic() < deadline:
+                    with sqlite3.connect(db) as conn:
+                        pending = conn.execute("SELECT COUNT(*) FROM api_message WHERE sent_at IS NULL").fetchone()[0]
+                        workers = conn.execute("SELECT COUNT(*) FROM sender_senderheartbeat").fetchone()[0]
+                    if not pending and workers == 2:
+                        break
+                    time.sleep(0.2)
+                proc.send_signal(signal.SIGTERM)
+                _, err = proc.communicate(timeout=30)
+            finally:
+                if proc.poll() is None:
+                    proc.kill()
+
+            self.assertEqual(proc.returncode, 0, err.decode())
+            self.assertEqual((pending, workers), (0, 2))
+            with sqlite3.connect(db) as conn:
+                self.assertEqual(conn.execute("SELECT COUNT(*) FROM sender_senderheartbeat").fetchone()[0], 0)
@@ -1,6 +1,10 @@
 from django.urls import path
-from .views import send_due_messages
+from .async_views import asend_due_messages
+from .views import delivery_report, send_due_messages, sender_health
 
 urlpatterns = [
     path('trigger', send_due_messages, name='send_sms'),
+    path('async/trigger', asend_due_messages, name='send_sms_async'),
+    path('health', sender_health, name='sender-health'),
+    path('dlr', delivery_report, name='delivery-report'),
 ]
@@ -1,72 +1,444 @@
 # ------------------------------------------------------------------
-# Kudi SMS replacement for Termii
+# Due-message dispatch through the configured SMS provider
 # ------------------------------------------------------------------
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from apscheduler.schedulers.background import BackgroundScheduler
+from django.db import connection, transaction
+from django.db.models import Q
 from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
+from api.cache import invalidate_messages
+from api import sms
 from api.models import Message
+from api.schedules import materialize_schedules
 from app.settings import (
-    API_KEY,        # re-use this field for Kudi token
-    SENDER_ID       # re-use this field for Kudi senderID
+    KUDI_BATCH_SIZE,
+    KUDI_CONCURRENCY,
+    KUDI_RATE_LIMIT,
+    DUE_PAGE_SIZE,
+    CLAIM_LEASE_SECONDS,
+    SCHEDULER_MODE,
+    SCHEDULER_MAX_SLEEP,
+    SENDER_HEARTBEAT_TTL,
+    SEND_DEDUP_WINDOW,
+    RECIPIENT_MAX_PER_WINDOW,
+    RECIPIENT_WINDOW_SECONDS,
+    DLR_TOKEN
 )
-import logging, requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import defaultdict
+from contextlib import nullcontext
+from .dedup import SendGuard
+from .dlr import get_dlr_buffer, parse_report
+from .health import queue_health
+from .lanes import due_queues, fair_pick, lane_order
+from .metrics import (
+    CONTENT_TYPE, REGISTRY, DB_SECONDS, DLR_RECEIVED, GATEWAY_SECONDS, HELD_BACK, MESSAGES_SENT,
+    SEND_ERRORS, SEND_RATE, TICKS, TICK_SECONDS
+)
+from .providers import get_provider
+from .ratelimit import TokenBucket
+from .retry import TRANSPORT_ERROR, record_failures
+from .scheduler import DueTimeScheduler
+from datetime import timedelta
+import hmac, json, logging, os, socket, time, uuid
 
 logger = logging.getLogger()
 
-# Kudi: new endpoint
-BASE_URL = "https://my.kudisms.net/api/autocomposesms"
+# One bucket per process so every tick shares the provider's request quota;
+# run_sender gives each forked worker its share (see set_rate_limit).
+_rate_limiter = TokenBucket(KUDI_RATE_LIMIT)
+# Duplicate suppression and per-recipient caps; see dedup.py.
+_send_guard = SendGuard(SEND_DEDUP_WINDOW, RECIPIENT_MAX_PER_WINDOW, RECIPIENT_WINDOW_SECONDS)
+
+# Only what render_sms, the send guard and the retry bookkeeping need;
+# never the whole row.
+DUE_FIELDS = ('id', 'receiver_phone', 'receiver_name', 'sender_name', 'body__text',
+              'attempt_count', 'transient_failures', 'priority', 'idempotency_key')
+
+def set_rate_limit(rate):
+    """Limit this process to ``rate`` provider requests per second."""
+    global _rate_limiter
+    _rate_limiter = TokenBucket(rate)
+
+
+def worker_id():
+    # computed per call: run_sender forks workers after import
+    return f"{socket.gethostname()}:{os.getpid()}"[:50]
+
+
+def render_sms(msg):
+    return sms.render_sms(msg.receiver_name, msg.body__text, msg.sender_name)
+
+
+def send_batch(batch):
+    """Send up to KUDI_BATCH_SIZE messages in one provider request.
+
+    Returns ``(sent, errors)``: ``{id: provider_ref}`` for the rows the
+    provider accepted (the ref is None when it returned none) and a
+    ``{id: error}`` map for the rest; the caller writes both back in bulk.
+    Runs on the worker pool, so it must not touch the database.
+    """
+    _rate_limiter.acquire()
+    rows = [(msg.receiver_phone, render_sms(msg)) for msg in batch]
+    provider = get_provider()
+    try:
+        with GATEWAY_SECONDS.time(provider=provider.name):
+            result = provider.send_batch(rows)
+    except Exception as exc:
+        return transport_failure(provider, batch, exc)
+    return split_result(provider, batch, result)
+
+
+def transport_failure(provider, batch, exc):
+    """``send_batch``'s answer when the request itself failed: every row errored."""
+    msg_ids = [msg.id for msg in batch]
+    logger.exception(f"Failed to send messages {msg_ids}")
+    SEND_ERRORS.inc(len(msg_ids), provider=provider.name, code=type(exc).__name__)
+    return {}, {msg_id: f"{TRANSPORT_ERROR}: {type(exc).__name__}: {exc}" for msg_id in msg_ids}
+
+
+def split_result(provider, batch, result):
+    """Map a provider ``SendResult`` back onto ``(sent, errors)``."""
+    msg_ids = [msg.id for msg in batch]
+    refs = result.refs or [None] * len(msg_ids)
+    sent = {msg_id: ref for msg_id, error, ref in zip(msg_ids, result.errors, refs) if error is None}
+    errors = {msg_id: error for msg_id, error in zip(msg_ids, result.errors) if error is not None}
+    for code in errors.values():
+        SEND_ERRORS.inc(provider=provider.name, code=code)
+    if errors:
+        logger.error(f"{provider.name} error for messages {list(errors)}: {result.detail}")
+    return sent, errors
+
+
+def mark_sent(sent):
+    """Mark ``{id: provider_ref}`` sent, keeping the refs delivery reports will use."""
+    if not sent:
+        return 0
+    msg_ids = list(sent)
+    updated = Message.objects.filter(id__in=msg_ids).update(
+        sent_at=timezone.now(),
+        status=Message.Status.SENT,
+        claimed_by=None,
+        claimed_until=None
+    )
+    refs = [Message(id=msg_id, provider_ref=ref) for msg_id, ref in sent.items() if ref]
+    if refs:
+        Message.objects.bulk_update(refs, ['provider_ref'])
+    invalidate_messages(msg_ids)
+    return updated
+
+
+def write_back(batch, sent, errors):
+    """Record one batch's outcome; returns ``(sent, dead)`` row counts."""
+    if errors:
+        _send_guard.forget([msg for msg in batch if msg.id in errors])
+    with DB_SECONDS.time(phase='save'):
+        sent_count = mark_sent(sent)
+        dead = record_failures(batch, errors)
+    if sent:
+        logger.info(f"Messages {list(sent)} sent successfully.")
+    return sent_count, dead
+
+
+def suppress_duplicates(duplicates):
+    """Close out ``{id: original_id}`` rows as suppressed duplicates."""
+    by_original = defaultdict(list)
+    for msg_id, original in duplicates.items():
+        by_original[original].append(msg_id)
+    for original, msg_ids in by_original.items():
+        Message.objects.filter(id__in=msg_ids).update(
+            status=Message.Status.SUPPRESSED,
+            last_error=f"duplicate of {original}",
+            claimed_by=None,
+            claimed_until=None
+        )
+    invalidate_messages(list(duplicates))
+    logger.info(f"Suppressed duplicate messages {list(duplicates)}")
+
+
+def defer(rows, seconds):
+    """Hand rate-limited rows back, not due again for ``seconds``."""
+    Message.objects.filter(id__in=[msg.id for msg in rows]).update(
+        next_attempt_at=timezone.now() + timedelta(seconds=seconds),
+        claimed_by=None,
+        claimed_until=None
+    )
+
+
+def hold_back(page):
+    """Screen a claimed page through the send guard before it is sent.
+
+    Returns ``(page, suppressed, deferred)``: the rows still to send and how
+    many were suppressed as duplicates or deferred by the recipient cap.
+    Neither counts as a send attempt.
+    """
+    page, duplicates, deferred = _send_guard.screen(page)
+    if duplicates or deferred:
+        with DB_SECONDS.time(phase='save'):
+            if duplicates:
+                suppress_duplicates(duplicates)
+            if deferred:
+                defer(deferred, _send_guard.retry_in())
+        HELD_BACK.inc(len(duplicates), reason='duplicate')
+        HELD_BACK.inc(len(deferred), reason='recipient_limit')
+    return page, len(duplicates), len(deferred)
+
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def claim_due_page(now, page_size, lease):
+    """Atomically lease up to ``page_size`` due rows and return them.
+
+    Rows are picked in weighted fair order across lanes and senders from
+    a bounded read of each queue's head (see lanes.py), then claimed by an
+    ``UPDATE ... WHERE id IN (...)`` that re-checks the lease in its own
+    WHERE clause, so concurrent workers (the scheduler, /sms/trigger, cron
+    or other hosts) never get the same row. Where the backend supports it
+    the reads also lock their rows and skip rows locked by a competing
+    claim, so concurrent workers pick disjoint pages instead of racing for
+    the same one. Rows backing off after a failure or dead-lettered are
+    never claimed. Each page gets its own token, which is how this worker
+    reads back exactly what it won; rows come back transactional first.
+    """
+    claimable = Message.objects.filter(
+        scheduled_time__lte=now,
+        status=Message.Status.PENDING
+    ).filter(
+        Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now),
+        Q(claimed_until__isnull=True) | Q(claimed_until__lt=now)
+    )
+    skip_locked = connection.features.has_select_for_update_skip_locked
+
+    def fetch(queue, after, limit):
+        priority, sender_name = queue
+        rows = claimable.filter(priority=priority, sender_name=sender_name)
+        if after is not None:
+            rows = rows.filter(Q(scheduled_time__gt=after[0]) | Q(scheduled_time=after[0], id__gt=after[1]))
+        rows = rows.order_by('scheduled_time', 'id')
+        if skip_locked:
+            rows = rows.select_for_update(skip_locked=True)
+        return list(rows.values_list('scheduled_time', 'id')[:limit])
+
+    token = f"{worker_id()}/{uuid.uuid4().hex[:12]}"
+    with transaction.atomic() if skip_locked else nullcontext():
+        ids = fair_pick(due_queues(now), fetch, page_size)
+        claimed = claimable.filter(id__in=ids).update(
+            claimed_by=token,
+            claimed_until=now + lease
+        ) if ids else 0
+    if not claimed:
+        return token, []
+    rows = Message.objects.filter(claimed_by=token, status=Message.Status.PENDING).order_by('scheduled_time', 'id')
+    return token, sorted(rows.values_list(*DUE_FIELDS, named=True), key=lane_order)
+
+
+def iter_claimed_pages(page_size, lease):
+    """Yield successive claimed pages until nothing due is left unclaimed.
+
+    Memory stays bounded by one page however many rows are due. Each page
+    is claimed as of its own start, so a transactional message that comes
+    due during a long bulk tick goes out in the next page rather than the
+    next tick. Rows that fail are pushed back by their retry backoff, so
+    they are not picked up again in the same tick.
+    """
+    while True:
+        with DB_SECONDS.time(phase='fetch'):
+            token, rows = claim_due_page(timezone.now(), page_size, lease)
+        if not rows:
+            return
+        yield token, rows
+        if len(rows) < page_size:
+            return
+
+
+def release_claims(tokens):
+    """Hand unsent rows from this tick back for the next one."""
+    if not tokens:
+        return 0
+    return Message.objects.filter(claimed_by__in=tokens, status=Message.Status.PENDING).update(
+        claimed_by=None,
+        claimed_until=None
+    )
+
+
+def expand_schedules():
+    """Materialize recurring schedules coming due; a failure must not stop sending."""
+    try:
+        with DB_SECONDS.time(phase='schedule'):
+            return materialize_schedules()
+    except Exception:
+        logger.exception("Failed to materialize schedules")
+        return 0
+
+
+def dispatch_due_messages(batch_size=None, concurrency=None, page_size=None, should_stop=None):
+    """Send every due message in provider batches and report the tick's throughput.
+
+    Recurring schedules are expanded first (see api.schedules), then due
+    rows are claimed a page at a time; each page's batches go out in
+    parallel on a pool of ``concurrency`` workers, throttled by the shared
+    KUDI_RATE_LIMIT bucket, and results are written back from this thread as
+    each request completes. ``should_stop`` is checked between pages so a
+    shutting-down worker finishes its current page and hands back nothing
+    half-sent. This is the job the scheduler, ``run_sender`` and
+    ``send_hourly.py`` run; the ``/sms/trigger`` view is a thin wrapper.
+    """
+    logger.info("Running scheduled message job...")
+    started = time.monotonic()
+    batch_size = max(1, batch_size or KUDI_BATCH_SIZE)
+    concurrency = max(1, concurrency or KUDI_CONCURRENCY)
+    page_size = max(batch_size, page_size or DUE_PAGE_SIZE)
+
+    lease = timedelta(seconds=CLAIM_LEASE_SECONDS)
+    expand_schedules()
+
+    due_count = sent_count = failed_count = dead_count = suppressed_count = deferred_count = 0
+    tokens = []
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for token, page in iter_claimed_pages(page_size, lease):
+            tokens.append(token)
+            due_count += len(page)
+            page, suppressed, deferred = hold_back(page)
+            suppressed_count += suppressed
+            deferred_count += deferred
+            futures = {pool.submit(send_batch, batch): batch for batch in chunked(page, batch_size)}
+            for future in as_completed(futures):
+                sent, errors = future.result()
+                sent, dead = write_back(futures[future], sent, errors)
+                sent_count += sent
+                dead_count += dead
+                failed_count += len(errors)
+            if should_stop and should_stop():
+                logger.info("Stopping after the current page")
+                break
+    with DB_SECONDS.time(phase='save'):
+        release_claims(tokens)
+    return tick_report(started, due_count, sent_count, failed_count, dead_count,
+                       suppressed_count, deferred_count)
+
+
+def tick_report(started, due_count, sent_count, failed_count, dead_count,
+                suppressed_count=0, deferred_count=0):
+    """Log and record a finished tick; returns the stats the callers report."""
+    elapsed = time.monotonic() - started
+    per_second = sent_count / elapsed if elapsed else 0.0
+    provider = get_provider()
+    MESSAGES_SENT.inc(sent_count, provider=provider.name)
+    SEND_RATE.set(round(per_second, 1))
+    TICKS.inc()
+    TICK_SECONDS.observe(elapsed)
+    logger.info(f"Tick sent {sent_count}/{due_count} in {elapsed:.2f}s ({per_second:.1f} msg/s)")
+    return {
+        "due": due_count,
+        "sent": sent_count,
+        "failed": failed_count,
+        "dead": dead_count,
+        "suppressed": suppressed_count,
+        "deferred": deferred_count,
+        "elapsed": round(elapsed, 3),
+        "per_second": round(per_second, 1),
+        "gateway": provider.stats()
+    }
+
 
 @csrf_exempt
 def send_due_messages(request):
-    logger.info("Running scheduled message job...")
-    due = Message.objects.filter(
-        scheduled_time__lte=timezone.now(),
-        sent_at__isnull=True
-    )
-    logger.info(f"Found {due.count()} pending messages")
+    stats = dispatch_due_messages()
+
+    # -----  RETURN A RESPONSE  -----
+    return JsonResponse({"status": "ok", **stats})
+
+def sender_health(request):
+    """Ready when at least one run_sender worker is alive; reports queue lag."""
+    health = queue_health(SENDER_HEARTBEAT_TTL)
+    return JsonResponse(health, status=200 if health["ready"] else 503)
+
+def dlr_payload(request):
+    """The callback's reports as a list of dicts: JSON object or list, form, or query."""
+    if request.content_type == 'application/json':
+        data = json.loads(request.body or b'null')
+        return data if isinstance(data, list) else [data]
+    params = request.POST if request.method == 'POST' else request.GET
+    return [{key: value for key, value in params.items() if key != 'token'}]
 
-    sent_count = 0
-    for msg in due:
+@csrf_exempt
+def delivery_report(request):
+    """Provider delivery-report webhook; reports are written in batches, see dlr.py.
+
+    Refused outright until DLR_TOKEN is set: a report can name any message
+    by its id, so an open webhook would let anyone rewrite delivery status.
+    """
+    if not DLR_TOKEN:
+        return JsonResponse({"error": "Delivery reports are disabled: DLR_TOKEN is not set"}, status=403)
+    supplied = request.headers.get('X-DLR-Token') or request.GET.get('token', '')
+    if not hmac.compare_digest(supplied.encode(), DLR_TOKEN.encode()):
+        return JsonResponse({"error": "Invalid token"}, status=403)
+    try:
+        items = dlr_payload(request)
+    except ValueError:
+        return JsonResponse({"error": "Malformed JSON"}, status=400)
+
+    buffer = get_dlr_buffer()
+    received = buffer.clock()
+    now = timezone.now()
+    reports, errors = [], []
+    for index, item in enumerate(items):
         try:
-            sms_text = f"Hi {msg.receiver_name},\n\n{msg.message}\n\n- {msg.sender_name}"
-            payload = {
-                "token": API_KEY,
-                "gateway": 2,
-                "data": [[SENDER_ID, msg.receiver_phone, sms_text]]
-            }
-
-            resp = requests.post(BASE_URL, json=payload, timeout=15)
-            if resp.status_code == 200 and resp.json().get("error_code") == "000":
-                msg.sent_at = timezone.now()
-                msg.save(update_fields=['sent_at'])
-                logger.info(f"Message {msg.id} sent successfully via Kudi.")
-                sent_count += 1
-            else:
-                logger.error(f"Kudi error for message {msg.id}: {resp.text}")
-        except Exception:
-            logger.exception(f"Failed to send message {msg.id}")
+            reports.append(parse_report(item, received, now))
+        except ValueError as exc:
+            errors.append({"index": index, "error": str(exc)})
+    if not reports:
+        return JsonResponse({"accepted": 0, "errors": errors}, status=400)
+    if not buffer.add(reports):
+        response = JsonResponse({"error": "Delivery report buffer full"}, status=503)
+        response['Retry-After'] = '5'
+        return response
+    for report in reports:
+        DLR_RECEIVED.inc(status=report.status)
+    return JsonResponse({"accepted": len(reports), "errors": errors}, status=202)
 
-    # -----  RETURN A RESPONSE  -----
-    return JsonResponse({"status": "ok", "sent": sent_count})
+def metrics(request):
+    """Prometheus scrape endpoint for this process's send pipeline."""
+    return HttpResponse(REGISTRY.render(), content_type=CONTENT_TYPE)
 
 # ------------------------------------------------------------------
-# Scheduler boot code (unchanged)
+# Scheduler boot code
 # ------------------------------------------------------------------
 _scheduler = None
 
-def start_scheduler():
+def get_scheduler():
+    return _scheduler
+
+def start_scheduler(mode=None):
+    """Start the in-process sender.
+
+    ``precise`` (the default) sleeps until the next message is due and is
+    woken early by new messages; ``interval`` keeps the old blind 1-minute
+    poll.
+    """
     global _scheduler
     if _scheduler and _scheduler.running:
         return _scheduler
-    _scheduler = BackgroundScheduler()
-    _scheduler.add_job(
-        send_due_messages,
-        'interval',
-        minutes=1,
-        id='send_messages_job',
-        replace_existing=True
-    )
+    mode = mode or SCHEDULER_MODE
+    if mode == 'precise':
+        _scheduler = DueTimeScheduler(
+            dispatch_due_messages,
+            max_sleep=SCHEDULER_MAX_SLEEP,
+            retry_after=SCHEDULER_MAX_SLEEP
+        )
+    else:
+        _scheduler = BackgroundScheduler()
+        _scheduler.add_job(
+            dispatch_due_messages,
+            'interval',
+            minutes=1,
+            id='send_messages_job',
+            replace_existing=True
+        )
     _scheduler.start()
-    logger.info("Scheduler started successfully")
+    logger.info(f"Scheduler started successfully ({mode})")
     return _scheduler